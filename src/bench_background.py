@@ -0,0 +1,101 @@
+"""!@file bench_background.py
+
+@brief Benchmark of the background estimation methods
+
+@details This script compares the run time and the error of the approximate
+background estimations of background_funcs (downsample and tophat) with the
+exact rolling ball, on the inpainted and rescaled coins image, for several
+radii. It also checks how many pixels of the coins segmentation change when
+the background is estimated with each method, at the radius of mod_1_coins.
+
+@author T. Breitburd on 14/06/2024"""
+
+import os
+import time
+import numpy as np
+import skimage
+import matplotlib.pyplot as plt
+from skimage.restoration import inpaint
+from skimage.exposure import rescale_intensity
+from background_funcs import estimate_background
+from pipelines import segment_coins
+
+# First load the image, and keep only 1 channel
+coins = skimage.io.imread("./data/coins.png")
+coins = coins[:, :, 0]
+
+# Inpaint and rescale it as in mod_1_coins
+coins_inpaint = inpaint.inpaint_biharmonic(coins, coins == 0)
+coins_rescaled = rescale_intensity(coins_inpaint, in_range=(0.2, 0.8), out_range=(0, 1))
+coins_rescaled = np.array(coins_rescaled * 255, dtype=np.uint8)
+
+# In float, so the errors are not rounded to grey levels
+image = coins_rescaled.astype(float)
+radii = [5, 10, 20, 30, 45, 60]
+methods = ["exact", "downsample", "tophat"]
+
+# ----------------------------------------
+# Time the methods, and measure their error
+# ----------------------------------------
+
+times = {method: [] for method in methods}
+print("radius | method     | mean abs error | 99th percentile | time (s)")
+for radius in radii:
+    exact = None
+    for method in methods:
+        start = time.perf_counter()
+        background = estimate_background(image, radius, method)
+        times[method].append(time.perf_counter() - start)
+
+        if exact is None:
+            exact = background
+        error = np.abs(background - exact)
+        print(
+            "{:6d} | {:10s} | {:14.2f} | {:15.2f} | {:8.4f}".format(
+                radius,
+                method,
+                error.mean(),
+                np.percentile(error, 99),
+                times[method][-1],
+            )
+        )
+
+# ----------------------------------------
+# Effect on the segmentation
+# ----------------------------------------
+
+labelled = segment_coins(coins)[2]
+for method in methods[1:]:
+    labelled_method = segment_coins(coins, background=method)[2]
+    print(
+        "{}: {} coins (exact: {}), {:.3%} of the pixels changed".format(
+            method,
+            labelled_method.max(),
+            labelled.max(),
+            np.mean((labelled_method > 0) != (labelled > 0)),
+        )
+    )
+
+# ----------------------------------------
+# Plot the results
+# ----------------------------------------
+
+plt.style.use("seaborn-v0_8-darkgrid")
+
+plt.figure(figsize=(6, 4))
+for method in methods:
+    plt.semilogy(radii, times[method], "o-", label=method)
+plt.xlabel("Radius (pixels)")
+plt.ylabel("Run time (s)")
+plt.title("Background estimation run time")
+plt.legend()
+
+# Save the plot
+cur_dir = os.getcwd()
+plots_dir = os.path.join(cur_dir, "Plots")
+os.makedirs(plots_dir, exist_ok=True)
+
+plot_dir = os.path.join(plots_dir, "bench_background.png")
+plt.savefig(plot_dir)
+
+plt.close()
@@ -0,0 +1,192 @@
+"""!@file bench_chan_vese.py
+
+@brief Benchmark of the Chan-Vese segmentation of the tulips
+
+@details This script compares skimage's chan_vese, as run in mod_1_tulips, with
+the Chan-Vese segmentation of levelset_funcs: at full size, stopping on the
+relative change of the energy, from coarse to fine on pyramids of 2 to 4
+levels, and updating the level set in a narrow band around the contour. For
+each, the run time, the number of iterations, the energy of the segmentation
+(of the level set set to +1 inside and -1 outside, so the segmentations are
+compared on the same footing) and the fraction of the pixels which differ from
+skimage's segmentation are printed, and the energy per pixel
+is plotted against the time for each iteration. The time per iteration of the
+full size and narrow band versions is then measured on images of increasing
+size holding the same disk, so the length of the contour is fixed while the
+area grows.
+
+@author T. Breitburd on 14/06/2024"""
+
+import os
+import time
+import numpy as np
+import skimage
+import matplotlib.pyplot as plt
+from skimage.segmentation import chan_vese as chan_vese_skimage
+from levelset_funcs import (
+    chan_vese,
+    chan_vese_multiscale,
+    chan_vese_narrow_band,
+    chan_vese_energy,
+)
+from pipelines import segment_tulips
+
+# Load the image, and get the blurred mask of mod_1_tulips
+tulips = skimage.io.imread("./data/noisy_flower.jpg")
+tulips = tulips[:, :, :3]
+_, blurred_mask, _, _ = segment_tulips(tulips, hue_only=True)
+
+# The image as rescaled by chan_vese, for the energies
+image = blurred_mask - blurred_mask.min()
+image = image / image.max()
+
+parameters = {"mu": 0.1, "lambda2": 1.5}
+methods = {
+    "full size, tol 1e-3": lambda: chan_vese(
+        blurred_mask, energy_tol=1e-3, extended_output=True, **parameters
+    ),
+    "full size, tol 3e-4": lambda: chan_vese(
+        blurred_mask, energy_tol=3e-4, extended_output=True, **parameters
+    ),
+    "2 levels, tol 3e-4": lambda: chan_vese_multiscale(
+        blurred_mask, levels=2, energy_tol=3e-4, extended_output=True, **parameters
+    ),
+    "3 levels, tol 1e-4": lambda: chan_vese_multiscale(
+        blurred_mask, levels=3, energy_tol=1e-4, extended_output=True, **parameters
+    ),
+    "4 levels, tol 1e-4": lambda: chan_vese_multiscale(
+        blurred_mask, levels=4, energy_tol=1e-4, extended_output=True, **parameters
+    ),
+    "narrow band": lambda: chan_vese_narrow_band(
+        blurred_mask, extended_output=True, **parameters
+    ),
+    "narrow band, tol 1e-4": lambda: chan_vese_narrow_band(
+        blurred_mask, energy_tol=1e-4, extended_output=True, **parameters
+    ),
+    "narrow band, 2 levels": lambda: chan_vese_multiscale(
+        blurred_mask, levels=2, narrow_band=True, extended_output=True, **parameters
+    ),
+}
+
+# ----------------------------------------
+# Compare the methods
+# ----------------------------------------
+
+start = time.perf_counter()
+reference, _, reference_energies = chan_vese_skimage(
+    blurred_mask, extended_output=True, **parameters
+)
+reference_time = time.perf_counter() - start
+
+
+def segmentation_energy(segmentation):
+    """!@brief Energy of a segmentation, with the level set +1 inside and -1 outside
+
+    @param segmentation the segmentation, boolean numpy array
+
+    @return the energy, float"""
+
+    phi = np.where(segmentation, 1.0, -1.0)
+    return chan_vese_energy(image, phi, parameters["mu"], 1.0, parameters["lambda2"])
+
+
+print("method                | time (s) | iterations | energy  | pixels changed")
+print(
+    "{:21s} | {:8.2f} | {:10d} | {:7.0f} | {:14.4f}".format(
+        "skimage",
+        reference_time,
+        len(reference_energies),
+        segmentation_energy(reference),
+        0.0,
+    )
+)
+
+histories = {}
+for name, method in methods.items():
+    start = time.perf_counter()
+    segmentation, _, history = method()
+    run_time = time.perf_counter() - start
+    histories[name] = history
+
+    print(
+        "{:21s} | {:8.2f} | {:10d} | {:7.0f} | {:14.4f}".format(
+            name,
+            run_time,
+            len(history["energy"]) - 1,
+            segmentation_energy(segmentation),
+            np.mean(segmentation != reference),
+        )
+    )
+
+# ----------------------------------------
+# Scaling with the area of the image
+# ----------------------------------------
+
+sizes = [128, 256, 512, 1024, 2048]
+n_iterations = 20
+scaling = {"full size": [], "narrow band": []}
+print("size | full size (ms/it) | narrow band (ms/it)")
+for size in sizes:
+    # A disk of radius 40 in the middle of the image, and the level set of a
+    # disk of radius 30 at the same place, so the contour does not depend on size
+    y, x = np.indices((size, size)) - size // 2
+    disk = (x**2 + y**2 < 40**2).astype(float)
+    disk += 0.3 * np.random.default_rng(0).standard_normal(disk.shape)
+    init = (30.0 - np.sqrt(x**2 + y**2)) / 30.0
+
+    for name, method in (
+        ("full size", chan_vese),
+        ("narrow band", chan_vese_narrow_band),
+    ):
+        _, _, history = method(
+            disk,
+            tol=0,
+            max_num_iter=n_iterations,
+            init_level_set=init,
+            extended_output=True,
+        )
+        time_per_iteration = (history["time"][-1] - history["time"][0]) / n_iterations
+        scaling[name].append(time_per_iteration)
+
+    print(
+        "{:4d} | {:17.2f} | {:19.2f}".format(
+            size, scaling["full size"][-1] * 1e3, scaling["narrow band"][-1] * 1e3
+        )
+    )
+
+# ----------------------------------------
+# Plot the convergence and the scaling
+# ----------------------------------------
+
+plt.style.use("seaborn-v0_8-darkgrid")
+
+fig, ax = plt.subplots(1, 2, figsize=(13, 5))
+for name, history in histories.items():
+    # Each level of the pyramid has about 4 times fewer pixels than the next one
+    level = np.array(history.get("level", [0] * len(history["energy"])))
+    energy_per_pixel = np.array(history["energy"]) * 4.0**level / image.size
+    ax[0].plot(history["time"], energy_per_pixel, ".-", markersize=3, label=name)
+ax[0].set_xscale("log")
+ax[0].set_xlabel("Time (s)")
+ax[0].set_ylabel("Energy per pixel")
+ax[0].set_title("Convergence of the Chan-Vese segmentation")
+ax[0].legend()
+
+for name, times in scaling.items():
+    ax[1].loglog(np.array(sizes) ** 2, np.array(times) * 1e3, "o-", label=name)
+ax[1].set_xlabel("Number of pixels")
+ax[1].set_ylabel("Time per iteration (ms)")
+ax[1].set_title("Same contour, growing image")
+ax[1].legend()
+
+plt.tight_layout()
+
+# Save the plot
+cur_dir = os.getcwd()
+plots_dir = os.path.join(cur_dir, "Plots")
+os.makedirs(plots_dir, exist_ok=True)
+
+plot_dir = os.path.join(plots_dir, "bench_chan_vese.png")
+plt.savefig(plot_dir)
+
+plt.close()
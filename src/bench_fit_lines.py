@@ -0,0 +1,160 @@
+"""!@file bench_fit_lines.py
+
+@brief Benchmark of the batched line fits
+
+@details This script measures the throughput, in series per second, of the
+L1 and L2 fits of lines to many short series at once with fit_funcs'
+fit_lines_l1 and fit_lines_l2, against fitting the series one at a time with
+fit_line_l1 and sklearn's LinearRegression, as mod_2_q_1 does. The series are
+noisy lines of 20 samples with 10% of outliers, as the data of mod_2_q_1, and
+the same rounded to integers, as quantised sensor data, with many series
+having more than 2 points on their L1 line. The largest differences of the
+slopes and intercepts between the batched fits and the fits one at a time are
+printed, and the throughputs are plotted against the number of series.
+
+@author T. Breitburd on 14/06/2024"""
+
+import os
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+from sklearn.linear_model import LinearRegression
+from fit_funcs import fit_line_l1, fit_lines_l1, fit_lines_l2
+
+n_samples = 20
+x = np.arange(n_samples, dtype=float)
+
+
+def make_series(n_series, rng, quantised=False):
+    """!@brief Noisy lines with 10% of outliers
+
+    @param n_series the number of series, int
+    @param rng the random number generator, numpy Generator
+    @param quantised round the series to integers, bool
+
+    @return the series, numpy array of shape (n_series, n_samples)"""
+
+    slopes = rng.uniform(-1, 1, (n_series, 1))
+    y = slopes * x + rng.standard_normal((n_series, n_samples))
+    outliers = rng.random(y.shape) < 0.1
+    y[outliers] += rng.uniform(-20, 20, outliers.sum())
+    if quantised:
+        y = np.round(y)
+
+    return y
+
+
+def fit_l2_loop(y):
+    """!@brief Fit the series one at a time with LinearRegression
+
+    @param y the series, numpy array of shape (m, n_samples)
+
+    @return the slopes and intercepts, numpy array of shape (m, 2)"""
+
+    params = np.empty((len(y), 2))
+    for i, series in enumerate(y):
+        model = LinearRegression().fit(x.reshape(-1, 1), series)
+        params[i] = model.coef_[0], model.intercept_
+
+    return params
+
+
+def throughput(fit, y):
+    """!@brief Time a fit of series
+
+    @param fit the fit, function of the series returning the fitted parameters
+    @param y the series, numpy array
+
+    @return the fitted parameters, numpy array of shape (m, 2), and the number
+    of series fitted per second, float"""
+
+    start = time.perf_counter()
+    params = np.column_stack(fit(y))
+    return params, len(y) / (time.perf_counter() - start)
+
+
+rng = np.random.default_rng(0)
+
+# ----------------------------------------
+# One series at a time, on a sample
+# ----------------------------------------
+
+y = make_series(2000, rng)
+params_l1_loop, rate_l1_loop = throughput(
+    lambda y: np.array([fit_line_l1(x, series) for series in y]).T, y
+)
+params_l2_loop, rate_l2_loop = throughput(lambda y: fit_l2_loop(y).T, y)
+
+params_l1, _ = throughput(fit_lines_l1, y)
+params_l2, _ = throughput(fit_lines_l2, y)
+print("Largest difference with the fits one at a time:")
+print("L1:", np.abs(params_l1 - params_l1_loop).max())
+print("L2:", np.abs(params_l2 - params_l2_loop).max())
+
+# The L1 lines may differ where the minimum is not unique, so compare losses
+y_quantised = make_series(2000, rng, quantised=True)
+params_loop, rate_quantised_loop = throughput(
+    lambda y: np.array([fit_line_l1(x, series) for series in y]).T, y_quantised
+)
+params_quantised, _ = throughput(fit_lines_l1, y_quantised)
+loss_loop, loss_batched = (
+    np.abs(y_quantised - params[:, :1] * x - params[:, 1:]).sum(axis=1)
+    for params in (params_loop, params_quantised)
+)
+print("L1 quantised (loss):", np.abs(loss_batched - loss_loop).max())
+
+print("series  | L1 (series/s) | L2 (series/s) | L1 quantised (series/s)")
+print(
+    "{:>7s} | {:13.0f} | {:13.0f} | {:23.0f}".format(
+        "loop", rate_l1_loop, rate_l2_loop, rate_quantised_loop
+    )
+)
+
+# ----------------------------------------
+# Batched, for increasing numbers of series
+# ----------------------------------------
+
+counts = [100, 1000, 10000, 100000, 1000000]
+rates = {"L1": [], "L2": []}
+rates_quantised = []
+for n_series in counts:
+    y = make_series(n_series, rng)
+    rates["L1"].append(throughput(fit_lines_l1, y)[1])
+    rates["L2"].append(throughput(fit_lines_l2, y)[1])
+    y = make_series(n_series, rng, quantised=True)
+    rates_quantised.append(throughput(fit_lines_l1, y)[1])
+    print(
+        "{:7d} | {:13.0f} | {:13.0f} | {:23.0f}".format(
+            n_series, rates["L1"][-1], rates["L2"][-1], rates_quantised[-1]
+        )
+    )
+
+# ----------------------------------------
+# Plot the throughputs
+# ----------------------------------------
+
+plt.style.use("seaborn-v0_8-darkgrid")
+
+plt.figure(figsize=(7, 5))
+for (name, batched), rate_loop in zip(rates.items(), (rate_l1_loop, rate_l2_loop)):
+    line = plt.loglog(counts, batched, "o-", label=name + " batched")[0]
+    plt.axhline(rate_loop, color=line.get_color(), ls="--", label=name + " loop")
+line = plt.loglog(counts, rates_quantised, "o-", label="L1 quantised batched")[0]
+plt.axhline(
+    rate_quantised_loop, color=line.get_color(), ls="--", label="L1 quantised loop"
+)
+plt.xlabel("Number of series")
+plt.ylabel("Series per second")
+plt.title("Fits of lines to series of {} samples".format(n_samples))
+plt.legend()
+plt.tight_layout()
+
+# Save the plot
+cur_dir = os.getcwd()
+plots_dir = os.path.join(cur_dir, "Plots")
+os.makedirs(plots_dir, exist_ok=True)
+
+plot_dir = os.path.join(plots_dir, "bench_fit_lines.png")
+plt.savefig(plot_dir)
+
+plt.close()
@@ -0,0 +1,28 @@
+"""!@file bench_funcs.py
+@brief Python script containing the functions shared by the benchmarks
+for the Image Analysis Coursework
+
+List of functions:
+- time_function: Time a function, keeping the best of a few runs
+
+@author T. Breitburd on 14/06/2024"""
+
+import time
+import numpy as np
+
+
+def time_function(func, *args, repeats=3):
+    """!@brief Time a function, keeping the best of a few runs
+
+    @param func the function to time, callable
+    @param args the arguments to pass to the function
+    @param repeats the number of runs, int
+
+    @return the output of the function and the best run time in seconds, tuple"""
+
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return out, best
@@ -0,0 +1,110 @@
+"""!@file bench_inpainting.py
+
+@brief Benchmark of the inpainting of the coins corruption lines
+
+@details This script compares skimage's biharmonic inpainting of the whole
+image, as done in mod_1_coins, with the local line inpainting of inpaint_funcs:
+interpolation across the lines (linear and cubic), and the biharmonic equation
+solved in bands around the lines (whole height, and in tiles). The quality is
+measured on the coins image against skimage's result, and against the ground
+truth by masking the same line pattern, shifted, on the inpainted image. The
+run times are measured on the coins image and on a 4x4 tiling of it.
+
+@author T. Breitburd on 14/06/2024"""
+
+import os
+import numpy as np
+import skimage
+import matplotlib.pyplot as plt
+from skimage.restoration import inpaint
+from skimage.util import img_as_float
+from inpaint_funcs import inpaint_lines
+from bench_funcs import time_function
+
+# First load the image, and keep only 1 channel
+coins = skimage.io.imread("./data/coins.png")
+coins = coins[:, :, 0]
+mask = coins == 0
+
+methods = {
+    "skimage biharmonic": lambda image, mask: inpaint.inpaint_biharmonic(image, mask),
+    "linear": lambda image, mask: inpaint_lines(image, mask, "linear"),
+    "cubic": lambda image, mask: inpaint_lines(image, mask, "cubic"),
+    "biharmonic bands": lambda image, mask: inpaint_lines(image, mask, "biharmonic"),
+    "biharmonic tiles": lambda image, mask: inpaint_lines(
+        image, mask, "biharmonic", tile=256
+    ),
+}
+
+# ----------------------------------------
+# Ground truth test image
+# ----------------------------------------
+
+# The inpainted image is the ground truth, with the lines shifted by 3 columns
+truth = inpaint.inpaint_biharmonic(coins, mask)
+shifted_mask = np.roll(mask, 3, axis=1)
+corrupted = np.where(shifted_mask, 0, truth)
+
+# Larger image, to see how the run time scales
+coins_large = np.tile(coins, (4, 4))
+mask_large = coins_large == 0
+
+# ----------------------------------------
+# Compare the methods
+# ----------------------------------------
+
+reference = truth
+results = {}
+print(
+    "method             | max diff | mean diff | RMSE truth | time (s) | "
+    "time 4x4 (s)"
+)
+for name, method in methods.items():
+    inpainted, t_coins = time_function(method, coins, mask)
+    recovered = method(corrupted, shifted_mask)
+    _, t_large = time_function(method, coins_large, mask_large, repeats=1)
+
+    diff = np.abs(img_as_float(inpainted) - reference)[mask]
+    rmse = np.sqrt(np.mean((recovered - truth)[shifted_mask] ** 2))
+    results[name] = (rmse, t_coins, t_large, inpainted)
+
+    print(
+        "{:18s} | {:8.4f} | {:9.5f} | {:10.4f} | {:8.4f} | {:12.4f}".format(
+            name, diff.max(), diff.mean(), rmse, t_coins, t_large
+        )
+    )
+
+# ----------------------------------------
+# Plot the results
+# ----------------------------------------
+
+plt.style.use("seaborn-v0_8-darkgrid")
+
+fig, ax = plt.subplots(1, 2, figsize=(12, 5))
+
+for name, (rmse, t_coins, t_large, _) in results.items():
+    ax[0].loglog(t_large, rmse, "o", label=name)
+ax[0].set_xlabel("Run time on the 4x4 tiled image (s)")
+ax[0].set_ylabel("RMSE against the ground truth")
+ax[0].set_title("Quality and speed of the line inpainting")
+ax[0].legend()
+
+# Difference between the cubic interpolation and skimage's result
+diff_cubic = results["cubic"][3] - reference
+limit = np.abs(diff_cubic).max()
+image = ax[1].imshow(diff_cubic, cmap="coolwarm", vmin=-limit, vmax=limit)
+ax[1].set_title("Cubic interpolation - skimage biharmonic")
+ax[1].grid(False)
+fig.colorbar(image, ax=ax[1])
+
+plt.tight_layout()
+
+# Save the plot
+cur_dir = os.getcwd()
+plots_dir = os.path.join(cur_dir, "Plots")
+os.makedirs(plots_dir, exist_ok=True)
+
+plot_dir = os.path.join(plots_dir, "bench_inpainting.png")
+plt.savefig(plot_dir)
+
+plt.close()
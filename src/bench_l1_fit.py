@@ -0,0 +1,128 @@
+"""!@file bench_l1_fit.py
+
+@brief Benchmark of the L1 fit of a line
+
+@details This script compares the minimisation of the sum of the absolute
+residuals with SLSQP, from the initial guess (1, 0), as mod_2_q_1 used to do,
+with the exact fits of fit_funcs: as a linear program, and by the descent of
+fit_line_l1. The data of mod_2_q_1 are fitted first, then noisy lines with 10%
+of outliers of increasing length. For each, the run times, the number of
+evaluations of the sum for SLSQP, and the relative excess of the sums of
+SLSQP's and the linear program's fits over the descent's are printed, and the
+run times are plotted against the length of the series.
+
+@author T. Breitburd on 14/06/2024"""
+
+import os
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+from scipy.optimize import minimize
+from fit_funcs import fit_line_l1, fit_line_l1_lp, l1_loss
+
+
+def fit_slsqp(x, y):
+    """!@brief Fit a line minimising the sum of the absolute residuals with
+    SLSQP, as mod_2_q_1 used to do
+
+    @param x the x values, numpy array
+    @param y the y values, numpy array
+
+    @return the slope and intercept, numpy array, and the number of
+    evaluations of the sum, int"""
+
+    result = minimize(lambda params: l1_loss(x, y, params), [1, 0], method="SLSQP")
+    return result.x, result.nfev
+
+
+def compare(name, x, y):
+    """!@brief Time the 3 fits of a series and print the comparison
+
+    @param name the name of the series, string
+    @param x the x values, numpy array
+    @param y the y values, numpy array
+
+    @return the run times of SLSQP, of the linear program and of the descent,
+    floats"""
+
+    start = time.perf_counter()
+    params_slsqp, n_evaluations = fit_slsqp(x, y)
+    time_slsqp = time.perf_counter() - start
+
+    start = time.perf_counter()
+    params_lp = fit_line_l1_lp(x, y)
+    time_lp = time.perf_counter() - start
+
+    start = time.perf_counter()
+    params_descent = fit_line_l1(x, y)
+    time_descent = time.perf_counter() - start
+
+    loss = l1_loss(x, y, params_descent)
+    print(
+        "{:>14s} | {:9.4f} | {:11d} | {:8.4f} | {:11.4f} | {:12.2e} | {:9.2e}".format(
+            name,
+            time_slsqp,
+            n_evaluations,
+            time_lp,
+            time_descent,
+            (l1_loss(x, y, params_slsqp) - loss) / loss,
+            (l1_loss(x, y, params_lp) - loss) / loss,
+        )
+    )
+
+    return time_slsqp, time_lp, time_descent
+
+
+print(
+    "series         | SLSQP (s) | evaluations | LP (s)   | descent (s) |"
+    " SLSQP excess | LP excess"
+)
+
+# ----------------------------------------
+# The data of mod_2_q_1
+# ----------------------------------------
+
+for name in ("y_line", "y_outlier_line"):
+    y = np.loadtxt("./data/" + name + ".txt")
+    compare(name, np.arange(len(y), dtype=float), y)
+
+# ----------------------------------------
+# Noisy lines of increasing length
+# ----------------------------------------
+
+rng = np.random.default_rng(0)
+lengths = [20, 100, 1000, 10000, 100000]
+times = {"SLSQP": [], "linear program": [], "descent": []}
+for n in lengths:
+    x = np.linspace(0, 20, n)
+    y = 0.5 * x + 3 + rng.standard_normal(n)
+    outliers = rng.random(n) < 0.1
+    y[outliers] += rng.uniform(-20, 20, outliers.sum())
+
+    for name, run_time in zip(times, compare(str(n), x, y)):
+        times[name].append(run_time)
+
+# ----------------------------------------
+# Plot the run times
+# ----------------------------------------
+
+plt.style.use("seaborn-v0_8-darkgrid")
+
+plt.figure(figsize=(7, 5))
+for name, run_times in times.items():
+    plt.loglog(lengths, run_times, "o-", label=name)
+plt.xlabel("Length of the series")
+plt.ylabel("Run time (s)")
+plt.title("L1 fit of a line")
+plt.legend()
+plt.tight_layout()
+
+# Save the plot
+cur_dir = os.getcwd()
+plots_dir = os.path.join(cur_dir, "Plots")
+os.makedirs(plots_dir, exist_ok=True)
+
+plot_dir = os.path.join(plots_dir, "bench_l1_fit.png")
+plt.savefig(plot_dir)
+
+plt.close()
@@ -0,0 +1,171 @@
+"""!@file bench_online_fit.py
+
+@brief Benchmark of the online line fits
+
+@details This script fits lines to a stream of points, a slowly turning line
+with noise and 10% of outliers, as the points arrive. The cost per point of
+the least squares fit of all the points so far with fit_funcs' OnlineLineFit
+is compared with refitting sklearn's LinearRegression to the whole history,
+as mod_2_q_1 does, for histories of increasing length. Over a sliding window,
+OnlineLineFit with a point added and the oldest removed, and SlidingLineFitL1
+starting from the line of the previous window, are compared with fitting each
+window from scratch. The largest differences between the online and the
+from-scratch fits are printed, and the costs per point are plotted against the
+length of the history.
+
+@author T. Breitburd on 14/06/2024"""
+
+import os
+import time
+import numpy as np
+import matplotlib.pyplot as plt
+from numpy.lib.stride_tricks import sliding_window_view
+from sklearn.linear_model import LinearRegression
+from fit_funcs import (
+    OnlineLineFit,
+    SlidingLineFitL1,
+    fit_line_l1,
+    fit_lines_l2,
+)
+
+rng = np.random.default_rng(0)
+n_points = 20000
+window = 200
+
+x = np.arange(n_points, dtype=float)
+y = 0.5 * np.sin(x / 5000) * x / 100 + rng.standard_normal(n_points)
+outliers = rng.random(n_points) < 0.1
+y[outliers] += rng.uniform(-20, 20, outliers.sum())
+
+# ----------------------------------------
+# Sliding window
+# ----------------------------------------
+
+print("window of {} points  | time per point (ms) | largest difference".format(window))
+
+# Least squares, adding each point and removing the oldest one
+online = OnlineLineFit()
+params_online = np.empty((n_points - window + 1, 2))
+start = time.perf_counter()
+for i in range(n_points):
+    online.add(x[i], y[i])
+    if i >= window:
+        online.remove(x[i - window], y[i - window])
+    if i >= window - 1:
+        params_online[i - window + 1] = online.params()
+time_online = (time.perf_counter() - start) / n_points
+
+# Least squares, from scratch on each window
+params_scratch = np.column_stack(fit_lines_l2(sliding_window_view(y, window)))
+params_scratch[:, 1] -= params_scratch[:, 0] * x[slice(n_points - window + 1)]
+n_refits = 1000
+start = time.perf_counter()
+for i in range(n_refits):
+    points = slice(i, i + window)
+    LinearRegression().fit(x[points, None], y[points])
+time_refit = (time.perf_counter() - start) / n_refits
+
+print(
+    "L2 online            | {:19.4f} | {:.2e}".format(
+        time_online * 1e3, np.abs(params_online - params_scratch).max()
+    )
+)
+print("L2 LinearRegression  | {:19.4f} |".format(time_refit * 1e3))
+
+# Least absolute deviations, starting from the line of the previous window
+sliding = SlidingLineFitL1(window)
+params_warm = np.empty((n_points - window + 1, 2))
+start = time.perf_counter()
+for i in range(n_points):
+    line = sliding.add(x[i], y[i])
+    if i >= window - 1:
+        params_warm[i - window + 1] = line
+time_warm = (time.perf_counter() - start) / n_points
+
+# Least absolute deviations, from scratch on each window
+params_cold = np.empty_like(params_warm)
+start = time.perf_counter()
+for i in range(n_points - window + 1):
+    points = slice(i, i + window)
+    params_cold[i] = fit_line_l1(x[points], y[points])
+time_cold = (time.perf_counter() - start) / (n_points - window + 1)
+
+# The fits may differ where the minimum is not unique, so compare their losses
+loss_warm, loss_cold = (
+    np.abs(
+        sliding_window_view(y, window)
+        - params[:, :1] * sliding_window_view(x, window)
+        - params[:, 1:]
+    ).sum(axis=1)
+    for params in (params_warm, params_cold)
+)
+print(
+    "L1 warm start        | {:19.4f} | {:.2e} (loss)".format(
+        time_warm * 1e3, np.abs(loss_warm - loss_cold).max()
+    )
+)
+print("L1 from scratch      | {:19.4f} |".format(time_cold * 1e3))
+
+# ----------------------------------------
+# Whole history
+# ----------------------------------------
+
+lengths = [100, 1000, 10000, 100000, 1000000]
+times = {"LinearRegression refit": [], "OnlineLineFit": []}
+print("history | refit (ms/point) | online (ms/point)")
+for length in lengths:
+    x_history = np.arange(length, dtype=float)
+    y_history = 0.5 * x_history + rng.standard_normal(length)
+
+    # Refit the whole history when a point arrives
+    n_repeats = max(1, 10000 // length)
+    start = time.perf_counter()
+    for _ in range(n_repeats):
+        LinearRegression().fit(x_history[:, None], y_history)
+    times["LinearRegression refit"].append((time.perf_counter() - start) / n_repeats)
+
+    # Add the points one at a time, after the first 2
+    online = OnlineLineFit(x_history[:2], y_history[:2])
+    start = time.perf_counter()
+    for x_i, y_i in zip(x_history[2:].tolist(), y_history[2:].tolist()):
+        online.add(x_i, y_i)
+        online.params()
+    times["OnlineLineFit"].append((time.perf_counter() - start) / (length - 2))
+
+    print(
+        "{:7d} | {:16.4f} | {:17.4f}".format(
+            length,
+            times["LinearRegression refit"][-1] * 1e3,
+            times["OnlineLineFit"][-1] * 1e3,
+        )
+    )
+
+# ----------------------------------------
+# Plot the costs per point
+# ----------------------------------------
+
+plt.style.use("seaborn-v0_8-darkgrid")
+
+plt.figure(figsize=(7, 5))
+for name, run_times in times.items():
+    plt.loglog(lengths, np.array(run_times) * 1e3, "o-", label=name)
+for name, run_time, color in (
+    ("SlidingLineFitL1, window {}".format(window), time_warm, "C2"),
+    ("fit_line_l1 per window of {}".format(window), time_cold, "C3"),
+):
+    plt.axhline(run_time * 1e3, ls="--", label=name, color=color)
+plt.xlabel("Number of points in the history")
+plt.ylabel("Time per point (ms)")
+plt.title("Online line fits")
+plt.legend()
+plt.tight_layout()
+
+# Save the plot
+cur_dir = os.getcwd()
+plots_dir = os.path.join(cur_dir, "Plots")
+os.makedirs(plots_dir, exist_ok=True)
+
+plot_dir = os.path.join(plots_dir, "bench_online_fit.png")
+plt.savefig(plot_dir)
+
+plt.close()
@@ -0,0 +1,109 @@
+"""!@file bench_region_growing.py
+
+@brief Benchmark of the region growing algorithms
+
+@details This script compares the run time of the original pure Python region
+growing (region_growing_bfs) with the frontier-based one (region_growing),
+on the CT image resized to several sizes. It also checks that both give
+identical segmentations, and plots the speed-up against the image size.
+Finally, it times a sweep over many thresholds, done either by growing the
+region for each threshold or from the join tolerance computed once.
+
+@author T. Breitburd on 14/06/2024"""
+
+import os
+import time
+import numpy as np
+import skimage
+import matplotlib.pyplot as plt
+from skimage.transform import resize
+from seg_funcs import region_growing, region_growing_bfs, join_tolerance
+from bench_funcs import time_function
+
+# Load the image and reduce to 1 channel
+ct = skimage.io.imread("./data/CT.png")
+ct = ct[:, :, 0]
+
+# Seed in the left lung of the 512x512 CT image, and image sizes to test
+seed_rel = (268 / 512, 347 / 512)
+sizes = [128, 256, 512, 1024, 2048]
+
+# ----------------------------------------
+# Time both algorithms
+# ----------------------------------------
+
+times_bfs = []
+times_frontier = []
+
+print("  size | region px |   bfs (s) | frontier (s) | speed-up")
+for size in sizes:
+    # Nearest neighbour resizing, to keep the same grey levels
+    image = resize(ct, (size, size), order=0, preserve_range=True, anti_aliasing=False)
+    image = image.astype(np.uint8)
+    seed = (int(seed_rel[0] * size), int(seed_rel[1] * size))
+
+    out_bfs, t_bfs = time_function(region_growing_bfs, image, seed, 0.15)
+    out_frontier, t_frontier = time_function(region_growing, image, seed, 0.15)
+
+    # Both algorithms must give the same segmentation
+    assert np.array_equal(out_bfs, out_frontier)
+
+    times_bfs.append(t_bfs)
+    times_frontier.append(t_frontier)
+    print(
+        "{:6d} | {:9d} | {:9.3f} | {:12.3f} | {:7.1f}x".format(
+            size,
+            int(np.sum(out_frontier != image)),
+            t_bfs,
+            t_frontier,
+            t_bfs / t_frontier,
+        )
+    )
+
+# ----------------------------------------
+# Time a threshold sweep
+# ----------------------------------------
+
+# Growing the region for every threshold, or computing the join tolerance once
+sweep = np.linspace(0.01, 0.5, 100)
+seed = (int(seed_rel[0] * 512), int(seed_rel[1] * 512))
+
+start = time.perf_counter()
+masks_growing = [region_growing(ct, seed, t) == 255 for t in sweep]
+t_growing = time.perf_counter() - start
+
+start = time.perf_counter()
+join = join_tolerance(ct, seed)
+masks_join = [(join < t) | (ct == 255) for t in sweep]
+t_join = time.perf_counter() - start
+
+assert all(np.array_equal(a, b) for a, b in zip(masks_growing, masks_join))
+
+print(
+    "Sweep over {} thresholds: {:.3f} s by growing, {:.3f} s from the join "
+    "tolerance ({:.1f}x)".format(len(sweep), t_growing, t_join, t_growing / t_join)
+)
+
+# ----------------------------------------
+# Plot the results
+# ----------------------------------------
+
+plt.style.use("seaborn-v0_8-darkgrid")
+
+plt.figure(figsize=(6, 4))
+plt.loglog(sizes, times_bfs, "o-", label="Pure Python BFS")
+plt.loglog(sizes, times_frontier, "o-", label="Frontier-based")
+plt.xlabel("Image side length (pixels)")
+plt.ylabel("Run time (s)")
+plt.title("Region growing run time")
+plt.legend()
+
+# Save the plot
+cur_dir = os.getcwd()
+plots_dir = os.path.join(cur_dir, "Plots")
+os.makedirs(plots_dir, exist_ok=True)
+
+plot_dir = os.path.join(plots_dir, "bench_region_growing.png")
+plt.savefig(plot_dir)
+
+plt.close()
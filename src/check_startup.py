@@ -0,0 +1,74 @@
+"""!@file check_startup.py
+
+@brief Check the startup time of the reconstruction entry point
+
+@details Imports mod_3_LGD in a fresh interpreter with python -X importtime, and
+checks that none of the heavy modules (astra, odl, torch, skimage, matplotlib)
+are imported at startup, and that the total import time stays within the budget.
+Exits with status 1 if either check fails, so it can be used as a regression
+check.
+
+Usage: python src/check_startup.py [--budget SECONDS]
+
+@author T. Breitburd on 14/06/2024"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ("astra", "odl", "torch", "skimage", "matplotlib")
+
+
+def import_times(module, path):
+    """!@brief Import a module in a fresh interpreter, with python -X importtime
+
+    @param module the name of the module to import, string
+    @param path the directory to import the module from, string
+
+    @return the cumulative import time in seconds of each package imported
+    directly, dict, and all the packages imported, set"""
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + module],
+        cwd=path,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # Lines are "import time: self [us] | cumulative | imported package", the
+    # package names are indented by their nesting level
+    times = {}
+    imported = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        package = name.strip().split(".")[0]
+        imported.add(package)
+        if not name.startswith("  "):
+            times[package] = times.get(package, 0) + int(cumulative) / 1e6
+
+    return times, imported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the startup time of mod_3_LGD")
+    parser.add_argument("--budget", type=float, default=0.5, help="in seconds")
+    args = parser.parse_args()
+
+    times, imported = import_times(
+        "mod_3_LGD", os.path.dirname(os.path.abspath(__file__))
+    )
+    total = sum(times.values())
+
+    for package, seconds in sorted(times.items(), key=lambda item: -item[1])[:10]:
+        print(f"{package:<28}{seconds:>8.3f} s")
+    print(f"{'total':<28}{total:>8.3f} s (budget {args.budget:.3f} s)")
+
+    heavy = [package for package in HEAVY_MODULES if package in imported]
+    if heavy:
+        print("Heavy modules imported at startup:", ", ".join(heavy))
+    if heavy or total > args.budget:
+        sys.exit(1)
@@ -0,0 +1,94 @@
+"""!@file color_funcs.py
+@brief Python script containing the color conversion functions
+for the Image Analysis Coursework
+
+@details The tulips are segmented on the hue channel only, so rather than
+converting the whole image to HSV in float64, the hue is computed directly from
+the 8 bit RGB values, a block of rows at a time, into a float32 image.
+
+List of functions:
+- hue_lut: Lookup table of the hue of all 8 bit RGB triplets
+- rgb2hue: Hue channel of an 8 bit RGB image, as in skimage's rgb2hsv
+
+
+@author T. Breitburd on 14/06/2024"""
+
+from functools import lru_cache
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def hue_lut():
+    """!@brief Lookup table of the hue of all 8 bit RGB triplets, from the
+    channel holding the maximum, the difference of the 2 other channels and the
+    range of the triplet
+
+    @details The hue is (2 * channel + difference / range) / 6, modulo 1, with
+    channel 0, 1 or 2 for red, green or blue, and the difference g - b, b - r or
+    r - g respectively. It is computed in float64 and rounded to float32 once,
+    and is 0 for grey pixels (range 0), as in skimage's rgb2hsv.
+
+    @return the hue, float32 numpy array of shape (3, 511, 256), indexed by the
+    channel, the difference + 255 and the range"""
+
+    channel = np.arange(3)[:, None, None]
+    difference = np.arange(-255, 256)[None, :, None]
+    value_range = np.arange(256)[None, None, :]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        hue = ((2.0 * channel + difference / value_range) / 6.0) % 1.0
+    hue[..., 0] = 0.0
+
+    return hue.astype(np.float32)
+
+
+def rgb2hue(rgb, out=None, chunk=256):
+    """!@brief Compute the hue channel of an 8 bit RGB image, with the same
+    values as skimage's rgb2hsv(rgb)[:, :, 0], rounded to float32
+
+    @details The image is processed a block of rows at a time in 16 bit
+    integers, so the memory used is the output, 4 bytes per pixel, and about 20
+    bytes per pixel of a block, instead of the 24 bytes per pixel of the float64
+    HSV image plus its temporaries. The hue of each pixel is read from hue_lut,
+    with the ties between the channels broken as in rgb2hsv (blue, then green).
+
+    @param rgb the image, uint8 numpy array of shape (rows, cols, 3 or 4), the
+    alpha channel being ignored
+    @param out the array to write the hue to, float32 numpy array of shape
+    (rows, cols), allocated if None
+    @param chunk the number of rows processed at once, int
+
+    @return the hue, in [0, 1), float32 numpy array of shape (rows, cols)"""
+
+    rgb = np.asarray(rgb)
+    if rgb.dtype != np.uint8 or rgb.ndim != 3 or rgb.shape[2] not in (3, 4):
+        raise ValueError("rgb must be a uint8 array of shape (rows, cols, 3 or 4)")
+    if out is None:
+        out = np.empty(rgb.shape[:2], dtype=np.float32)
+    elif out.shape != rgb.shape[:2] or out.dtype != np.float32:
+        raise ValueError("out must be a float32 array of shape (rows, cols)")
+
+    lut = hue_lut().ravel()
+    for start in range(0, rgb.shape[0], chunk):
+        rows = slice(start, start + chunk)
+        red, green, blue = (rgb[rows, :, i].astype(np.int16) for i in range(3))
+
+        high = np.maximum(np.maximum(red, green), blue)
+        value_range = high - np.minimum(np.minimum(red, green), blue)
+
+        # Channel holding the maximum, blue then green winning the ties
+        is_blue = blue == high
+        is_green = (green == high) & ~is_blue
+        difference = np.where(
+            is_blue, red - green, np.where(is_green, blue - red, green - blue)
+        )
+
+        # Flat index into the lookup table
+        index = difference.astype(np.int32)
+        index += 255
+        index *= 256
+        index += value_range
+        index += (is_blue * 2 + is_green) * (511 * 256)
+        np.take(lut, index, out=out[rows])
+
+    return out
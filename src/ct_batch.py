@@ -0,0 +1,134 @@
+"""!@file ct_batch.py
+
+@brief Batch segmentation of CT slices, in a pool of processes
+
+@details This script runs the mod_1_CT pipeline (Otsu thresholding, closing,
+labelling, seed selection, flood fill and closing) on many CT slices, either
+all the images in a directory or all the slices of a volume stored as a .npy
+file. The slices are segmented in a pool of processes, with a bounded number of
+slices in flight, and the masks are written as they complete: as PNG images
+in the output directory, or as the slices of a .npy mask volume.
+
+Usage: python src/ct_batch.py input output [--workers N] [--max-in-flight M]
+
+@author T. Breitburd on 14/06/2024"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+import skimage
+from pipelines import segment_ct
+
+
+def load_slice(source, key):
+    """!@brief Load one CT slice, reduced to 1 channel
+
+    @param source the directory of images or the path to the .npy volume, string
+    @param key the file name of the image, or the index of the slice, string or int
+
+    @return the CT slice, numpy array"""
+
+    if isinstance(key, str):
+        ct = skimage.io.imread(os.path.join(source, key))
+    else:
+        # Only the slice is read from the memory-mapped volume
+        ct = np.array(np.load(source, mmap_mode="r")[key])
+
+    if ct.ndim == 3:
+        ct = ct[:, :, 0]
+
+    return ct
+
+
+def segment_slice(source, key):
+    """!@brief Load and segment one CT slice, in a worker process
+
+    @param source the directory of images or the path to the .npy volume, string
+    @param key the file name of the image, or the index of the slice, string or int
+
+    @return the key and the lungs mask, tuple"""
+
+    return key, segment_ct(load_slice(source, key))
+
+
+def run_batch(source, output, workers=None, max_in_flight=None):
+    """!@brief Segment all the CT slices in a directory or a .npy volume
+
+    @details At most max_in_flight slices are submitted to the pool at any time,
+    so the memory used does not grow with the number of slices, and each mask
+    is written as soon as it is done.
+
+    @param source the directory of images or the path to the .npy volume, string
+    @param output the directory for the PNG masks, or the path to the .npy mask
+    volume, string
+    @param workers the number of processes, the number of CPUs by default, int
+    @param max_in_flight the maximum number of slices submitted at once,
+    2 per process by default, int
+
+    @return the number of slices segmented, int"""
+
+    workers = workers or os.cpu_count()
+    max_in_flight = max_in_flight or 2 * workers
+
+    if os.path.isdir(source):
+        keys = sorted(
+            name
+            for name in os.listdir(source)
+            if name.lower().endswith((".png", ".jpg", ".jpeg", ".tif", ".tiff"))
+        )
+        os.makedirs(output, exist_ok=True)
+        masks = None
+    else:
+        shape = np.load(source, mmap_mode="r").shape
+        keys = range(shape[0])
+        # The slices are reduced to 1 channel, so the masks have no channel axis
+        masks = np.lib.format.open_memmap(
+            output, mode="w+", dtype=bool, shape=shape[:3]
+        )
+
+    def write(future):
+        key, masked = future.result()
+        if masks is None:
+            name = os.path.splitext(key)[0] + "_mask.png"
+            skimage.io.imsave(
+                os.path.join(output, name),
+                masked.astype(np.uint8) * 255,
+                check_contrast=False,
+            )
+        else:
+            masks[key] = masked
+
+    n_done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = set()
+        for key in keys:
+            # Wait for a slice to complete before submitting another one
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    write(future)
+                n_done += len(done)
+            in_flight.add(pool.submit(segment_slice, source, key))
+
+        for future in wait(in_flight).done:
+            write(future)
+        n_done += len(in_flight)
+
+    if masks is not None:
+        masks.flush()
+
+    return n_done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch segmentation of CT slices")
+    parser.add_argument("input", help="directory of CT images, or .npy volume")
+    parser.add_argument("output", help="directory for the masks, or .npy mask volume")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--max-in-flight", type=int, default=None)
+    args = parser.parse_args()
+
+    n_slices = run_batch(args.input, args.output, args.workers, args.max_in_flight)
+
+    print("Segmented", n_slices, "slices.")
@@ -0,0 +1,571 @@
+"""!@file fit_funcs.py
+@brief Python script containing the line fitting functions
+for the Image Analysis Coursework
+
+@details The L1 (least absolute deviations) fit of a line is found exactly,
+rather than by a gradient method on the non-differentiable sum of absolute
+residuals: by a descent from line to line through pairs of points, each step
+being a weighted median, whose optimality is then checked, or as a linear
+program solved with HiGHS. The fits of many short series, the rows of a 2D
+array, are vectorised over the rows: in closed form for L2, and with the
+descent done on all the rows at once for L1. For data arriving continuously,
+the least squares fit is updated in constant time per point, and the least
+absolute deviations fit of a sliding window starts its descent from the line
+of the previous window.
+
+List of functions:
+- l1_loss: Sum of the absolute residuals of a line
+- fit_line_l1_lp: Least absolute deviations fit of a line, as a linear program
+- fit_line_l1: Least absolute deviations fit of a line, by weighted medians
+- fit_lines_l2: Least squares fits of lines to the rows of a 2D array
+- fit_lines_l1: Least absolute deviations fits of lines to the rows of a 2D array
+- r_squared: Coefficients of determination of lines fitted to the rows of a 2D array
+- fit_lines: L1 and L2 fits of lines to the rows of a 2D array, with their R²
+
+List of classes:
+- OnlineLineFit: Least squares fit of a line, updated as points are added and removed
+- SlidingLineFitL1: Least absolute deviations fit of a line to a sliding window
+
+
+@author T. Breitburd on 14/06/2024"""
+
+from collections import deque
+import numpy as np
+from scipy.optimize import linprog
+
+
+def l1_loss(x, y, params):
+    """!@brief Sum of the absolute residuals of a line y = a * x + b
+
+    @param x the x values, numpy array
+    @param y the y values, numpy array
+    @param params the slope a and intercept b, sequence of 2 floats
+
+    @return the sum of the absolute residuals, float"""
+
+    a, b = params
+    return np.sum(np.abs(y - (a * x + b)))
+
+
+def _check_series(x, y):
+    """!@brief Convert x and y to float arrays, checking they are a series
+
+    @param x the x values, array-like
+    @param y the y values, array-like
+
+    @return x and y, float 1D numpy arrays of the same length"""
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if x.shape != y.shape or x.ndim != 1:
+        raise ValueError("x and y must be 1D arrays of the same length")
+    if np.all(x == x[0]):
+        raise ValueError("x must hold at least 2 different values")
+
+    return x, y
+
+
+def fit_line_l1_lp(x, y):
+    """!@brief Fit a line y = a * x + b minimising the sum of the absolute
+    residuals, exactly, as a linear program
+
+    @details The fit minimises sum |y - X beta| over beta = (a, b), with X the
+    columns x and 1. Its dual linear program is to maximise y . d over d in
+    [-1, 1]^n subject to X^T d = 0: n bounded variables and only 2 equality
+    constraints, solved with HiGHS' interior point method followed by a
+    crossover to a vertex. The fitted line is given by the multipliers of the 2
+    equality constraints.
+
+    @param x the x values, numpy array of shape (n,)
+    @param y the y values, numpy array of shape (n,)
+
+    @return the slope a and intercept b, numpy array of shape (2,)"""
+
+    x, y = _check_series(x, y)
+
+    design = np.stack([x, np.ones_like(x)])
+    result = linprog(
+        -y, A_eq=design, b_eq=np.zeros(2), bounds=(-1.0, 1.0), method="highs-ipm"
+    )
+    if result.status != 0:
+        raise RuntimeError("L1 fit failed: " + result.message)
+
+    # linprog minimises -y . d, so the line is minus the multipliers
+    return -result.eqlin.marginals
+
+
+def fit_line_l1(x, y, max_num_iter=100, start=None):
+    """!@brief Fit a line y = a * x + b minimising the sum of the absolute
+    residuals, exactly, by a descent from line to line through pairs of points
+
+    @details A least absolute deviations line passes through at least 2 of the
+    points. Starting from the point closest to the least squares line, the best
+    line through the current point is found: its slope is the median of the
+    slopes to the other points, weighted by their distances in x. It passes
+    through another point, which becomes the current point, until the line no
+    longer changes (Wesolowsky's descent, a few steps of O(n log n) each). The
+    line through points k and j is then optimal if the signs of the other
+    residuals can be completed by d_k and d_j in [-1, 1] so that
+    sum d_i = sum d_i x_i = 0, the optimality condition of the linear program.
+    If they cannot, which may only happen when more than 2 points are on the
+    line, the fit falls back to fit_line_l1_lp. Unlike a minimisation of the
+    sum with a gradient method such as SLSQP, slow and not guaranteed to reach
+    the minimum as the sum is not differentiable, the fit is exact.
+
+    @param x the x values, numpy array of shape (n,)
+    @param y the y values, numpy array of shape (n,)
+    @param max_num_iter the largest number of steps of the descent, int
+    @param start the index of the point to start from, the point closest to
+    the least squares line if None, int
+
+    @return the slope a and intercept b, numpy array of shape (2,)"""
+
+    x, y = _check_series(x, y)
+
+    # Start from the point closest to the least squares line
+    if start is None:
+        x_mean, y_mean = x.mean(), y.mean()
+        slope = np.dot(x - x_mean, y - y_mean) / np.dot(x - x_mean, x - x_mean)
+        start = np.argmin(np.abs(y - y_mean - slope * (x - x_mean)))
+    current = int(start)
+
+    previous = -1
+    for _ in range(max_num_iter):
+        # Weighted median of the slopes from the current point
+        dx = x - x[current]
+        others = np.flatnonzero(dx)
+        slopes = (y[others] - y[current]) / dx[others]
+        order = np.argsort(slopes)
+        weights = np.cumsum(np.abs(dx[others[order]]))
+        median = np.searchsorted(weights, 0.5 * weights[-1])
+
+        slope = slopes[order[median]]
+        following = others[order[median]]
+        if following == previous:
+            break
+        previous, current = current, following
+
+    intercept = y[current] - slope * x[current]
+
+    # Complete the signs of the residuals on the 2 points of the line
+    pair = [current, previous]
+    signs = np.sign(y - (slope * x + intercept))
+    signs[pair] = 0.0
+    if np.count_nonzero(signs) == len(x) - 2:
+        completion = np.linalg.solve(
+            [x[pair], [1.0, 1.0]], [-np.dot(signs, x), -np.sum(signs)]
+        )
+        if np.all(np.abs(completion) <= 1.0 + 1e-9):
+            return np.array([slope, intercept])
+
+    return fit_line_l1_lp(x, y)
+
+
+def _check_batch(y, x):
+    """!@brief Convert the series and their x values to float arrays of the
+    same shape, the x values being the indices by default
+
+    @param y the series, array-like of shape (m, n)
+    @param x the x values, shared (n,) or per series (m, n), or None, array-like
+
+    @return y and x, float numpy arrays of shape (m, n), x possibly a
+    broadcast view"""
+
+    y = np.asarray(y, dtype=float)
+    if y.ndim != 2 or y.shape[1] < 2:
+        raise ValueError("y must be a 2D array of series of at least 2 samples")
+    if x is None:
+        x = np.arange(y.shape[1], dtype=float)
+    x = np.broadcast_to(np.asarray(x, dtype=float), y.shape)
+    if np.any(np.all(x == x[:, :1], axis=1)):
+        raise ValueError("x must hold at least 2 different values in each series")
+
+    return y, x
+
+
+def fit_lines_l2(y, x=None):
+    """!@brief Fit lines y = a * x + b to the rows of a 2D array, minimising
+    the sums of the squared residuals, in closed form
+
+    @param y the series, numpy array of shape (m, n)
+    @param x the x values, shared (n,) or per series (m, n), the indices if
+    None, numpy array
+
+    @return the slopes a and intercepts b, numpy arrays of shape (m,)"""
+
+    y, x = _check_batch(y, x)
+
+    x_mean = x.mean(axis=1)
+    y_mean = y.mean(axis=1)
+    dx = x - x_mean[:, None]
+    slope = np.einsum("ij,ij->i", dx, y - y_mean[:, None]) / np.einsum(
+        "ij,ij->i", dx, dx
+    )
+
+    return slope, y_mean - slope * x_mean
+
+
+def _signs_completable(signs, x, on_line):
+    """!@brief Check, for each row, if the signs of the residuals of a line can
+    be completed on the points on the line so that the line is optimal
+
+    @details The line is optimal if there are d_i in [-1, 1] on the points on
+    the line such that sum d_i + sum s_i = sum d_i x_i + sum s_i x_i = 0, with
+    s_i the signs of the other residuals: if minus the sums of the s_i and of
+    the s_i x_i lie in the polygon spanned by the vectors (1, x_i) of the
+    points on the line. The edges of the polygon are parallel to these
+    vectors, so the condition is |sum s_i (x_i - x_j)| <= sum |x_i - x_j|,
+    the second sum over the points on the line, for each point j on the line.
+    With 2 points on the line, the second sums are the distance between them,
+    and with more, they are found from the cumulative sums of the sorted x
+    values.
+
+    @param signs the signs of the residuals, 0 on the line, numpy array of
+    shape (m, n)
+    @param x the x values, numpy array of shape (m, n)
+    @param on_line the points on the line, at least 2 at different x values,
+    boolean numpy array of shape (m, n)
+
+    @return True for the rows whose line is optimal, numpy array of shape (m,)"""
+
+    sum_signs = signs.sum(axis=1)
+    sum_signs_x = np.einsum("ij,ij->i", signs, x)
+    optimal = np.empty(len(x), dtype=bool)
+
+    # 2 points on the line
+    pair = np.count_nonzero(on_line, axis=1) == 2
+    x_pair = x[pair][on_line[pair]].reshape(-1, 2)
+    signed = np.abs(sum_signs_x[pair, None] - x_pair * sum_signs[pair, None])
+    distance = np.abs(x_pair[:, :1] - x_pair[:, 1:])
+    optimal[pair] = np.all(signed <= distance * (1 + 1e-9) + 1e-9, axis=1)
+
+    # More points on the line, with the sums of the distances in x to the
+    # points on the line below and above, the x values being sorted once if
+    # they are shared by the rows
+    tied = ~pair
+    x_tied = x[tied]
+    if x.strides[0] == 0:
+        order = np.broadcast_to(np.argsort(x[0]), x_tied.shape)
+    else:
+        order = np.argsort(x_tied, axis=1)
+    x_sorted = np.take_along_axis(x_tied, order, axis=1)
+    weight = np.take_along_axis(on_line[tied], order, axis=1).astype(float)
+    count_below = np.cumsum(weight, axis=1) - weight
+    sum_below = np.cumsum(weight * x_sorted, axis=1) - weight * x_sorted
+    count_above = weight.sum(axis=1, keepdims=True) - count_below - weight
+    sum_above = (weight * x_sorted).sum(axis=1, keepdims=True) - sum_below
+    sum_above -= weight * x_sorted
+    distances = np.empty_like(x_sorted)
+    np.put_along_axis(
+        distances,
+        order,
+        x_sorted * count_below - sum_below + sum_above - x_sorted * count_above,
+        axis=1,
+    )
+    signed = np.abs(sum_signs_x[tied, None] - x_tied * sum_signs[tied, None])
+    optimal[tied] = np.all(
+        (signed <= distances * (1 + 1e-9) + 1e-9) | ~on_line[tied], axis=1
+    )
+
+    return optimal
+
+
+def _descend_lines(y, x, slope, current, previous, active, max_num_iter):
+    """!@brief Run the descent of fit_line_l1 on rows of a 2D array at once
+
+    @details The slopes from the current point of each row to the other points
+    are sorted along the rows, and their weighted medians found from the
+    cumulative sums of the weights. The rows whose line no longer changes are
+    dropped from the next steps.
+
+    @param y the series, numpy array of shape (m, n)
+    @param x the x values, numpy array of shape (m, n)
+    @param slope the slopes of the lines, numpy array of shape (m,), updated
+    @param current the current point of each row, numpy array of shape (m,),
+    updated
+    @param previous the previous point of each row, or -1, numpy array of
+    shape (m,), updated
+    @param active the rows to descend, int numpy array
+    @param max_num_iter the largest number of steps of the descent, int"""
+
+    for _ in range(max_num_iter):
+        # Weighted medians of the slopes from the current points, the points
+        # at the same x as the current point coming last with no weight
+        index = np.arange(active.size)
+        points = current[active]
+        x_active = x[active]
+        dx = x_active - x_active[index, points][:, None]
+        y_active = y[active]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slopes = (y_active - y_active[index, points][:, None]) / dx
+        slopes[dx == 0] = np.inf
+
+        order = np.argsort(slopes, axis=1)
+        weights = np.cumsum(np.take_along_axis(np.abs(dx), order, axis=1), axis=1)
+        median = np.count_nonzero(weights < 0.5 * weights[:, -1:], axis=1)
+        following = order[index, median]
+        slope[active] = slopes[index, following]
+
+        # The rows whose line goes back to the previous point have converged
+        done = following == previous[active]
+        previous[active] = np.where(done, previous[active], points)
+        current[active] = np.where(done, points, following)
+        active = active[~done]
+        if active.size == 0:
+            break
+
+
+def fit_lines_l1(y, x=None, max_num_iter=100):
+    """!@brief Fit lines y = a * x + b to the rows of a 2D array, minimising
+    the sums of the absolute residuals, exactly
+
+    @details The descent of fit_line_l1 is done on all the rows at once, by
+    _descend_lines. The optimality of each line is then checked as in
+    fit_line_l1, for all the rows at once, with any number of points on the
+    line (within 1e-9 of the largest |y| of the row), by _signs_completable.
+    When more than 2 points are on the line, as is common with quantised data,
+    the descent may stop on a line which is not optimal, the best line through
+    each of its 2 last points being the line itself: the descent of these rows
+    is started again from another point on their line, in turn, until the
+    lines are optimal. The rows still failing the check after as many restarts
+    as there are samples are fitted again with fit_line_l1_lp.
+
+    @param y the series, numpy array of shape (m, n)
+    @param x the x values, shared (n,) or per series (m, n), the indices if
+    None, numpy array
+    @param max_num_iter the largest number of steps of each descent, int
+
+    @return the slopes a and intercepts b, numpy arrays of shape (m,)"""
+
+    y, x = _check_batch(y, x)
+    rows = np.arange(y.shape[0])
+
+    # Start from the point of each row closest to its least squares line
+    slope, intercept = fit_lines_l2(y, x)
+    current = np.argmin(np.abs(y - (slope[:, None] * x + intercept[:, None])), axis=1)
+    previous = np.full_like(current, -1)
+
+    active = rows
+    for restart in range(y.shape[1] + 1):
+        _descend_lines(y, x, slope, current, previous, active, max_num_iter)
+        intercept[active] = (
+            y[active, current[active]] - slope[active] * x[active, current[active]]
+        )
+
+        # Complete the signs of the residuals on the points of each line
+        index = np.arange(active.size)
+        y_active, x_active = y[active], x[active]
+        residuals = y_active - (
+            slope[active, None] * x_active + intercept[active, None]
+        )
+        on_line = np.abs(residuals) <= 1e-9 * np.abs(y_active).max(
+            axis=1, keepdims=True
+        )
+        on_line[index, current[active]] = True
+        on_line[index, previous[active]] = True
+        signs = np.where(on_line, 0.0, np.sign(residuals))
+        failed = ~_signs_completable(signs, x_active, on_line)
+        active = active[failed]
+        if active.size == 0 or restart == y.shape[1]:
+            break
+
+        # Start again from another point on the line, in turn
+        others = on_line[failed]
+        others[index[: active.size], current[active]] = False
+        others[index[: active.size], previous[active]] = False
+        turn = restart % np.maximum(others.sum(axis=1), 1)
+        current[active] = np.argmax(np.cumsum(others, axis=1) > turn[:, None], axis=1)
+        previous[active] = -1
+
+    for row in active:
+        slope[row], intercept[row] = fit_line_l1_lp(x[row], y[row])
+
+    return slope, intercept
+
+
+def r_squared(y, x, slope, intercept):
+    """!@brief Coefficients of determination of lines fitted to the rows of a
+    2D array, 1 - (sum of squared residuals) / (sum of squared deviations)
+
+    @details As in sklearn's r2_score, a constant series has R² 1 if its line
+    fits it exactly, and 0 otherwise.
+
+    @param y the series, numpy array of shape (m, n)
+    @param x the x values, shared (n,) or per series (m, n), numpy array
+    @param slope the slopes, numpy array of shape (m,)
+    @param intercept the intercepts, numpy array of shape (m,)
+
+    @return the coefficients of determination, numpy array of shape (m,)"""
+
+    residuals = y - (slope[:, None] * x + intercept[:, None])
+    residual_sum = np.einsum("ij,ij->i", residuals, residuals)
+    deviations = y - y.mean(axis=1, keepdims=True)
+    total_sum = np.einsum("ij,ij->i", deviations, deviations)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r2 = 1.0 - residual_sum / total_sum
+    constant = total_sum == 0
+    r2[constant] = np.where(residual_sum[constant] == 0, 1.0, 0.0)
+
+    return r2
+
+
+def fit_lines(y, x=None):
+    """!@brief Fit lines y = a * x + b to the rows of a 2D array, minimising
+    the sums of the absolute and of the squared residuals, with the R² of
+    each fit
+
+    @param y the series, numpy array of shape (m, n)
+    @param x the x values, shared (n,) or per series (m, n), the indices if
+    None, numpy array
+
+    @return the table of the fits, with one row per series and the columns
+    l1_slope, l1_intercept, l1_r2, l2_slope, l2_intercept, l2_r2, dictionary
+    of numpy arrays of shape (m,)"""
+
+    y, x = _check_batch(y, x)
+
+    table = {}
+    for name, fit in (("l1", fit_lines_l1), ("l2", fit_lines_l2)):
+        slope, intercept = fit(y, x)
+        table[name + "_slope"] = slope
+        table[name + "_intercept"] = intercept
+        table[name + "_r2"] = r_squared(y, x, slope, intercept)
+
+    return table
+
+
+class OnlineLineFit:
+    """!@brief Least squares fit of a line y = a * x + b, updated in constant
+    time as points are added and removed
+
+    @details The fit keeps the number of points, the means of x and y, and the
+    sums of the squared deviations of x and y from their means and of their
+    products, the sufficient statistics of the fit. They are updated with
+    Welford's formulas, which avoid the cancellations of the raw sums of x, y,
+    xy and x² when x is large, as for time stamps. A sliding window is fitted
+    by adding each new point and removing the oldest one.
+
+    @param x the x values of the first points, numpy array, optional
+    @param y the y values of the first points, numpy array, optional"""
+
+    def __init__(self, x=(), y=()):
+        self.n = 0
+        self.mean_x = 0.0
+        self.mean_y = 0.0
+        self.sum_xx = 0.0
+        self.sum_xy = 0.0
+        self.sum_yy = 0.0
+        for x_i, y_i in zip(x, y):
+            self.add(x_i, y_i)
+
+    def __len__(self):
+        return self.n
+
+    def add(self, x, y):
+        """!@brief Add a point to the fit
+
+        @param x the x value, float
+        @param y the y value, float"""
+
+        self.n += 1
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.mean_x += dx / self.n
+        self.mean_y += dy / self.n
+        self.sum_xx += dx * (x - self.mean_x)
+        self.sum_xy += dx * (y - self.mean_y)
+        self.sum_yy += dy * (y - self.mean_y)
+
+    def remove(self, x, y):
+        """!@brief Remove a point, previously added, from the fit
+
+        @param x the x value, float
+        @param y the y value, float"""
+
+        if self.n <= 1:
+            self.__init__()
+            return
+
+        self.n -= 1
+        dx = x - self.mean_x
+        dy = y - self.mean_y
+        self.mean_x -= dx / self.n
+        self.mean_y -= dy / self.n
+        self.sum_xx -= dx * (x - self.mean_x)
+        self.sum_xy -= dx * (y - self.mean_y)
+        self.sum_yy -= dy * (y - self.mean_y)
+
+    def params(self):
+        """!@brief Slope and intercept of the least squares line
+
+        @return the slope a and intercept b, numpy array of shape (2,)"""
+
+        if self.n < 2 or self.sum_xx <= 0:
+            raise ValueError("the fit needs at least 2 different x values")
+
+        slope = self.sum_xy / self.sum_xx
+        return np.array([slope, self.mean_y - slope * self.mean_x])
+
+    def r_squared(self):
+        """!@brief Coefficient of determination of the least squares line, as
+        in r_squared
+
+        @return the coefficient of determination, float"""
+
+        residual_sum = max(self.sum_yy - self.params()[0] * self.sum_xy, 0.0)
+        if self.sum_yy <= 0:
+            return 1.0 if residual_sum == 0 else 0.0
+
+        return 1.0 - residual_sum / self.sum_yy
+
+
+class SlidingLineFitL1:
+    """!@brief Least absolute deviations fit of a line y = a * x + b to the
+    last points of a stream
+
+    @details Each new point replaces the oldest one once the window is full,
+    and the window is fitted with fit_line_l1, starting the descent from the
+    point of the window closest to the line of the previous window. The 2
+    points of that line are still in the window unless the oldest one was one
+    of them, so the descent usually stops after 1 or 2 steps rather than about
+    5 from the least squares line. The cost of each point depends on the size
+    of the window only.
+
+    @param window the number of points fitted, int"""
+
+    def __init__(self, window):
+        if window < 2:
+            raise ValueError("window must hold at least 2 points")
+        self.window = window
+        self.x = deque(maxlen=window)
+        self.y = deque(maxlen=window)
+        self.line = None
+
+    def __len__(self):
+        return len(self.x)
+
+    def add(self, x, y):
+        """!@brief Add a point, dropping the oldest one if the window is full,
+        and fit the window
+
+        @param x the x value, float
+        @param y the y value, float
+
+        @return the slope a and intercept b of the window, numpy array of
+        shape (2,), or None while the window holds a single x value"""
+
+        self.x.append(x)
+        self.y.append(y)
+        x_window = np.fromiter(self.x, dtype=float, count=len(self.x))
+        y_window = np.fromiter(self.y, dtype=float, count=len(self.y))
+        if np.all(x_window == x_window[0]):
+            return None
+
+        start = None
+        if self.line is not None:
+            residuals = y_window - (self.line[0] * x_window + self.line[1])
+            start = np.argmin(np.abs(residuals))
+        self.line = fit_line_l1(x_window, y_window, start=start)
+
+        return self.line
@@ -0,0 +1,245 @@
+"""!@file inpaint_funcs.py
+@brief Python script containing the inpainting functions
+for the Image Analysis Coursework
+
+@details The corruption of the coins image is made of thin lines running across
+the whole image. Rather than solving the biharmonic equation over the whole
+image at once, the lines are inpainted locally: either by interpolating across
+each line from the pixels on either side, or by solving the biharmonic equation
+in narrow bands around the lines, split into tiles along the lines which are
+solved in parallel.
+
+List of functions:
+- find_lines: Find the rows and columns of a mask which are entirely masked
+- interpolate_lines: Inpaint full-height lines by interpolating across them
+- biharmonic_bands: Inpaint full-height lines with the biharmonic equation,
+solved in bands around the lines
+- inpaint_lines: Inpaint the lines of a mask, and the rest of the mask
+with skimage's biharmonic inpainting
+
+
+@author T. Breitburd on 14/06/2024"""
+
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.linalg import splu
+from skimage.restoration import inpaint
+from skimage.util import img_as_float
+
+
+def find_lines(mask):
+    """!@brief Find the lines of a mask: the columns and rows which are entirely masked
+
+    @param mask the mask, 2D boolean numpy array
+
+    @return the indices of the masked columns and of the masked rows, numpy arrays"""
+
+    return np.flatnonzero(mask.all(axis=0)), np.flatnonzero(mask.all(axis=1))
+
+
+def interpolate_lines(image, columns, order=3):
+    """!@brief Inpaint full-height lines by interpolating across them, row by row,
+    from the nearest columns which are not lines
+
+    @details Each line column is the Lagrange polynomial through the order + 1
+    nearest known columns, evaluated at the line, so the weights are computed
+    once per line and applied to all rows at once.
+
+    @param image the image, float 2D numpy array
+    @param columns the indices of the line columns, numpy array
+    @param order the order of the interpolation, 1 for linear, 3 for cubic, int
+
+    @return the inpainted image, float numpy array"""
+
+    out = np.array(image, dtype=float)
+    known = np.setdiff1d(np.arange(image.shape[1]), columns)
+
+    for column in columns:
+        # Nearest known columns, half on each side unless near the image edges
+        split = np.searchsorted(known, column)
+        n_left = min(max((order + 1) // 2, order + 1 - (len(known) - split)), split)
+        nodes = known[slice(split - n_left, split - n_left + order + 1)]
+
+        # Lagrange weights of the nodes at the line
+        weights = np.ones(len(nodes))
+        for i, node in enumerate(nodes):
+            others = np.delete(nodes, i)
+            weights[i] = np.prod((column - others) / (node - others))
+
+        out[:, column] = out[:, nodes] @ weights
+
+    return out
+
+
+def _biharmonic_stencil():
+    """!@brief Get the 13-point stencil of the biharmonic operator, the
+    5-point Laplacian applied twice
+
+    @return the offsets, (13, 2) int numpy array, and the coefficients,
+    float numpy array"""
+
+    laplacian = {(0, 0): -4, (1, 0): 1, (-1, 0): 1, (0, 1): 1, (0, -1): 1}
+    stencil = {}
+    for (dy1, dx1), c1 in laplacian.items():
+        for (dy2, dx2), c2 in laplacian.items():
+            offset = (dy1 + dy2, dx1 + dx2)
+            stencil[offset] = stencil.get(offset, 0) + c1 * c2
+
+    return np.array(list(stencil.keys())), np.array(list(stencil.values()), float)
+
+
+def _reflect(index, size):
+    """!@brief Reflect indices falling outside [0, size) back inside,
+    repeating the edge pixel
+
+    @param index the indices, within 2 of the range, int numpy array
+    @param size the size of the axis, int
+
+    @return the reflected indices, int numpy array"""
+
+    index = np.where(index < 0, -index - 1, index)
+    return np.where(index >= size, 2 * size - index - 1, index)
+
+
+def _solve_biharmonic(image, mask):
+    """!@brief Inpaint the masked pixels by solving the biharmonic equation,
+    with the image reflected at its borders
+
+    @param image the image, float 2D numpy array
+    @param mask the pixels to inpaint, boolean 2D numpy array
+
+    @return the inpainted image, float numpy array"""
+
+    rows, cols = image.shape
+    values = image.ravel()
+    unknown = np.flatnonzero(mask)
+    n_unknown = len(unknown)
+    index = np.full(image.size, -1)
+    index[unknown] = np.arange(n_unknown)
+    row, col = np.divmod(unknown, cols)
+
+    # One equation per unknown pixel, the known neighbours go to the right-hand side
+    entries = []
+    rhs = np.zeros(n_unknown)
+    offsets, coefs = _biharmonic_stencil()
+    for (dy, dx), coef in zip(offsets, coefs):
+        neighbour = _reflect(row + dy, rows) * cols + _reflect(col + dx, cols)
+        j = index[neighbour]
+        is_unknown = j >= 0
+        entries.append((np.flatnonzero(is_unknown), j[is_unknown], coef))
+        rhs[~is_unknown] -= coef * values[neighbour[~is_unknown]]
+
+    matrix = coo_matrix(
+        (
+            np.concatenate([np.full(len(i), coef) for i, _, coef in entries]),
+            (
+                np.concatenate([i for i, _, _ in entries]),
+                np.concatenate([j for _, j, _ in entries]),
+            ),
+        ),
+        shape=(n_unknown, n_unknown),
+    ).tocsc()
+
+    out = np.array(image, dtype=float)
+    out.ravel()[unknown] = splu(matrix).solve(rhs)
+
+    return out
+
+
+def biharmonic_bands(image, mask, columns, tile=None, halo=16, workers=None):
+    """!@brief Inpaint full-height lines with the biharmonic equation, solved in
+    bands around the lines, in tiles along the lines run in parallel
+
+    @details The biharmonic stencil reaches 2 pixels, so lines more than 3
+    columns apart are independent, and each group of close lines is solved in a
+    band with 2 known columns on either side. Without tiles, this gives the same
+    result as solving the whole image at once. Tiles overlap by halo rows on
+    each side, of which only the middle is kept.
+
+    @param image the image, float 2D numpy array
+    @param mask the pixels to inpaint, boolean 2D numpy array
+    @param columns the indices of the line columns, numpy array
+    @param tile the number of rows per tile, the whole height by default, int
+    @param halo the number of extra rows on each side of the tiles, int
+    @param workers the number of threads, the number of CPUs by default, int
+
+    @return the inpainted image, float numpy array"""
+
+    rows, cols = image.shape
+    tile = tile or rows
+    out = np.array(image, dtype=float)
+
+    # Group the lines into bands, with the columns the stencil reaches
+    groups = np.split(columns, np.flatnonzero(np.diff(columns) > 3) + 1)
+    jobs = []
+    for group in groups:
+        if len(group) == 0:
+            continue
+        band = slice(max(group[0] - 2, 0), min(group[-1] + 3, cols))
+        for start in range(0, rows, tile):
+            stop = min(start + tile, rows)
+            jobs.append((band, start, stop))
+
+    def solve(job):
+        band, start, stop = job
+        window = slice(max(start - halo, 0), min(stop + halo, rows))
+        solved = _solve_biharmonic(image[window, band], mask[window, band])
+        return job, solved[slice(start - window.start, stop - window.start)]
+
+    # The sparse factorizations release the GIL, so threads run them in parallel
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for (band, start, stop), solved in pool.map(solve, jobs):
+            out[start:stop, band] = solved
+
+    return out
+
+
+def inpaint_lines(image, mask, method="cubic", tile=None, workers=None):
+    """!@brief Inpaint the masked pixels of an image, the full-length lines
+    locally and the rest with skimage's biharmonic inpainting
+
+    @details The columns are inpainted first and the rows then, from the
+    inpainted columns. What is left of the mask, if anything, is passed to
+    skimage.restoration.inpaint.inpaint_biharmonic one region at a time.
+
+    @param image the image, 2D numpy array
+    @param mask the pixels to inpaint, boolean 2D numpy array
+    @param method "cubic" or "linear" to interpolate across the lines,
+    "biharmonic" to solve the biharmonic equation around them, string
+    @param tile the number of rows per tile for the biharmonic method, int
+    @param workers the number of threads for the biharmonic method, int
+
+    @return the inpainted image, float numpy array in the range of img_as_float"""
+
+    if method not in ("cubic", "linear", "biharmonic"):
+        raise ValueError("method must be 'cubic', 'linear' or 'biharmonic'")
+
+    out = img_as_float(image).astype(float)
+    mask = np.asarray(mask, dtype=bool)
+    columns, rows = find_lines(mask)
+
+    # Rows are inpainted as the columns of the transposed image
+    for lines, transpose in ((columns, False), (rows, True)):
+        if len(lines) == 0:
+            continue
+        target = out.T if transpose else out
+        line_mask = np.zeros_like(target, dtype=bool)
+        line_mask[:, lines] = True
+        if not transpose:
+            # The rows are still unknown when solving the columns
+            line_mask[rows] = True
+        if method == "biharmonic":
+            target = biharmonic_bands(target, line_mask, lines, tile, workers=workers)
+        else:
+            target = interpolate_lines(target, lines, 3 if method == "cubic" else 1)
+        out = target.T if transpose else target
+
+    # The rest of the mask, which is not on lines
+    rest = mask.copy()
+    rest[:, columns] = False
+    rest[rows] = False
+    if rest.any():
+        out = inpaint.inpaint_biharmonic(out, rest, split_into_regions=True)
+
+    return out
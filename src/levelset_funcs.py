@@ -0,0 +1,617 @@
+"""!@file levelset_funcs.py
+@brief Python script containing the level set segmentation functions
+for the Image Analysis Coursework
+
+@details The Chan-Vese segmentation of skimage, with the same update of the
+level set, extended with a record of the energy and of the time of each
+iteration, an optional stopping criterion on the relative change of the energy,
+and a multiscale mode: the level set is first evolved on a reduced image, and
+upsampled to initialise it on the next, larger, image of the pyramid, so most of
+the iterations are done on small images. A narrow band version only updates the
+level set near its zero level, so the cost of an iteration grows with the
+length of the contour rather than with the area of the image.
+
+List of functions:
+- chan_vese_energy: Energy of a level set for the Chan-Vese segmentation
+- chan_vese: Chan-Vese segmentation, as in skimage, recording its convergence
+- chan_vese_narrow_band: Chan-Vese segmentation updating only a band around the
+contour
+- chan_vese_multiscale: Chan-Vese segmentation solved from coarse to fine
+
+
+@author T. Breitburd on 14/06/2024"""
+
+import time
+import numpy as np
+from scipy.ndimage import distance_transform_edt
+from skimage.transform import resize
+
+
+def _heaviside(x, eps=1.0):
+    """!@brief Regularised Heaviside function
+
+    @param x the values, numpy array
+    @param eps the width of the regularisation, float
+
+    @return the Heaviside function of the values, numpy array"""
+
+    return 0.5 * (1.0 + (2.0 / np.pi) * np.arctan(x / eps))
+
+
+def _delta(x, eps=1.0):
+    """!@brief Regularised Dirac function, the derivative of _heaviside
+
+    @param x the values, numpy array
+    @param eps the width of the regularisation, float
+
+    @return the Dirac function of the values, numpy array"""
+
+    return eps / (eps**2 + x**2)
+
+
+def _init_level_set(init_level_set, shape, dtype):
+    """!@brief Initial level set, as in skimage's chan_vese
+
+    @param init_level_set "checkerboard" for sin(pi x / 5) sin(pi y / 5), "disk"
+    or "small disk" for a disk at the centre of half or a quarter of the size
+    of the image, or a numpy array
+    @param shape the shape of the image, tuple
+    @param dtype the type of the level set, numpy dtype
+
+    @return the level set, numpy array"""
+
+    if not isinstance(init_level_set, str):
+        return np.asarray(init_level_set).astype(dtype, copy=False)
+
+    if init_level_set == "checkerboard":
+        rows = np.arange(shape[0], dtype=dtype).reshape(shape[0], 1) * (np.pi / 5)
+        cols = np.arange(shape[1], dtype=dtype) * (np.pi / 5)
+        return np.sin(rows) * np.sin(cols)
+
+    if init_level_set in ("disk", "small disk"):
+        centre = np.ones(shape)
+        centre_y, centre_x = int((shape[0] - 1) / 2), int((shape[1] - 1) / 2)
+        centre[centre_y, centre_x] = 0.0
+        radius = float(min(centre_x, centre_y))
+        if init_level_set == "disk":
+            phi = (radius - distance_transform_edt(centre)) / radius
+        else:
+            phi = (radius / 2.0 - distance_transform_edt(centre)) / (radius * 1.5)
+        return phi.astype(dtype)
+
+    raise ValueError(
+        "init_level_set must be 'checkerboard', 'disk', 'small disk' or an array"
+    )
+
+
+def _averages(image, inside):
+    """!@brief Mean of the image inside and outside a region, weighted by the
+    membership of the pixels to the region
+
+    @param image the image, numpy array
+    @param inside the membership of the pixels to the region, in [0, 1],
+    numpy array
+
+    @return the mean inside and the mean outside the region, floats"""
+
+    outside = 1.0 - inside
+    size_inside = np.sum(inside)
+    size_outside = np.sum(outside)
+    mean_inside = np.sum(image * inside)
+    mean_outside = np.sum(image * outside)
+    if size_inside != 0:
+        mean_inside /= size_inside
+    if size_outside != 0:
+        mean_outside /= size_outside
+
+    return mean_inside, mean_outside
+
+
+def chan_vese_energy(image, phi, mu, lambda1, lambda2):
+    """!@brief Energy of a level set for the Chan-Vese segmentation, as in
+    skimage: the length of the contour weighted by mu, plus the squared
+    differences to the mean inside and outside the contour weighted by lambda1
+    and lambda2
+
+    @param image the image, float 2D numpy array
+    @param phi the level set, float 2D numpy array
+    @param mu the weight of the length of the contour, float
+    @param lambda1 the weight of the differences inside the contour, float
+    @param lambda2 the weight of the differences outside the contour, float
+
+    @return the energy, float"""
+
+    inside = _heaviside(phi)
+    mean_inside, mean_outside = _averages(image, inside)
+    region_inside = lambda1 * (image - mean_inside) ** 2 * inside
+    region_outside = lambda2 * (image - mean_outside) ** 2 * (1.0 - inside)
+
+    padded = np.pad(phi, 1, mode="edge")
+    grad_y = (padded[2:, 1:-1] - padded[:-2, 1:-1]) / 2.0
+    grad_x = (padded[1:-1, 2:] - padded[1:-1, :-2]) / 2.0
+    length = mu * _delta(phi) * np.sqrt(grad_x**2 + grad_y**2)
+
+    return np.sum(region_inside) + np.sum(region_outside) + np.sum(length)
+
+
+def _chan_vese_update(image, P, mean_inside, mean_outside, mu, lambda1, lambda2, dt):
+    """!@brief One semi-implicit update of the level set, as in skimage, given
+    the means inside and outside the contour
+
+    @param image the image, float 2D numpy array
+    @param P the level set, with 1 more pixel on each side than the image,
+    float 2D numpy array
+    @param mean_inside the mean of the image inside the contour, float
+    @param mean_outside the mean of the image outside the contour, float
+    @param mu the weight of the length of the contour, float
+    @param lambda1 the weight of the differences inside the contour, float
+    @param lambda2 the weight of the differences outside the contour, float
+    @param dt the time step, float
+
+    @return the updated level set, of the shape of the image, float numpy array"""
+
+    eta = 1e-16
+    phi = P[1:-1, 1:-1]
+
+    # Forward, backward and central differences
+    phixp = P[1:-1, 2:] - P[1:-1, 1:-1]
+    phixn = P[1:-1, 1:-1] - P[1:-1, :-2]
+    phix0 = (P[1:-1, 2:] - P[1:-1, :-2]) / 2.0
+    phiyp = P[2:, 1:-1] - P[1:-1, 1:-1]
+    phiyn = P[1:-1, 1:-1] - P[:-2, 1:-1]
+    phiy0 = (P[2:, 1:-1] - P[:-2, 1:-1]) / 2.0
+
+    # Coefficients of the curvature term
+    C1 = 1.0 / np.sqrt(eta + phixp**2 + phiy0**2)
+    C2 = 1.0 / np.sqrt(eta + phixn**2 + phiy0**2)
+    C3 = 1.0 / np.sqrt(eta + phix0**2 + phiyp**2)
+    C4 = 1.0 / np.sqrt(eta + phix0**2 + phiyn**2)
+    K = P[1:-1, 2:] * C1 + P[1:-1, :-2] * C2 + P[2:, 1:-1] * C3 + P[:-2, 1:-1] * C4
+
+    region = (
+        -lambda1 * (image - mean_inside) ** 2 + lambda2 * (image - mean_outside) ** 2
+    )
+
+    new_phi = phi + (dt * _delta(phi)) * (mu * K + region)
+    return new_phi / (1 + mu * dt * _delta(phi) * (C1 + C2 + C3 + C4))
+
+
+def _chan_vese_step(image, phi, mu, lambda1, lambda2, dt):
+    """!@brief One semi-implicit update of the level set, as in skimage
+
+    @param image the image, float 2D numpy array
+    @param phi the level set, float 2D numpy array
+    @param mu the weight of the length of the contour, float
+    @param lambda1 the weight of the differences inside the contour, float
+    @param lambda2 the weight of the differences outside the contour, float
+    @param dt the time step, float
+
+    @return the updated level set, float numpy array"""
+
+    mean_inside, mean_outside = _averages(image, (phi > 0).astype(image.dtype))
+    P = np.pad(phi, 1, mode="edge")
+
+    return _chan_vese_update(
+        image, P, mean_inside, mean_outside, mu, lambda1, lambda2, dt
+    )
+
+
+def chan_vese(
+    image,
+    mu=0.25,
+    lambda1=1.0,
+    lambda2=1.0,
+    tol=1e-3,
+    max_num_iter=500,
+    dt=0.5,
+    init_level_set="checkerboard",
+    energy_tol=None,
+    callback=None,
+    extended_output=False,
+):
+    """!@brief Chan-Vese segmentation, with the same iterations as skimage's
+    chan_vese, recording the energy and the time of each iteration
+
+    @details The iterations stop when the root mean square change of the level
+    set is below tol, as in skimage, or when the relative change of the energy
+    is below energy_tol, or after max_num_iter iterations. With energy_tol None,
+    the segmentation and the level set are the same as skimage's.
+
+    @param image the image, 2D numpy array
+    @param mu the weight of the length of the contour, float
+    @param lambda1 the weight of the differences inside the contour, float
+    @param lambda2 the weight of the differences outside the contour, float
+    @param tol the tolerance on the change of the level set, float
+    @param max_num_iter the largest number of iterations, int
+    @param dt the time step, float
+    @param init_level_set the initial level set, "checkerboard", "disk",
+    "small disk" or a float numpy array of the shape of the image
+    @param energy_tol the tolerance on the relative change of the energy, or None
+    to only stop on tol, float
+    @param callback a function called after each iteration with the iteration
+    number, the energy and the time since the start in seconds, callable
+    @param extended_output also return the level set and the record of the
+    iterations, bool
+
+    @return the segmentation, boolean numpy array, and if extended_output, the
+    level set, float numpy array, and the record of the iterations, a dictionary
+    of lists: "energy" (before the first iteration, then after each one) and
+    "time" (since the start, in seconds)"""
+
+    start = time.perf_counter()
+    if image.ndim != 2:
+        raise ValueError("image must be a 2D array")
+
+    float_dtype = np.float32 if image.dtype in (np.float16, np.float32) else np.float64
+    phi = _init_level_set(init_level_set, image.shape, float_dtype)
+    if phi.shape != image.shape:
+        raise ValueError("the initial level set must have the shape of the image")
+
+    # Rescale the image to [0, 1]
+    image = image.astype(float_dtype, copy=False)
+    image = image - np.min(image)
+    if np.max(image) != 0:
+        image = image / np.max(image)
+
+    energy = chan_vese_energy(image, phi, mu, lambda1, lambda2)
+    history = {"energy": [energy], "time": [time.perf_counter() - start]}
+
+    change = tol + 1
+    energy_change = np.inf
+    iteration = 0
+    while (
+        change > tol
+        and (energy_tol is None or energy_change > energy_tol)
+        and iteration < max_num_iter
+    ):
+        old_phi = phi
+        phi = _chan_vese_step(image, phi, mu, lambda1, lambda2, dt)
+        change = np.sqrt(((phi - old_phi) ** 2).mean())
+
+        new_energy = chan_vese_energy(image, phi, mu, lambda1, lambda2)
+        energy_change = abs(new_energy - energy) / max(
+            abs(energy), np.finfo(float).tiny
+        )
+        energy = new_energy
+        iteration += 1
+
+        history["energy"].append(energy)
+        history["time"].append(time.perf_counter() - start)
+        if callback is not None:
+            callback(iteration, energy, history["time"][-1])
+
+    segmentation = phi > 0
+    if extended_output:
+        return segmentation, phi, history
+    return segmentation
+
+
+def _refresh_edges(P):
+    """!@brief Copy the edges of a level set to its padding, as np.pad with
+    mode="edge" (the corners are not used by the stencil)
+
+    @param P the padded level set, float 2D numpy array, modified in place"""
+
+    P[0, 1:-1] = P[1, 1:-1]
+    P[-1, 1:-1] = P[-2, 1:-1]
+    P[1:-1, 0] = P[1:-1, 1]
+    P[1:-1, -1] = P[1:-1, -2]
+
+
+def _find_band(P, box, width):
+    """!@brief Find the band of the pixels closer than width to the contour, in a
+    box holding the whole contour
+
+    @details The distance of each pixel to the contour is its distance to the
+    nearest pixel of the other sign, which is always on the contour, so the
+    distances in the box are exact.
+
+    @param P the padded level set, float 2D numpy array
+    @param box the rows and the columns of the box, in the unpadded image,
+    tuple of slices
+    @param width the half width of the band, float
+
+    @return the flat indices, in P, of the pixels of the band, int numpy array"""
+
+    rows, cols = box
+    crop = P[slice(rows.start + 1, rows.stop + 1), slice(cols.start + 1, cols.stop + 1)]
+    inside = crop > 0
+    if inside.all() or not inside.any():
+        return np.zeros(0, dtype=np.intp)
+
+    distance = np.where(
+        inside, distance_transform_edt(inside), distance_transform_edt(~inside)
+    )
+
+    band_rows, band_cols = np.nonzero(distance <= width)
+    return (band_rows + rows.start + 1) * P.shape[1] + band_cols + cols.start + 1
+
+
+def chan_vese_narrow_band(
+    image,
+    mu=0.25,
+    lambda1=1.0,
+    lambda2=1.0,
+    tol=1e-3,
+    max_num_iter=500,
+    dt=0.5,
+    init_level_set="checkerboard",
+    energy_tol=None,
+    callback=None,
+    extended_output=False,
+    width=3.0,
+    reinit=5,
+):
+    """!@brief Chan-Vese segmentation updating the level set only in a narrow
+    band around the contour, with the same parameters and outputs as chan_vese
+
+    @details Only the pixels closer than width to the contour are updated,
+    with the update of chan_vese, the others keeping their value. The band is
+    found again every reinit iterations, from the distances to the contour
+    computed in the bounding box of the previous band, and the means inside and
+    outside the contour are updated from the pixels changing side, so an
+    iteration costs O(band) and a new band O(bounding box), not O(image).
+    The level set values are kept when the band is found again: resetting them
+    to the signed distance to the contour rounds the contour to the pixels,
+    which stalls it when it moves by less than a pixel between the resets.
+    The energy is the one of chan_vese_energy with a sharp Heaviside function,
+    the length term being summed over the band only. The root mean square
+    change of the level set is taken over the pixels of the band, the only
+    ones updated: over the whole image, it would fall below tol as soon as the
+    contour is short, and the iterations would stop at once. They also do not
+    stop, but after max_num_iter iterations, before the band has been found
+    again once. Away from the band, no new contour can appear, so the
+    segmentation is close to, but not the same as, chan_vese's.
+
+    @param image the image, 2D numpy array
+    @param mu the weight of the length of the contour, float
+    @param lambda1 the weight of the differences inside the contour, float
+    @param lambda2 the weight of the differences outside the contour, float
+    @param tol the tolerance on the change of the level set in the band, float
+    @param max_num_iter the largest number of iterations, int
+    @param dt the time step, float
+    @param init_level_set the initial level set, "checkerboard", "disk",
+    "small disk" or a float numpy array of the shape of the image
+    @param energy_tol the tolerance on the relative change of the energy, or None
+    to only stop on tol, float
+    @param callback a function called after each iteration with the iteration
+    number, the energy and the time since the start in seconds, callable
+    @param extended_output also return the level set and the record of the
+    iterations, bool
+    @param width the half width of the band, in pixels, float
+    @param reinit the number of iterations between the updates of the band, int
+
+    @return the segmentation, boolean numpy array, and if extended_output, the
+    level set, float numpy array, and the record of the iterations, a dictionary
+    of lists: "energy" (before the first iteration, then after each one) and
+    "time" (since the start, in seconds)"""
+
+    start = time.perf_counter()
+    if image.ndim != 2:
+        raise ValueError("image must be a 2D array")
+
+    float_dtype = np.float32 if image.dtype in (np.float16, np.float32) else np.float64
+    phi = _init_level_set(init_level_set, image.shape, float_dtype)
+    if phi.shape != image.shape:
+        raise ValueError("the initial level set must have the shape of the image")
+
+    # Rescale the image to [0, 1]
+    image = image.astype(float_dtype, copy=False)
+    image = image - np.min(image)
+    if np.max(image) != 0:
+        image = image / np.max(image)
+
+    # Padded level set and image, indexed by the same flat indices
+    n_rows, n_cols = image.shape
+    P = np.pad(phi, 1, mode="edge")
+    flat = P.ravel()
+    stride = P.shape[1]
+    flat_image = np.pad(image, 1).ravel()
+
+    # Sums of the pixels and of their squares, in total and inside the contour
+    inside = phi > 0
+    total = np.array([image.size, image.sum(), (image**2).sum()], dtype=np.float64)
+    sums = np.array(
+        [inside.sum(), image[inside].sum(), (image[inside] ** 2).sum()],
+        dtype=np.float64,
+    )
+
+    def means():
+        outside = total - sums
+        mean_inside = sums[1] / sums[0] if sums[0] != 0 else 0.0
+        mean_outside = outside[1] / outside[0] if outside[0] != 0 else 0.0
+        return mean_inside, mean_outside
+
+    def energy(band):
+        mean_inside, mean_outside = means()
+        outside = total - sums
+        region = lambda1 * (sums[2] - sums[0] * mean_inside**2)
+        region += lambda2 * (outside[2] - outside[0] * mean_outside**2)
+        phi_band = flat[band]
+        grad_x = (flat[band + 1] - flat[band - 1]) / 2.0
+        grad_y = (flat[band + stride] - flat[band - stride]) / 2.0
+        length = mu * _delta(phi_band) * np.sqrt(grad_x**2 + grad_y**2)
+        return region + np.sum(length)
+
+    band = _find_band(P, (slice(0, n_rows), slice(0, n_cols)), width)
+    band_image = flat_image[band]
+
+    current_energy = energy(band)
+    history = {"energy": [current_energy], "time": [time.perf_counter() - start]}
+
+    eta = 1e-16
+    change = tol + 1
+    energy_change = np.inf
+    iteration = 0
+    while (
+        (
+            iteration < reinit
+            or change > tol
+            and (energy_tol is None or energy_change > energy_tol)
+        )
+        and iteration < max_num_iter
+        and len(band) > 0
+    ):
+        # The update of _chan_vese_step, on the band only
+        centre = flat[band]
+        right, left = flat[band + 1], flat[band - 1]
+        down, up = flat[band + stride], flat[band - stride]
+        phix0 = (right - left) / 2.0
+        phiy0 = (down - up) / 2.0
+        C1 = 1.0 / np.sqrt(eta + (right - centre) ** 2 + phiy0**2)
+        C2 = 1.0 / np.sqrt(eta + (centre - left) ** 2 + phiy0**2)
+        C3 = 1.0 / np.sqrt(eta + phix0**2 + (down - centre) ** 2)
+        C4 = 1.0 / np.sqrt(eta + phix0**2 + (centre - up) ** 2)
+        K = right * C1 + left * C2 + down * C3 + up * C4
+
+        mean_inside, mean_outside = means()
+        region = (
+            -lambda1 * (band_image - mean_inside) ** 2
+            + lambda2 * (band_image - mean_outside) ** 2
+        )
+        delta = _delta(centre)
+        new = (centre + (dt * delta) * (mu * K + region)) / (
+            1 + mu * dt * delta * (C1 + C2 + C3 + C4)
+        )
+
+        # Pixels changing side of the contour
+        flipped = (centre > 0) != (new > 0)
+        if flipped.any():
+            sign = np.where(new[flipped] > 0, 1.0, -1.0)
+            values = band_image[flipped]
+            sums += [sign.sum(), (sign * values).sum(), (sign * values**2).sum()]
+
+        flat[band] = new
+        _refresh_edges(P)
+        change = np.sqrt(np.mean((new - centre) ** 2))
+        iteration += 1
+
+        # Find the band again in the bounding box of the band, with a margin
+        if iteration % reinit == 0:
+            band_rows, band_cols = np.divmod(band, stride)
+            margin = int(np.ceil(width)) + 2
+            box = (
+                slice(
+                    max(band_rows.min() - 1 - margin, 0),
+                    min(band_rows.max() + margin, n_rows),
+                ),
+                slice(
+                    max(band_cols.min() - 1 - margin, 0),
+                    min(band_cols.max() + margin, n_cols),
+                ),
+            )
+            band = _find_band(P, box, width)
+            band_image = flat_image[band]
+
+        new_energy = energy(band)
+        energy_change = abs(new_energy - current_energy) / max(
+            abs(current_energy), np.finfo(float).tiny
+        )
+        current_energy = new_energy
+
+        history["energy"].append(current_energy)
+        history["time"].append(time.perf_counter() - start)
+        if callback is not None:
+            callback(iteration, current_energy, history["time"][-1])
+
+    phi = P[1:-1, 1:-1].copy()
+    segmentation = phi > 0
+    if extended_output:
+        return segmentation, phi, history
+    return segmentation
+
+
+def chan_vese_multiscale(
+    image,
+    levels=3,
+    mu=0.25,
+    lambda1=1.0,
+    lambda2=1.0,
+    tol=1e-3,
+    max_num_iter=500,
+    dt=0.5,
+    init_level_set="checkerboard",
+    energy_tol=1e-4,
+    callback=None,
+    extended_output=False,
+    narrow_band=False,
+):
+    """!@brief Chan-Vese segmentation solved from coarse to fine, on a pyramid
+    of the image halved in size at each level
+
+    @details The level set is evolved on the smallest image first, from
+    init_level_set, until it converges, then upsampled with bilinear
+    interpolation to initialise it on the next level, up to the full size image.
+    The coarse levels cost a quarter of the next one per iteration, and the
+    finer levels start close to the solution, so they need few iterations.
+
+    @param image the image, 2D numpy array
+    @param levels the number of levels of the pyramid, 1 for the full size only,
+    int
+    @param mu the weight of the length of the contour, float
+    @param lambda1 the weight of the differences inside the contour, float
+    @param lambda2 the weight of the differences outside the contour, float
+    @param tol the tolerance on the change of the level set, float
+    @param max_num_iter the largest number of iterations per level, int
+    @param dt the time step, float
+    @param init_level_set the initial level set of the smallest level,
+    "checkerboard", "disk", "small disk" or a float numpy array of its shape
+    @param energy_tol the tolerance on the relative change of the energy, or
+    None to only stop on tol, float
+    @param callback a function called after each iteration with the level (0
+    for the full size), the iteration number in the level, the energy and the
+    time since the start in seconds, callable
+    @param extended_output also return the level set and the record of the
+    iterations, bool
+    @param narrow_band solve each level with chan_vese_narrow_band rather than
+    chan_vese, bool
+
+    @return the segmentation, boolean numpy array, and if extended_output, the
+    level set, float numpy array, and the record of the iterations, a dictionary
+    of lists: "level", "energy" and "time" (since the start, in seconds)"""
+
+    start = time.perf_counter()
+    image = np.asarray(image, dtype=float)
+
+    # Pyramid of the image, from the full size to the smallest
+    pyramid = [image]
+    for _ in range(levels - 1):
+        shape = tuple(max(size // 2, 1) for size in pyramid[-1].shape)
+        pyramid.append(resize(pyramid[-1], shape, anti_aliasing=True))
+
+    solver = chan_vese_narrow_band if narrow_band else chan_vese
+    phi = init_level_set
+    history = {"level": [], "energy": [], "time": []}
+    for level in range(levels - 1, -1, -1):
+        if not isinstance(phi, str) and phi.shape != pyramid[level].shape:
+            phi = resize(phi, pyramid[level].shape, order=1)
+
+        # Times since the start of this level, shifted to the start of all
+        offset = time.perf_counter() - start
+
+        def record(iteration, energy, elapsed, level=level, offset=offset):
+            if callback is not None:
+                callback(level, iteration, energy, elapsed + offset)
+
+        _, phi, level_history = solver(
+            pyramid[level],
+            mu=mu,
+            lambda1=lambda1,
+            lambda2=lambda2,
+            tol=tol,
+            max_num_iter=max_num_iter,
+            dt=dt,
+            init_level_set=phi,
+            energy_tol=energy_tol,
+            callback=record,
+            extended_output=True,
+        )
+
+        history["level"] += [level] * len(level_history["energy"])
+        history["energy"] += level_history["energy"]
+        history["time"] += [elapsed + offset for elapsed in level_history["time"]]
+
+    segmentation = phi > 0
+    if extended_output:
+        return segmentation, phi, history
+    return segmentation
@@ -8,14 +8,10 @@ thresholded using Otsu's method, and closing is applied to remove small objects.
 
 @author T.Breitburd on 09/06/2024"""
 
-import numpy as np
 import matplotlib.pyplot as plt
 import os
 import skimage
-from skimage.filters import threshold_otsu
-from skimage.measure import label
-from skimage.morphology import disk, closing
-from skimage.segmentation import flood_fill
+from pipelines import find_ct_seeds, grow_ct_lungs
 
 # Load the image and reduce to 1 channel
 ct = skimage.io.imread("./data/CT.png")
@@ -25,49 +21,17 @@ ct = ct[:, :, 0]
 # First identify where the lungs are
 # ----------------------------------------
 
-# Threshold the image
-threshold = threshold_otsu(ct)
-ct_thresh = ct < threshold
-
-# Apply closing to remove the small objects
-ct_masked = skimage.morphology.closing(ct_thresh, disk(3))
+# Threshold the image, and find the seeds in the 2 smallest regions
+ct_regions, seeds = find_ct_seeds(ct)
 
 print("Image thresholded.")
-
-# Identify regions in the thresholded image
-ct_regions = label(ct_masked)
-n_regions = len(np.unique(ct_regions))
-
-# The lung regions are going be the 2 smallest ones
-region_sizes = np.bincount(ct_regions.flatten())
-
-# Get indices of 2 smallest values
-indices = np.argpartition(region_sizes, 2)[:2]
-
-# Get seeds for the region growing
-idx1 = len(np.argwhere(ct_regions == indices[0])) // 2
-idx2 = len(np.argwhere(ct_regions == indices[1])) // 2
-
-seed1 = tuple(np.argwhere(ct_regions == indices[0])[idx1])
-seed2 = tuple(np.argwhere(ct_regions == indices[1])[idx2])
-
 print("Seeds found.")
 # ----------------------------------------
 # Region Growing
 # ----------------------------------------
 
-# First one
-mask_flood = flood_fill(ct, seed1, new_value=255, tolerance=30)
-# Then the other
-mask_flood = flood_fill(mask_flood, seed2, new_value=255, tolerance=30)
-
-# Threshold the image
-threshold = 254
-
-binary = mask_flood > threshold
-
-# Apply closing to get rid of inter-lung tissue
-masked = closing(binary, disk(3))
+# Flood fill from both seeds, and apply closing to get rid of inter-lung tissue
+mask_flood, masked = grow_ct_lungs(ct, seeds)
 
 print("Region growing done.")
 
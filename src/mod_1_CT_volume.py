@@ -0,0 +1,75 @@
+"""!@file mod_1_CT_volume.py
+
+@brief This file contains code for the segmentation of a CT volume
+
+@details The lungs are segmented in 3D with the same steps as in mod_1_CT_custom:
+the volume is thresholded using Otsu's method and closed with a ball, the seeds
+are in the 2 smallest regions, and the lungs are found by region growing
+and closed again. The volume is a stack of slices stored as a .npy file, which
+is memory-mapped and processed one slab of slices at a time, so it never has
+to fit in RAM.
+
+Usage: python src/mod_1_CT_volume.py volume.npy [mask.npy] [connectivity]
+where connectivity is 1 (6-connectivity, default) or 3 (26-connectivity).
+
+@author T. Breitburd on 14/06/2024"""
+
+import os
+import sys
+import tempfile
+from volume_funcs import (
+    load_volume,
+    create_volume,
+    otsu_threshold_3d,
+    closing_3d,
+    find_seeds_3d,
+    region_growing_3d,
+)
+
+volume_path = sys.argv[1]
+mask_path = sys.argv[2] if len(sys.argv) > 2 else volume_path[:-4] + "_mask.npy"
+connectivity = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+
+# Memory-map the volume
+ct = load_volume(volume_path)
+
+# Intermediate volumes are memory-mapped too
+tmp_dir = tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(mask_path)))
+
+# ----------------------------------------
+# First identify where the lungs are
+# ----------------------------------------
+
+# Threshold the volume, and apply closing to remove the small objects
+threshold = otsu_threshold_3d(ct)
+ct_masked = closing_3d(
+    lambda start, stop: ct[start:stop] < threshold,
+    3,
+    create_volume(os.path.join(tmp_dir.name, "ct_masked.npy"), ct.shape),
+)
+
+print("Volume thresholded.")
+
+# The lung regions are going be the 2 smallest ones
+seeds = find_seeds_3d(ct_masked, n_seeds=2, connectivity=connectivity)
+
+print("Seeds found:", seeds)
+
+# ----------------------------------------
+# Region Growing
+# ----------------------------------------
+
+mask_flood = create_volume(os.path.join(tmp_dir.name, "mask_flood.npy"), ct.shape)
+for seed in seeds:
+    region_growing_3d(
+        ct, seed, threshold=0.15, connectivity=connectivity, out=mask_flood
+    )
+
+# Apply closing to get rid of inter-lung tissue
+masked = closing_3d(mask_flood, 3, create_volume(mask_path, ct.shape))
+masked.flush()
+
+print("Region growing done.")
+print("Mask saved to", mask_path)
+
+tmp_dir.cleanup()
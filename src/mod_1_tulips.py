@@ -13,11 +13,9 @@ to segment the tulips. The final mask is then opened to remove any remaining noi
 import skimage
 import numpy as np
 import matplotlib.pyplot as plt
-from skimage.filters import threshold_otsu
-from skimage.morphology import opening, disk
-from skimage.segmentation import chan_vese
 import os
 from plot_funcs import plot_tulips_hsv, plot_hue_hist
+from pipelines import segment_tulips
 
 # Set the random seed
 np.random.seed(75016)
@@ -27,11 +25,14 @@ tulips = skimage.io.imread("./data/noisy_flower.jpg")
 tulips = tulips[:, :, :3]
 
 # ----------------------------------------
-# Preprocess the image
+# Segmentation
 # ----------------------------------------
 
-# Switch to Hue-Saturation-Value (HSV) color space
-tulips_hsv = skimage.color.rgb2hsv(tulips)
+# Threshold the hue channel with Otsu's method, open the mask to remove the small
+# white spots, blur it and segment it with Chan-Vese, then open the result
+tulips_hsv, blurred_mask, cv_mask, cv_mask_op = segment_tulips(tulips)
+
+print("Segmentation done.")
 
 # Plot grayscale image of each channel of the HSV image
 plot_tulips_hsv(tulips_hsv)
@@ -39,30 +40,6 @@ plot_tulips_hsv(tulips_hsv)
 # Plot the histogram of the Hue channel
 plot_hue_hist(tulips_hsv[:, :, 0])
 
-# ----------------------------------------
-# Segmentation
-# ----------------------------------------
-
-# Threshold the image on hue channel
-thresh = threshold_otsu(tulips_hsv[:, :, 0])
-tulips_mask = tulips_hsv[:, :, 0] > thresh
-
-# Apply opening to remove the small white spots, and keep the larger ones (purple tulips)
-op_mask = opening(tulips_mask)
-
-print("Image thresholded.")
-
-# Gaussian blur to smooth the mask
-blurred_mask = skimage.filters.gaussian(op_mask, sigma=2)
-
-# Apply the Chan-Vese segmentation, get
-cv_mask = chan_vese(blurred_mask, mu=0.1, lambda2=1.5)
-
-# Apply opening
-cv_mask_op = opening(cv_mask, disk(4))
-
-print("Segmentation done.")
-
 # ----------------------------------------
 # Plot the results
 # ----------------------------------------
@@ -0,0 +1,51 @@
+"""!@file mod_1_tulips_tiled.py
+
+@brief This file contains code for the segmentation of a large tulips image
+
+@details The tulips are segmented with the same steps as in mod_1_tulips: the
+hue channel is thresholded using Otsu's method and opened, blurred, segmented
+with Chan-Vese and opened again. The image is an RGB image stored as a .npy
+file, which is memory-mapped and processed one tile at a time, with halos as
+wide as the reach of each step, so it never has to fit in RAM.
+
+Usage: python src/mod_1_tulips_tiled.py image.npy [mask.npy] [tile]
+where tile is the number of rows and columns of the tiles (1024 by default).
+
+@author T. Breitburd on 14/06/2024"""
+
+import os
+import sys
+import tempfile
+from pipelines import segment_tulips_tiled
+from volume_funcs import load_volume, create_volume
+
+image_path = sys.argv[1]
+mask_path = sys.argv[2] if len(sys.argv) > 2 else image_path[:-4] + "_mask.npy"
+tile = int(sys.argv[3]) if len(sys.argv) > 3 else 1024
+
+# Memory-map the image
+tulips = load_volume(image_path)
+
+# Intermediate images are memory-mapped too
+tmp_dir = tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(mask_path)))
+
+# ----------------------------------------
+# Segmentation
+# ----------------------------------------
+
+timings = {}
+mask = segment_tulips_tiled(
+    tulips,
+    create_volume(mask_path, tulips.shape[:2]),
+    tmp_dir.name,
+    tile=tile,
+    timings=timings,
+)
+mask.flush()
+
+print("Segmentation done.")
+for name, seconds in timings.items():
+    print(f"{name:<12}{seconds:>10.2f} s")
+print("Mask saved to", mask_path)
+
+tmp_dir.cleanup()
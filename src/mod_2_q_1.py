@@ -7,12 +7,9 @@
 @author T. Breitburd on 09/06/2024"""
 
 import numpy as np
-from scipy.optimize import minimize
 from sklearn.linear_model import LinearRegression
 from plot_funcs import plot_fitted_lines
-
-# https://docs.scipy.org/doc/scipy/tutorial/optimize.html#
-# constrained-minimization-of-multivariate-scalar-functions-minimize
+from fit_funcs import fit_line_l1
 
 # Load the data
 y_line = np.loadtxt("./data/y_line.txt")
@@ -26,24 +23,9 @@ x = np.arange(len(y_line))
 # ---------------------------
 
 
-# Define the L1 functions to minimize
-def l1_function_noise(params):
-    a, b = params
-    return np.sum(np.abs(y_line - (a * x + b)))
-
-
-def l1_function_outlier(params):
-    a, b = params
-    return np.sum(np.abs(y_outlier - (a * x + b)))
-
-
-# Initial guess for parameters
-initial_guess = [1, 0]
-
-# Minimize the L1 function, using the SLSQP method,
-# as it used for constrained problems
-result_noise = minimize(l1_function_noise, initial_guess, method="SLSQP")
-result_outlier = minimize(l1_function_outlier, initial_guess, method="SLSQP")
+# Exact L1 fits (weighted-median descent, LP fallback)
+result_noise = fit_line_l1(x, y_line)
+result_outlier = fit_line_l1(x, y_outlier)
 
 # Get the results
 print("---------------------------")
@@ -52,22 +34,22 @@ print("---------------------------")
 
 # For the noisy data
 print("For the noisy data:")
-print("a =", result_noise.x[0])
-print("b =", result_noise.x[1])
+print("a =", result_noise[0])
+print("b =", result_noise[1])
 
 # For the data with outliers
 print("For the data with outliers:")
-print("a =", result_outlier.x[0])
-print("b =", result_outlier.x[1])
+print("a =", result_outlier[0])
+print("b =", result_outlier[1])
 
 # Plot the results
 plot_fitted_lines(
-    x, y_line, result_noise.x, "L1 Fitted line for noisy data", "l1_noisy_data.png"
+    x, y_line, result_noise, "L1 Fitted line for noisy data", "l1_noisy_data.png"
 )
 plot_fitted_lines(
     x,
     y_outlier,
-    result_outlier.x,
+    result_outlier,
     "L1 Fitted line for data with outliers",
     "l1_outlier_data.png",
 )
@@ -121,7 +103,7 @@ r2_l2 = model_noise.score(x.reshape(-1, 1), y_line)
 print("R-squared for L2 fit of noisy data:", r2_l2)
 
 # Get fitted line for L1 fit of noisy data
-y_line_l1 = result_noise.x[0] * x + result_noise.x[1]
+y_line_l1 = result_noise[0] * x + result_noise[1]
 
 # Get R-squared for L1 fit of noisy data
 r2_l1 = 1 - np.sum((y_line - y_line_l1) ** 2) / np.sum((y_line - np.mean(y_line)) ** 2)
@@ -15,78 +15,9 @@
 import numpy as np
 import os
 from plot_funcs import plot_signal_vector
+from recon_funcs import fftc, ifftc, iterative_soft_thresholding
 import matplotlib.pyplot as plt
 
-# ------------------------------------------
-# Define the signal reconstruction functions
-# ------------------------------------------
-
-
-def fftc(x):
-    """!@brief Compute the centered FFT of a signal.
-
-    @param x: The input signal.
-
-    @return The centered FFT of the input signal.
-    """
-
-    return 1 / np.sqrt(len(x)) * np.fft.fftshift(np.fft.fft(np.fft.ifftshift(x)))
-
-
-def ifftc(x):
-    """!@brief Compute the centered inverse FFT of a signal.
-
-    @param x: The input signal.
-
-    @return The centered inverse FFT of the input signal.
-    """
-
-    return np.sqrt(len(x)) * np.fft.ifftshift(np.fft.ifft(np.fft.fftshift(x)))
-
-
-def SoftThresh(x, lam):
-    """!@brief Perform soft thresholding on a signal.
-
-    @param x: The input signal.
-    @param lam: The soft threshold value.
-
-    @return The soft thresholded signal.
-    """
-
-    # Compute the difference between the signal and the threshold
-    diff = abs(x) - lam
-
-    # Apply the soft thresholding
-    soft_thresh = (diff > 0.0) * diff * x / abs(x)
-
-    return soft_thresh
-
-
-# Define the ISTA function
-def iterative_soft_thresholding(X, Y, lam, n_iter=100):
-    """!@brief Perform iterative soft thresholding on a signal.
-
-    @param X: The signal in the frequency domain.
-    @param Y: The observed signal.
-    @param lam: The soft threshold value.
-    @param n_iter: The number of iterations.
-
-    @return The reconstructed signal.
-    """
-
-    for i in range(n_iter):
-        # Compute the inverse FT of the signal
-        x = ifftc(X)
-        # Apply soft-thresholding
-        x = SoftThresh(x, lam)
-        # Compute the FT of the signal back
-        # and apply data consistency constraint
-        X = fftc(x)
-        X[Y != 0] = Y[Y != 0]
-
-    return ifftc(X)  # Final inverse transform to time domain
-
-
 # ------------------------------------------
 # a) Generate vector, 10 non-zero entries
 # ------------------------------------------
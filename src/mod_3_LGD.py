@@ -8,21 +8,13 @@ using the linearized ADMM algorithm and the Learned Gradient Descent (LGD) algor
 @author T.Breitburd and Course Instructor on 12/06/24
 """
 
+import argparse
 import os
-import numpy as np
-import astra
-import matplotlib.pyplot as plt
-from skimage.metrics import peak_signal_noise_ratio as compare_psnr
-from skimage.metrics import structural_similarity as compare_ssim
-import torch
-import odl
-import odl.contrib.torch as odl_torch
-from neur_nets import LGD_net
 import sys
+import numpy as np
 
-astra.test()
-
-skip_training = sys.argv[1]
+# The heavy modules (astra, odl, torch, skimage, matplotlib) are only imported
+# by the stages which use them, so the script starts quickly
 
 # -----------------------------------------------------------
 # Plot functions from the given notebook (i.e. authored by the course instructor)
@@ -42,6 +34,8 @@ def plot_grd_truth_FBP(phantom_np, data_np, fbp_np, psnr_fbp, ssim_fbp):
 
     @return None"""
 
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(9, 4))
 
     plt.subplot(131)
@@ -88,6 +82,8 @@ def plot_ADMM_FBP(phantom_np, fbp_np, x_admm_np, psnr_fbp, ssim_fbp, psnr_tv, ss
 
     @return None"""
 
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(9, 4))
 
     plt.subplot(131)
@@ -149,6 +145,8 @@ def plot_ADMM_FBP_LGD(
 
     @return None"""
 
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(12, 4))
 
     plt.subplot(141)
@@ -191,204 +189,331 @@ def plot_ADMM_FBP_LGD(
 
 
 # -----------------------------------------------------------
-# Set up the forward operator (ray transform) in ODL
+# Stages of the reconstruction
 # -----------------------------------------------------------
-print("Setting up the forward operator in ODL...")
-
-# Reconstruction space: functions on the rectangle [-20, 20]^2
-img_size = 256  # discretized with 256 samples per dimension
-reco_space = odl.uniform_discr(
-    min_pt=[-20, -20], max_pt=[20, 20], shape=[img_size, img_size], dtype="float32"
-)
-# Make a parallel beam geometry with flat detector, using number of angles = num_angles
-num_angles = 30
-geometry = odl.tomo.parallel_beam_geometry(reco_space, num_angles=num_angles)
-
-# Create the forward operator, adjoint operator, and the FBO operator in ODL
-fwd_op_odl = odl.tomo.RayTransform(reco_space, geometry)
-fbp_op_odl = odl.tomo.fbp_op(fwd_op_odl, filter_type="Ram-Lak", frequency_scaling=0.6)
-adj_op_odl = fwd_op_odl.adjoint
-
-# Create phantom and noisy projection data in ODL
-phantom_odl = odl.phantom.shepp_logan(reco_space, modified=True)
-data_odl = fwd_op_odl(phantom_odl)
-data_odl += odl.phantom.white_noise(fwd_op_odl.range) * np.mean(data_odl) * 0.1
-fbp_odl = fbp_op_odl(data_odl)
-
-# convert the image and the sinogram to numpy arrays
-phantom_np = phantom_odl.__array__()
-fbp_np = fbp_odl.__array__()
-data_np = data_odl.__array__()
-print("Sinogram size = {}".format(data_np.shape))
-
-# Compute the PSNR and SSIM between the ground truth and the FBP reconstruction
-data_range = np.max(phantom_np) - np.min(phantom_np)
-psnr_fbp = compare_psnr(phantom_np, fbp_np, data_range=data_range)
-ssim_fbp = compare_ssim(phantom_np, fbp_np, data_range=data_range)
 
-# -----------------------------------------------------------
-# Display the ground truth, FBP reconstruction, and the sinogram
-# -----------------------------------------------------------
-plot_grd_truth_FBP(phantom_np, data_np, fbp_np, psnr_fbp, ssim_fbp)
 
+def compare_images(reference, image, data_range):
+    """!@brief Compute the PSNR and SSIM of an image against the reference
 
-# -----------------------------------------------------------
-# Let's solve the TV reconstruction problem
-# using the linearized ADMM algorithm (implemented in ODL).
-# -----------------------------------------------------------
-print("Solving the TV reconstruction problem using ADMM...")
+    @param reference the ground-truth image, numpy array
+    @param image the reconstructed image, numpy array
+    @param data_range the data range, float
 
-# In this example we solve the optimization problem:
-# min_x f(x) + g(Lx) = ||A(x) - y||_2^2 + lam * ||grad(x)||_1,
-# Where:
-# - ``A`` is a parallel beam ray transform,
-# - ``grad`` is the spatial gradient,
-# - ``y`` given noisy data.
+    @return the PSNR and the SSIM, floats"""
 
-# The problem is rewritten in decoupled form as:
-# min_x g(L(x))
-# with a separable sum ``g`` of functionals and the stacked operator ``L``:
+    from skimage.metrics import peak_signal_noise_ratio as compare_psnr
+    from skimage.metrics import structural_similarity as compare_ssim
 
-# g(z) = ||z_1 - g||_2^2 + lam * ||z_2||_1,
-#                ( A(x)    )
-#     z = L(x) = ( grad(x) ).
+    psnr = compare_psnr(reference, image, data_range=data_range)
+    ssim = compare_ssim(reference, image, data_range=data_range)
 
-# Gradient operator for the TV part
-grad = odl.Gradient(reco_space)
+    return psnr, ssim
 
-# Stacking of the two operators
-L = odl.BroadcastOperator(fwd_op_odl, grad)
 
-# Data matching and regularization functionals
-data_fit = odl.solvers.L2NormSquared(fwd_op_odl.range).translated(data_odl)
-lam = 0.015
-reg_func = lam * odl.solvers.L1Norm(grad.range)
-g = odl.solvers.SeparableSum(data_fit, reg_func)
+def setup_forward_operator(img_size=256, num_angles=30):
+    """!@brief Set up the forward operator (ray transform) and the FBP operator in ODL
 
-# We don't use the f functional, setting it to zero
-f = odl.solvers.ZeroFunctional(L.domain)
+    @param img_size the number of samples per dimension, int
+    @param num_angles the number of angles of the parallel beam geometry, int
 
+    @return the reconstruction space, the forward operator and the FBP operator"""
 
-# --- Select parameters and solve using ADMM ---
+    import odl
 
-# Estimated operator norm, add 10 percent for some safety margin
-op_norm = 1.1 * odl.power_method_opnorm(L, maxiter=20)
+    print("Setting up the forward operator in ODL...")
 
-niter = 200  # Number of iterations
-sigma = 2.0  # Step size for g.proximal
-tau = sigma / op_norm**2  # Step size for f.proximal
+    # Reconstruction space: functions on the rectangle [-20, 20]^2
+    # discretized with img_size samples per dimension
+    reco_space = odl.uniform_discr(
+        min_pt=[-20, -20], max_pt=[20, 20], shape=[img_size, img_size], dtype="float32"
+    )
+    # Make a parallel beam geometry with flat detector, using number of angles = num_angles
+    geometry = odl.tomo.parallel_beam_geometry(reco_space, num_angles=num_angles)
 
-# Optionally pass a callback to the solver to display intermediate results
-callback = odl.solvers.CallbackPrintIteration(step=10) & odl.solvers.CallbackShow(
-    step=10
-)
+    # Create the forward operator, and the FBP operator in ODL
+    fwd_op_odl = odl.tomo.RayTransform(reco_space, geometry)
+    fbp_op_odl = odl.tomo.fbp_op(
+        fwd_op_odl, filter_type="Ram-Lak", frequency_scaling=0.6
+    )
 
-# Choose a starting point
-x_admm_odl = L.domain.zero()
+    return reco_space, fwd_op_odl, fbp_op_odl
 
-# Run the algorithm
-odl.solvers.admm_linearized(x_admm_odl, f, g, L, tau, sigma, niter, callback=None)
-x_admm_np = x_admm_odl.__array__()
 
-# Let's display the image reconstructed by ADMM and compare it with FBP
-psnr_tv = compare_psnr(phantom_np, x_admm_np, data_range=data_range)
-ssim_tv = compare_ssim(phantom_np, x_admm_np, data_range=data_range)
-plot_ADMM_FBP(phantom_np, fbp_np, x_admm_np, psnr_fbp, ssim_fbp, psnr_tv, ssim_tv)
+def simulate_data(reco_space, fwd_op_odl, fbp_op_odl):
+    """!@brief Create the phantom, its noisy projection data and the FBP reconstruction
 
-# -----------------------------------------------------------
-# Set up the LGD algorithm in PyTorch
-# -----------------------------------------------------------
-print("Setting up the LGD algorithm in PyTorch...")
+    @param reco_space the reconstruction space, odl space
+    @param fwd_op_odl the forward operator, odl operator
+    @param fbp_op_odl the FBP operator, odl operator
+
+    @return the noisy data in ODL, and the phantom, the sinogram and the FBP
+    reconstruction as numpy arrays"""
+
+    import odl
+
+    # Create phantom and noisy projection data in ODL
+    phantom_odl = odl.phantom.shepp_logan(reco_space, modified=True)
+    data_odl = fwd_op_odl(phantom_odl)
+    data_odl += odl.phantom.white_noise(fwd_op_odl.range) * np.mean(data_odl) * 0.1
+    fbp_odl = fbp_op_odl(data_odl)
 
-# Check if a GPU is available
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-print("Device:", device)
+    # convert the image and the sinogram to numpy arrays
+    phantom_np = phantom_odl.__array__()
+    fbp_np = fbp_odl.__array__()
+    data_np = data_odl.__array__()
+    print("Sinogram size = {}".format(data_np.shape))
 
-# Now, we need to cast the ODL operators as torch operators
-# so that we can integrate them with other learnable units.
-# For brevity, we will omit the suffix _torch in the variable and operator names.
-fwd_op = odl_torch.OperatorModule(fwd_op_odl).to(device)
-adj_op = odl_torch.OperatorModule(fwd_op_odl.adjoint).to(device)
-fbp_op = odl_torch.OperatorModule(fbp_op_odl).to(device)
+    return data_odl, phantom_np, data_np, fbp_np
 
-# Let's compute a reasonable initial value for the step-size as step_size = 1/L,
-# where L is the spectral norm of the forward operator.
-op_norm = 1.1 * odl.power_method_opnorm(fwd_op_odl)
-step_size = 1 / op_norm
 
+def solve_tv(reco_space, fwd_op_odl, data_odl):
+    """!@brief Solve the TV reconstruction problem using the linearized ADMM
+    algorithm (implemented in ODL)
 
-# Initialize the LGD network
-lgd_net = LGD_net(fwd_op=fwd_op, adj_op=adj_op, step_size=step_size).to(
-    device
-)  # realize the network and export it to GPU
+    @param reco_space the reconstruction space, odl space
+    @param fwd_op_odl the forward operator, odl operator
+    @param data_odl the noisy data, odl element
 
-# Print the number of learnable parameters in the LGD network
-num_learnable_params = sum(p.numel() for p in lgd_net.parameters() if p.requires_grad)
-print("number of model parameters = {}".format(num_learnable_params))
+    @return the TV reconstruction, numpy array"""
 
-# Convert the noisy sinogram data to a torch tensor
-y = torch.from_numpy(data_np).to(device).unsqueeze(0)
+    import odl
 
-# Compute the FBP reconstruction as the initial guess
-x_init = fbp_op(y)
+    print("Solving the TV reconstruction problem using ADMM...")
 
-# Convert the ground-truth image to a torch tensor
-ground_truth = torch.from_numpy(phantom_np).to(device).unsqueeze(0)
+    # In this example we solve the optimization problem:
+    # min_x f(x) + g(Lx) = ||A(x) - y||_2^2 + lam * ||grad(x)||_1,
+    # Where:
+    # - ``A`` is a parallel beam ray transform,
+    # - ``grad`` is the spatial gradient,
+    # - ``y`` given noisy data.
+
+    # The problem is rewritten in decoupled form as:
+    # min_x g(L(x))
+    # with a separable sum ``g`` of functionals and the stacked operator ``L``:
+
+    # g(z) = ||z_1 - g||_2^2 + lam * ||z_2||_1,
+    #                ( A(x)    )
+    #     z = L(x) = ( grad(x) ).
+
+    # Gradient operator for the TV part
+    grad = odl.Gradient(reco_space)
+
+    # Stacking of the two operators
+    L = odl.BroadcastOperator(fwd_op_odl, grad)
+
+    # Data matching and regularization functionals
+    data_fit = odl.solvers.L2NormSquared(fwd_op_odl.range).translated(data_odl)
+    lam = 0.015
+    reg_func = lam * odl.solvers.L1Norm(grad.range)
+    g = odl.solvers.SeparableSum(data_fit, reg_func)
+
+    # We don't use the f functional, setting it to zero
+    f = odl.solvers.ZeroFunctional(L.domain)
+
+    # --- Select parameters and solve using ADMM ---
+
+    # Estimated operator norm, add 10 percent for some safety margin
+    op_norm = 1.1 * odl.power_method_opnorm(L, maxiter=20)
+
+    niter = 200  # Number of iterations
+    sigma = 2.0  # Step size for g.proximal
+    tau = sigma / op_norm**2  # Step size for f.proximal
+
+    # Choose a starting point
+    x_admm_odl = L.domain.zero()
+
+    # Run the algorithm
+    odl.solvers.admm_linearized(x_admm_odl, f, g, L, tau, sigma, niter, callback=None)
+
+    return x_admm_odl.__array__()
+
+
+def run_lgd(fwd_op_odl, fbp_op_odl, data_np, phantom_np, skip_training):
+    """!@brief Set up the LGD algorithm in PyTorch, train it or load its learned
+    parameters, and reconstruct the image
+
+    @param fwd_op_odl the forward operator, odl operator
+    @param fbp_op_odl the FBP operator, odl operator
+    @param data_np the noisy sinogram, numpy array
+    @param phantom_np the ground-truth image, numpy array
+    @param skip_training whether to load the learned parameters instead of
+    training the network, bool
 
-# Define the loss and the optimizer
-mse_loss = torch.nn.MSELoss()
-optimizer = torch.optim.Adam(lgd_net.parameters(), lr=1e-4)
-num_epochs = 2000
+    @return the LGD reconstruction, numpy array"""
 
-if skip_training:
-    # Load the learned parameters of the LGD network
-    lgd_net.load_state_dict(torch.load("./lgd_net.pth"))
+    import odl
+    import odl.contrib.torch as odl_torch
+    import torch
+    from neur_nets import LGD_net
 
-    # Pass the input through the network, to get the reconstruction
-    recon = lgd_net(y, x_init)
+    print("Setting up the LGD algorithm in PyTorch...")
 
-else:
-    # Training loop
-    for epoch in range(0, num_epochs):
-        # ----------------------------------------
-        # Authored section of code by T. Breitburd
-        # ----------------------------------------
+    # Check if a GPU is available
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    print("Device:", device)
 
-        # Zero the gradients
-        optimizer.zero_grad()
+    # Now, we need to cast the ODL operators as torch operators
+    # so that we can integrate them with other learnable units.
+    # For brevity, we will omit the suffix _torch in the variable and operator names.
+    fwd_op = odl_torch.OperatorModule(fwd_op_odl).to(device)
+    adj_op = odl_torch.OperatorModule(fwd_op_odl.adjoint).to(device)
+    fbp_op = odl_torch.OperatorModule(fbp_op_odl).to(device)
+
+    # Let's compute a reasonable initial value for the step-size as step_size = 1/L,
+    # where L is the spectral norm of the forward operator.
+    op_norm = 1.1 * odl.power_method_opnorm(fwd_op_odl)
+    step_size = 1 / op_norm
+
+    # Initialize the LGD network
+    lgd_net = LGD_net(fwd_op=fwd_op, adj_op=adj_op, step_size=step_size).to(
+        device
+    )  # realize the network and export it to GPU
+
+    # Print the number of learnable parameters in the LGD network
+    num_learnable_params = sum(
+        p.numel() for p in lgd_net.parameters() if p.requires_grad
+    )
+    print("number of model parameters = {}".format(num_learnable_params))
+
+    # Convert the noisy sinogram data to a torch tensor
+    y = torch.from_numpy(data_np).to(device).unsqueeze(0)
+
+    # Compute the FBP reconstruction as the initial guess
+    x_init = fbp_op(y)
+
+    # Convert the ground-truth image to a torch tensor
+    ground_truth = torch.from_numpy(phantom_np).to(device).unsqueeze(0)
+
+    # Define the loss and the optimizer
+    mse_loss = torch.nn.MSELoss()
+    optimizer = torch.optim.Adam(lgd_net.parameters(), lr=1e-4)
+    num_epochs = 2000
+
+    if skip_training:
+        # Load the learned parameters of the LGD network
+        lgd_net.load_state_dict(torch.load("./lgd_net.pth"))
 
         # Pass the input through the network, to get the reconstruction
         recon = lgd_net(y, x_init)
 
-        # Compute the loss
-        loss = mse_loss(recon, ground_truth)
+    else:
+        # Training loop
+        for epoch in range(0, num_epochs):
+            # ----------------------------------------
+            # Authored section of code by T. Breitburd
+            # ----------------------------------------
 
-        # Backward pass and optimization step
-        loss.backward()
-        optimizer.step()
+            # Zero the gradients
+            optimizer.zero_grad()
 
-        if epoch % 100 == 0:
-            print("Epoch = {}, Loss = {}".format(epoch, loss.item()))
+            # Pass the input through the network, to get the reconstruction
+            recon = lgd_net(y, x_init)
 
-    # Evaluate the model and save its learned parameters
-    lgd_net.eval()
-    torch.save(lgd_net.state_dict(), "./lgd_net.pth")
+            # Compute the loss
+            loss = mse_loss(recon, ground_truth)
 
-# Convert the reconstruction to a numpy array
-lgd_recon_np = recon.detach().cpu().numpy().squeeze()
+            # Backward pass and optimization step
+            loss.backward()
+            optimizer.step()
 
-# Let's display the reconstructed images by LGD and compare it with FBP and ADMM
-psnr_lgd = compare_psnr(phantom_np, lgd_recon_np, data_range=data_range)
-ssim_lgd = compare_ssim(phantom_np, lgd_recon_np, data_range=data_range)
-plot_ADMM_FBP_LGD(
-    phantom_np,
-    fbp_np,
-    x_admm_np,
-    lgd_recon_np,
-    psnr_fbp,
-    ssim_fbp,
-    psnr_tv,
-    ssim_tv,
-    psnr_lgd,
-    ssim_lgd,
-)
+            if epoch % 100 == 0:
+                print("Epoch = {}, Loss = {}".format(epoch, loss.item()))
+
+        # Evaluate the model and save its learned parameters
+        lgd_net.eval()
+        torch.save(lgd_net.state_dict(), "./lgd_net.pth")
+
+    # Convert the reconstruction to a numpy array
+    return recon.detach().cpu().numpy().squeeze()
+
+
+def _str_to_bool(value):
+    """!@brief Parse a boolean command line argument
+
+    @param value the argument, "True" or "False" (any case), string
+
+    @return the boolean, bool"""
+
+    if value.lower() in ("true", "1", "yes"):
+        return True
+    if value.lower() in ("false", "0", "no"):
+        return False
+    raise argparse.ArgumentTypeError("expected True or False, got " + repr(value))
+
+
+def main(argv=None):
+    """!@brief Run the FBP, TV and LGD reconstructions and plot them
+
+    @param argv the command line arguments, sys.argv[1:] by default, list of strings
+
+    @return None"""
+
+    parser = argparse.ArgumentParser(description="TV and LGD reconstructions")
+    parser.add_argument(
+        "skip_training",
+        type=_str_to_bool,
+        help="True to load the trained LGD network instead of training it",
+    )
+    parser.add_argument(
+        "--astra-test", action="store_true", help="run the astra self-test first"
+    )
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.astra_test:
+        import astra
+
+        astra.test()
+
+    # -----------------------------------------------------------
+    # Set up the forward operator (ray transform) in ODL
+    # -----------------------------------------------------------
+    reco_space, fwd_op_odl, fbp_op_odl = setup_forward_operator()
+    data_odl, phantom_np, data_np, fbp_np = simulate_data(
+        reco_space, fwd_op_odl, fbp_op_odl
+    )
+
+    # Compute the PSNR and SSIM between the ground truth and the FBP reconstruction
+    data_range = np.max(phantom_np) - np.min(phantom_np)
+    psnr_fbp, ssim_fbp = compare_images(phantom_np, fbp_np, data_range)
+
+    # -----------------------------------------------------------
+    # Display the ground truth, FBP reconstruction, and the sinogram
+    # -----------------------------------------------------------
+    plot_grd_truth_FBP(phantom_np, data_np, fbp_np, psnr_fbp, ssim_fbp)
+
+    # -----------------------------------------------------------
+    # Let's solve the TV reconstruction problem
+    # using the linearized ADMM algorithm (implemented in ODL).
+    # -----------------------------------------------------------
+    x_admm_np = solve_tv(reco_space, fwd_op_odl, data_odl)
+
+    # Let's display the image reconstructed by ADMM and compare it with FBP
+    psnr_tv, ssim_tv = compare_images(phantom_np, x_admm_np, data_range)
+    plot_ADMM_FBP(phantom_np, fbp_np, x_admm_np, psnr_fbp, ssim_fbp, psnr_tv, ssim_tv)
+
+    # -----------------------------------------------------------
+    # Set up the LGD algorithm in PyTorch
+    # -----------------------------------------------------------
+    lgd_recon_np = run_lgd(
+        fwd_op_odl, fbp_op_odl, data_np, phantom_np, args.skip_training
+    )
+
+    # Let's display the reconstructed images by LGD and compare it with FBP and ADMM
+    psnr_lgd, ssim_lgd = compare_images(phantom_np, lgd_recon_np, data_range)
+    plot_ADMM_FBP_LGD(
+        phantom_np,
+        fbp_np,
+        x_admm_np,
+        lgd_recon_np,
+        psnr_fbp,
+        ssim_fbp,
+        psnr_tv,
+        ssim_tv,
+        psnr_lgd,
+        ssim_lgd,
+    )
+
+
+if __name__ == "__main__":
+    main()
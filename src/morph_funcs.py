@@ -0,0 +1,319 @@
+"""!@file morph_funcs.py
+@brief Python script containing the binary morphology functions
+for the Image Analysis Coursework
+
+@details The binary masks are stored bit-packed, 64 pixels per 64-bit word
+along the rows, and the footprints are decomposed into horizontal lines, one
+per footprint row. Dilating a packed mask by a line of length L takes
+O(log L) word shifts, so a disk of radius r takes O(r) operations on
+words instead of O(r^2) on pixels.
+The closing and opening functions give the same results as
+skimage.morphology.closing and opening on a boolean image (with the default
+"reflect" mode at the image borders), 8 times smaller and much faster.
+
+List of functions:
+- pack_mask: Bit-pack a binary mask, 64 pixels per word
+- unpack_mask: Unpack a bit-packed binary mask
+- dilation_packed: Dilate a bit-packed mask
+- erosion_packed: Erode a bit-packed mask
+- binary_dilation: Dilate a binary mask
+- binary_erosion: Erode a binary mask
+- binary_closing: Apply closing to a binary mask
+- binary_opening: Apply opening to a binary mask
+
+
+@author T. Breitburd on 14/06/2024"""
+
+import numpy as np
+from skimage.morphology import closing, opening
+from scipy.ndimage import generate_binary_structure
+
+
+def pack_mask(mask):
+    """!@brief Bit-pack a binary mask, 64 pixels per 64-bit word along the rows
+
+    @param mask the binary mask, 2D numpy array
+
+    @return the packed mask, uint64 numpy array of shape (rows, ceil(cols / 64))"""
+
+    rows, cols = mask.shape
+    padded = np.zeros((rows, -(-cols // 64) * 64), dtype=bool)
+    padded[:, :cols] = mask
+
+    # Pixel c of a row is bit c % 64 of word c // 64
+    return np.packbits(padded, axis=1, bitorder="little").view("<u8")
+
+
+def unpack_mask(packed, cols):
+    """!@brief Unpack a bit-packed binary mask
+
+    @param packed the packed mask, uint64 numpy array
+    @param cols the number of columns of the mask, int
+
+    @return the binary mask, boolean numpy array"""
+
+    bits = np.unpackbits(packed.view(np.uint8), axis=1, count=cols, bitorder="little")
+
+    return bits.astype(bool)
+
+
+def _shift_cols(packed, shift):
+    """!@brief Shift a packed mask along the rows, so that pixel c of the result
+    is pixel c + shift of the mask (0 outside the mask)
+
+    @param packed the packed mask, uint64 numpy array
+    @param shift the shift in pixels, int
+
+    @return the shifted packed mask, uint64 numpy array"""
+
+    n_words = packed.shape[1]
+    words, bits = divmod(abs(shift), 64)
+    out = np.zeros_like(packed)
+    if words >= n_words:
+        return out
+
+    if shift >= 0:
+        # Whole words first, then bits, carrying in the bits of the next word
+        src = packed[:, words:]
+        out[:, : n_words - words] = src >> np.uint64(bits)
+        if bits:
+            out[:, : n_words - words - 1] |= src[:, 1:] << np.uint64(64 - bits)
+    else:
+        src = packed[:, : n_words - words]
+        out[:, words:] = src << np.uint64(bits)
+        if bits:
+            out[:, slice(words + 1, None)] |= src[:, :-1] >> np.uint64(64 - bits)
+
+    return out
+
+
+def _shift_rows(packed, shift):
+    """!@brief Shift a packed mask across the rows, so that row r of the result
+    is row r + shift of the mask (0 outside the mask)
+
+    @param packed the packed mask, uint64 numpy array
+    @param shift the shift in rows, int
+
+    @return the shifted packed mask, uint64 numpy array"""
+
+    out = np.zeros_like(packed)
+    if shift >= 0:
+        out[: len(packed) - shift] = packed[shift:]
+    else:
+        out[-shift:] = packed[: len(packed) + shift]
+
+    return out
+
+
+def _footprint_lines(footprint):
+    """!@brief Decompose a footprint into horizontal lines
+
+    @param footprint the footprint, with odd dimensions, 2D numpy array
+
+    @return the lines as (row offset, first column offset, length), list of tuples"""
+
+    footprint = np.asarray(footprint, dtype=bool)
+    if footprint.ndim != 2 or not all(size % 2 for size in footprint.shape):
+        raise ValueError("footprint must be 2D with odd dimensions")
+    centre_row, centre_col = np.array(footprint.shape) // 2
+
+    lines = []
+    for row, values in enumerate(footprint):
+        # Runs of consecutive True values in the row
+        edges = np.diff(np.concatenate([[0], values.astype(np.int8), [0]]))
+        for start, stop in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+            lines.append((row - centre_row, start - centre_col, stop - start))
+
+    return lines
+
+
+def _morph_packed(packed, footprint, combine):
+    """!@brief Combine the mask shifted by all offsets of a footprint,
+    one horizontal line of the footprint at a time
+
+    @details The combination over a line of length L is computed with
+    O(log L) shifts, by doubling the covered length, and reused for all the
+    lines of the same length.
+
+    @param packed the packed mask, uint64 numpy array
+    @param footprint the footprint, with odd dimensions, 2D numpy array
+    @param combine np.bitwise_or for dilation, np.bitwise_and for erosion, ufunc
+
+    @return the combined packed mask, uint64 numpy array"""
+
+    lines = _footprint_lines(footprint)
+    runs = {}
+    for length in sorted({length for _, _, length in lines}):
+        # Pixel c of the run is combined over pixels c to c + length - 1
+        run, covered = packed, 1
+        while 2 * covered <= length:
+            run = combine(run, _shift_cols(run, covered))
+            covered *= 2
+        if covered < length:
+            run = combine(run, _shift_cols(run, length - covered))
+        runs[length] = run
+
+    out = None
+    for row, col, length in lines:
+        shifted = _shift_rows(_shift_cols(runs[length], col), row)
+        out = shifted if out is None else combine(out, shifted)
+
+    return out
+
+
+def dilation_packed(packed, footprint):
+    """!@brief Dilate a bit-packed mask, i.e. set each pixel to the maximum of
+    the pixels of the footprint centred on it (0 outside the mask)
+
+    @param packed the packed mask, uint64 numpy array
+    @param footprint the footprint, with odd dimensions, 2D numpy array
+
+    @return the dilated packed mask, uint64 numpy array"""
+
+    return _morph_packed(packed, footprint, np.bitwise_or)
+
+
+def erosion_packed(packed, footprint):
+    """!@brief Erode a bit-packed mask, i.e. set each pixel to the minimum of
+    the pixels of the footprint centred on it (0 outside the mask)
+
+    @param packed the packed mask, uint64 numpy array
+    @param footprint the footprint, with odd dimensions, 2D numpy array
+
+    @return the eroded packed mask, uint64 numpy array"""
+
+    return _morph_packed(packed, footprint, np.bitwise_and)
+
+
+def _default_footprint(footprint):
+    """!@brief Get the footprint to use, the cross (connectivity 1) by default,
+    as in skimage.morphology
+
+    @param footprint the footprint, or None, numpy array
+
+    @return the footprint, boolean numpy array"""
+
+    if footprint is None:
+        return generate_binary_structure(2, 1)
+    return np.asarray(footprint, dtype=bool)
+
+
+def _apply_packed(mask, footprint, operations):
+    """!@brief Apply a sequence of packed operations to a binary mask, with the
+    mask reflected at its borders as in skimage.morphology
+
+    @details For a single operation with a footprint symmetric about its
+    centre, or several with a footprint symmetric about each axis, reflecting
+    the mask then applying the operations gives a result which is also
+    reflected at the borders, so padding once by the reach of all operations
+    is enough.
+
+    @param mask the binary mask, 2D numpy array
+    @param footprint the footprint, symmetric about its centre, and about each
+    axis for several operations, 2D numpy array
+    @param operations the packed operations to apply in turn, list of callables
+
+    @return the result, boolean numpy array"""
+
+    reach = np.array(footprint.shape) // 2 * len(operations)
+    padded = np.pad(np.asarray(mask, dtype=bool), [(r, r) for r in reach], "symmetric")
+
+    packed = pack_mask(padded)
+    for operation in operations:
+        packed = operation(packed, footprint)
+    out = unpack_mask(packed, padded.shape[1])
+
+    return out[tuple(slice(r, r + size) for r, size in zip(reach, mask.shape))]
+
+
+def _is_symmetric(footprint, mirror=False):
+    """!@brief Check if a footprint is symmetric about its centre
+
+    @param footprint the footprint, 2D numpy array
+    @param mirror also check that it is symmetric about each axis, bool
+
+    @return True if it is, bool"""
+
+    if not all(size % 2 for size in footprint.shape):
+        return False
+    if mirror:
+        return np.array_equal(footprint, footprint[::-1]) and np.array_equal(
+            footprint, footprint[:, ::-1]
+        )
+    return np.array_equal(footprint, footprint[::-1, ::-1])
+
+
+def binary_dilation(mask, footprint=None):
+    """!@brief Dilate a binary mask, as skimage.morphology.dilation does
+
+    @param mask the binary mask, 2D numpy array
+    @param footprint the footprint, symmetric about its centre, the cross by
+    default, 2D numpy array
+
+    @return the dilated mask, boolean numpy array"""
+
+    footprint = _default_footprint(footprint)
+    if not _is_symmetric(footprint):
+        raise ValueError("footprint must be symmetric about its centre")
+
+    return _apply_packed(mask, footprint, [dilation_packed])
+
+
+def binary_erosion(mask, footprint=None):
+    """!@brief Erode a binary mask, as skimage.morphology.erosion does
+
+    @param mask the binary mask, 2D numpy array
+    @param footprint the footprint, symmetric about its centre, the cross by
+    default, 2D numpy array
+
+    @return the eroded mask, boolean numpy array"""
+
+    footprint = _default_footprint(footprint)
+    if not _is_symmetric(footprint):
+        raise ValueError("footprint must be symmetric about its centre")
+
+    return _apply_packed(mask, footprint, [erosion_packed])
+
+
+def binary_closing(mask, footprint=None):
+    """!@brief Apply closing (dilation then erosion) to a binary mask,
+    as skimage.morphology.closing does
+
+    @details Footprints which are not symmetric about each axis (as the disks
+    are) are passed on to skimage.morphology.closing: for a footprint only
+    symmetric about its centre, the reflection at the borders of the result
+    of the first operation differs from the result of the first operation on
+    the reflected mask.
+
+    @param mask the binary mask, 2D numpy array
+    @param footprint the footprint, the cross by default, 2D numpy array
+
+    @return the closed mask, boolean numpy array"""
+
+    footprint = _default_footprint(footprint)
+    if not _is_symmetric(footprint, mirror=True):
+        return closing(np.asarray(mask, dtype=bool), footprint)
+
+    return _apply_packed(mask, footprint, [dilation_packed, erosion_packed])
+
+
+def binary_opening(mask, footprint=None):
+    """!@brief Apply opening (erosion then dilation) to a binary mask,
+    as skimage.morphology.opening does
+
+    @details Footprints which are not symmetric about each axis (as the disks
+    are) are passed on to skimage.morphology.opening: for a footprint only
+    symmetric about its centre, the reflection at the borders of the result
+    of the first operation differs from the result of the first operation on
+    the reflected mask.
+
+    @param mask the binary mask, 2D numpy array
+    @param footprint the footprint, the cross by default, 2D numpy array
+
+    @return the opened mask, boolean numpy array"""
+
+    footprint = _default_footprint(footprint)
+    if not _is_symmetric(footprint, mirror=True):
+        return opening(np.asarray(mask, dtype=bool), footprint)
+
+    return _apply_packed(mask, footprint, [erosion_packed, dilation_packed])
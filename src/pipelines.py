@@ -0,0 +1,396 @@
+"""!@file pipelines.py
+@brief Python script containing the segmentation pipelines
+for the Image Analysis Coursework
+
+@details The pipelines are the steps of the segmentation scripts as functions,
+so they can be run on any image without running the scripts. All of them take
+an optional timings dictionary, to which the wall time of each stage is added.
+
+List of functions:
+- stage: Time a stage of a pipeline
+- find_ct_seeds: Threshold the CT image and find the seeds in the 2 smallest regions
+- grow_ct_lungs: Segment the lungs by flood filling from the seeds
+- segment_ct: Segment the lungs in a CT image (mod_1_CT)
+- find_ct_seeds_custom: Find the seeds with the custom Otsu thresholding
+- grow_ct_lungs_custom: Segment the lungs with the custom region growing
+- segment_ct_custom: Segment the lungs in a CT image (mod_1_CT_custom)
+- segment_coins: Segment the coins in the coins image (mod_1_coins)
+- segment_tulips: Segment the purple tulips in the tulips image (mod_1_tulips)
+- segment_tulips_tiled: Segment the purple tulips in a memory-mapped image,
+one tile at a time
+
+
+@author T. Breitburd on 09/06/2024"""
+
+import os
+import time
+from contextlib import contextmanager
+import numpy as np
+import skimage
+from skimage.filters import threshold_otsu
+from skimage.measure import label
+from skimage.morphology import disk
+from skimage.segmentation import flood_fill, chan_vese
+from skimage.restoration import inpaint
+from skimage.exposure import rescale_intensity
+from seg_funcs import (
+    label_stats,
+    otsu_threshold,
+    region_growing_multi,
+    kmeans_histogram,
+)
+from morph_funcs import binary_closing, binary_opening
+from inpaint_funcs import inpaint_lines
+from background_funcs import estimate_background
+from color_funcs import rgb2hue
+from levelset_funcs import chan_vese_multiscale, chan_vese_narrow_band
+from tile_funcs import (
+    hue_threshold_tiled,
+    blurred_mask_tiled,
+    chan_vese_tiled,
+    opening_tiled,
+)
+from volume_funcs import create_volume
+
+
+@contextmanager
+def stage(timings, name):
+    """!@brief Time a stage of a pipeline, adding its wall time to timings[name]
+
+    @param timings the wall time of each stage, or None to not time it, dict
+    @param name the name of the stage, string"""
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+def _seeds_from_regions(ct_regions):
+    """!@brief Find the seeds in the 2 smallest regions (the lungs)
+
+    @param ct_regions the labelled regions, numpy array
+
+    @return the 2 seeds, list of tuples"""
+
+    # Get the size and middle pixel of all regions, in one pass
+    region_stats = label_stats(ct_regions)
+
+    # The lung regions are going be the 2 smallest ones
+    indices = np.argpartition(region_stats["size"], 2)[:2]
+
+    # Get seeds for the region growing
+    seed1 = tuple(region_stats["representative"][indices[0]])
+    seed2 = tuple(region_stats["representative"][indices[1]])
+
+    return [seed1, seed2]
+
+
+def find_ct_seeds(ct, timings=None):
+    """!@brief Threshold the CT image with Otsu's method, close it to remove
+    the small objects and find the seeds in the 2 smallest regions (the lungs)
+
+    @param ct the CT image, numpy array
+    @param timings the wall time of each stage, or None, dict
+
+    @return the labelled regions, numpy array, and the 2 seeds, list of tuples"""
+
+    # Threshold the image
+    with stage(timings, "threshold"):
+        threshold = threshold_otsu(ct)
+        ct_thresh = ct < threshold
+
+    # Apply closing to remove the small objects
+    with stage(timings, "closing"):
+        ct_masked = binary_closing(ct_thresh, disk(3))
+
+    # Identify regions in the thresholded image, and find the seeds
+    with stage(timings, "seeds"):
+        ct_regions = label(ct_masked)
+        seeds = _seeds_from_regions(ct_regions)
+
+    return ct_regions, seeds
+
+
+def grow_ct_lungs(ct, seeds, timings=None):
+    """!@brief Segment the lungs by flood filling from the seeds, and close the
+    mask to get rid of inter-lung tissue
+
+    @param ct the CT image, numpy array
+    @param seeds the seeds, list of tuples
+    @param timings the wall time of each stage, or None, dict
+
+    @return the flood filled image and the lungs mask, numpy arrays"""
+
+    # Flood fill from each seed in turn
+    with stage(timings, "region growing"):
+        mask_flood = ct
+        for seed in seeds:
+            mask_flood = flood_fill(mask_flood, seed, new_value=255, tolerance=30)
+
+    # Threshold the image
+    threshold = 254
+
+    binary = mask_flood > threshold
+
+    # Apply closing to get rid of inter-lung tissue
+    with stage(timings, "closing"):
+        masked = binary_closing(binary, disk(3))
+
+    return mask_flood, masked
+
+
+def segment_ct(ct, timings=None):
+    """!@brief Segment the lungs in a CT image, with the steps of mod_1_CT
+
+    @param ct the CT image, numpy array
+    @param timings the wall time of each stage, or None, dict
+
+    @return the lungs mask, numpy array"""
+
+    _, seeds = find_ct_seeds(ct, timings)
+    _, masked = grow_ct_lungs(ct, seeds, timings)
+
+    return masked
+
+
+def find_ct_seeds_custom(ct, timings=None):
+    """!@brief Threshold the CT image with the custom Otsu thresholding, close it
+    to remove the small objects and find the seeds in the 2 smallest regions
+
+    @param ct the CT image, numpy array
+    @param timings the wall time of each stage, or None, dict
+
+    @return the labelled regions, numpy array, and the 2 seeds, list of tuples"""
+
+    # Threshold the image
+    with stage(timings, "threshold"):
+        ct_thresh = otsu_threshold(ct)
+
+    # Apply closing to remove the small objects
+    with stage(timings, "closing"):
+        ct_masked = binary_closing(ct_thresh, disk(3))
+
+    # Identify regions in the thresholded image, and find the seeds
+    with stage(timings, "seeds"):
+        ct_regions = label(ct_masked)
+        seeds = _seeds_from_regions(ct_regions)
+
+    return ct_regions, seeds
+
+
+def grow_ct_lungs_custom(ct, seeds, timings=None):
+    """!@brief Segment the lungs with the custom region growing, from all the
+    seeds at once, and close the mask to get rid of inter-lung tissue
+
+    @param ct the CT image, numpy array
+    @param seeds the seeds, list of tuples
+    @param timings the wall time of each stage, or None, dict
+
+    @return the region grown image and the lungs mask, numpy arrays"""
+
+    # Grow both lungs at once, each from its own seed
+    with stage(timings, "region growing"):
+        lungs = region_growing_multi(ct, seeds, thresholds=0.15)
+
+    # Set the segmented regions to white
+    mask_flood = np.copy(ct)
+    mask_flood[lungs > 0] = 255
+
+    # Threshold the image again
+    threshold = 254
+
+    binary = mask_flood > threshold
+
+    # Apply closing to get rid of inter-lung tissue
+    with stage(timings, "closing"):
+        masked = binary_closing(binary, disk(3))
+
+    return mask_flood, masked
+
+
+def segment_ct_custom(ct, timings=None):
+    """!@brief Segment the lungs in a CT image, with the steps of mod_1_CT_custom
+
+    @param ct the CT image, numpy array
+    @param timings the wall time of each stage, or None, dict
+
+    @return the lungs mask, numpy array"""
+
+    _, seeds = find_ct_seeds_custom(ct, timings)
+    _, masked = grow_ct_lungs_custom(ct, seeds, timings)
+
+    return masked
+
+
+def segment_coins(coins, timings=None, inpainting=None, background="exact"):
+    """!@brief Segment the coins, with the steps of mod_1_coins: inpaint the
+    corruption lines, increase the contrast, remove the background with a
+    rolling ball, segment with K-means, close and label the coins
+
+    @param coins the coins image, 1 channel, numpy array
+    @param timings the wall time of each stage, or None, dict
+    @param inpainting the method of inpaint_lines to inpaint the corruption lines
+    locally ("linear", "cubic" or "biharmonic"), or None for skimage's
+    biharmonic inpainting of the whole image, string
+    @param background the method of estimate_background ("exact", "downsample"
+    or "tophat"), string
+
+    @return the rescaled image, the image without background and the
+    labelled coins, numpy arrays"""
+
+    # Remove the "corruption" lines
+    with stage(timings, "inpainting"):
+        mask = coins == 0
+        if inpainting is None:
+            coins_inpaint = inpaint.inpaint_biharmonic(coins, mask)
+        else:
+            coins_inpaint = inpaint_lines(coins, mask, inpainting)
+
+    # To facilitate the segmentation, increase the contrast
+    with stage(timings, "rescaling"):
+        coins_rescaled = rescale_intensity(
+            coins_inpaint, in_range=(0.2, 0.8), out_range=(0, 1)
+        )
+
+        # Shift image back to 0-255
+        coins_rescaled = np.array(coins_rescaled * 255, dtype=np.uint8)
+
+    # Remove the background with a rolling ball
+    with stage(timings, "background"):
+        coins_background = estimate_background(coins_rescaled, 30, background)
+        coins_no_background = coins_rescaled - coins_background
+
+    # Use K-means on the pixel values to segment the coins
+    with stage(timings, "k-means"):
+        # Solved exactly on the histogram, the coins are the brighter cluster
+        coins_segmented, _ = kmeans_histogram(coins_no_background, n_clusters=2)
+
+    # Close the image
+    with stage(timings, "closing"):
+        coins_segmented = binary_closing(coins_segmented, disk(2))
+
+    # Label the coins
+    with stage(timings, "labelling"):
+        coins_labelled = label(coins_segmented)
+
+    return coins_rescaled, coins_no_background, coins_labelled
+
+
+def segment_tulips(
+    tulips, timings=None, hue_only=False, hue=None, levels=None, narrow_band=False
+):
+    """!@brief Segment the purple tulips, with the steps of mod_1_tulips: threshold
+    the hue channel with Otsu's method, open the mask, blur it, segment it with
+    Chan-Vese and open the result
+
+    @param tulips the tulips image, RGB, numpy array
+    @param timings the wall time of each stage, or None, dict
+    @param hue_only compute only the hue channel, in float32 with rgb2hue, rather
+    than the whole HSV image, for uint8 images, bool
+    @param hue the float32 array to write the hue channel to, if hue_only,
+    numpy array
+    @param levels the number of levels of chan_vese_multiscale, stopping on the
+    change of the energy, or None for skimage's chan_vese at full size, int
+    @param narrow_band update the level set only near the contour, with
+    chan_vese_narrow_band, bool
+
+    @return the HSV image (its hue channel only if hue_only), the blurred mask,
+    the Chan-Vese mask and the opened Chan-Vese mask, numpy arrays"""
+
+    # Switch to Hue-Saturation-Value (HSV) color space
+    with stage(timings, "hsv"):
+        if hue_only:
+            tulips_hsv = rgb2hue(tulips, out=hue)
+            tulips_hue = tulips_hsv
+        else:
+            tulips_hsv = skimage.color.rgb2hsv(tulips)
+            tulips_hue = tulips_hsv[:, :, 0]
+
+    # Threshold the image on hue channel
+    with stage(timings, "threshold"):
+        thresh = threshold_otsu(tulips_hue)
+        tulips_mask = tulips_hue > thresh
+
+    # Apply opening to remove the small white spots, and keep the larger ones
+    with stage(timings, "opening"):
+        op_mask = binary_opening(tulips_mask)
+
+    # Gaussian blur to smooth the mask
+    with stage(timings, "blur"):
+        blurred_mask = skimage.filters.gaussian(op_mask, sigma=2)
+
+    # Apply the Chan-Vese segmentation
+    with stage(timings, "chan-vese"):
+        if levels is not None:
+            cv_mask = chan_vese_multiscale(
+                blurred_mask,
+                levels=levels,
+                mu=0.1,
+                lambda2=1.5,
+                narrow_band=narrow_band,
+            )
+        elif narrow_band:
+            cv_mask = chan_vese_narrow_band(blurred_mask, mu=0.1, lambda2=1.5)
+        else:
+            cv_mask = chan_vese(blurred_mask, mu=0.1, lambda2=1.5)
+
+    # Apply opening
+    with stage(timings, "opening"):
+        cv_mask_op = binary_opening(cv_mask, disk(4))
+
+    return tulips_hsv, blurred_mask, cv_mask, cv_mask_op
+
+
+def segment_tulips_tiled(tulips, out, work_dir, tile=1024, timings=None):
+    """!@brief Segment the purple tulips with the steps of segment_tulips, with
+    hue_only, one tile at a time, so the image does not have to fit in RAM
+
+    @details The threshold is found from the histogram of the hue streamed over
+    the tiles, the opening and the blur are done in tiles with halos, and the
+    intermediate images (the blurred mask and the 2 level sets of the
+    Chan-Vese segmentation, 8 bytes per pixel each) are memory-mapped .npy files
+    in work_dir. See tile_funcs for how close the result is to segment_tulips.
+
+    @param tulips the tulips image, uint8 RGB, numpy array or memmap
+    @param out the boolean array to write the opened Chan-Vese mask to, numpy
+    array or memmap of shape (rows, cols)
+    @param work_dir the directory for the intermediate images, string
+    @param tile the number of rows and columns of the tiles, int
+    @param timings the wall time of each stage, or None, dict
+
+    @return the opened Chan-Vese mask, out"""
+
+    shape = tulips.shape[:2]
+
+    # Threshold the hue channel, from its streamed histogram
+    with stage(timings, "threshold"):
+        thresh = hue_threshold_tiled(tulips, tile)
+
+    # Apply opening to the mask and blur it
+    with stage(timings, "blur"):
+        blurred_mask = blurred_mask_tiled(
+            tulips,
+            thresh,
+            create_volume(os.path.join(work_dir, "blurred_mask.npy"), shape, float),
+            tile=tile,
+        )
+
+    # Apply the Chan-Vese segmentation
+    with stage(timings, "chan-vese"):
+        phi, _ = chan_vese_tiled(
+            blurred_mask,
+            create_volume(os.path.join(work_dir, "phi.npy"), shape, float),
+            create_volume(os.path.join(work_dir, "phi_next.npy"), shape, float),
+            mu=0.1,
+            lambda2=1.5,
+            tile=tile,
+        )
+
+    # Apply opening
+    with stage(timings, "opening"):
+        opening_tiled(lambda box: phi[box] > 0, disk(4), out, tile)
+
+    return out
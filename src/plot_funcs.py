@@ -10,15 +10,20 @@ for the Image Analysis Coursework
 - plot_reconstruct_image: Plot the reconstructed image
 - plot_tulips_hsv: Plot the Hue, Saturation, and Value channels of the tulips image
 - plot_hue_hist: Plot the histogram of the hue channel
+- plot_coin_panels: Plot the segmentation steps around each coin, in one pass
 
 
 @author T. Breitburd on 04/06/2024"""
 
 
 import os
+import numpy as np
 import matplotlib.pyplot as plt
+from scipy.ndimage import find_objects
 
-# Define the plotting style
+# Keep the matplotlib settings of the scripts without a style (the coin
+# panels of mod_1_coins), then define the plotting style
+_default_rc = plt.rcParams.copy()
 plt.style.use("seaborn-v0_8-darkgrid")
 
 
@@ -237,3 +242,60 @@ def plot_hue_hist(hue_channel):
     plt.savefig(plot_dir)
 
     plt.close()
+
+
+def plot_coin_panels(steps, titles, coins_labelled, coin_numbers=None, margin=10):
+    """!@brief Function to plot the segmentation steps around each coin, one
+    panel per coin, saved as Plots/Coin_Segmentation_<coin number>.png
+
+    @details The bounding boxes of all the coins are found in a single pass over
+    the labelled image, and each figure is closed once saved, so the memory used
+    does not grow with the number of coins. The panels are drawn with the
+    matplotlib settings from before the style of this module, as in mod_1_coins.
+
+    @param steps the images of the segmentation steps, all of the same size,
+    list of 4 numpy arrays (grey-level or RGB)
+    @param titles the titles of the steps, list of 4 strings
+    @param coins_labelled the labelled coins, numpy array
+    @param coin_numbers the labels of the coins to plot, all coins by default,
+    list of ints
+    @param margin the number of pixels around the bounding box of each coin, int
+
+    @return None"""
+
+    # Bounding box of every label, in one pass
+    bboxes = find_objects(coins_labelled)
+    if coin_numbers is None:
+        coin_numbers = [i + 1 for i, bbox in enumerate(bboxes) if bbox is not None]
+
+    cur_dir = os.getcwd()
+    plots_dir = os.path.join(cur_dir, "Plots")
+    os.makedirs(plots_dir, exist_ok=True)
+
+    rows, cols = coins_labelled.shape
+    for coin_number in coin_numbers:
+        bbox = bboxes[coin_number - 1]
+        crop = (
+            slice(max(bbox[0].start - margin, 0), min(bbox[0].stop + margin, rows)),
+            slice(max(bbox[1].start - margin, 0), min(bbox[1].stop + margin, cols)),
+        )
+
+        # Plot the steps of the segmentation, without the style of this module
+        with plt.rc_context(_default_rc):
+            plt.figure(figsize=(8, 8))
+            for i, (step, title) in enumerate(zip(steps, titles)):
+                plt.subplot(221 + i)
+                plt.imshow(step[crop], cmap="gray" if np.ndim(step) == 2 else None)
+                plt.title(title)
+                plt.axis("off")
+
+            plt.suptitle("Coins Segmentation")
+            plt.tight_layout()
+
+            # Save the plot, and close it so only one figure is open at a time
+            plot_dir = os.path.join(
+                plots_dir, "Coin_Segmentation_" + str(coin_number) + ".png"
+            )
+            plt.savefig(plot_dir)
+
+            plt.close()
@@ -0,0 +1,250 @@
+"""!@file recon_funcs.py
+@brief Python script containing the signal reconstruction functions
+for the Image Analysis Coursework
+
+@details The signals are reconstructed from undersampled centred Fourier
+transforms with the Iterative Soft Thresholding Algorithm (ISTA). All the
+functions work along one axis of an array, so a 2D array of signals, one per
+row, each with its own undersampling, is reconstructed at once, with one FFT
+of the whole array per step rather than one per signal. The iterations can be
+accelerated with momentum (FISTA), stopped when the signals no longer change,
+and recorded. They work in place in preallocated buffers, in complex128 or
+complex64.
+
+List of functions:
+- fftc: Centred FFT along an axis
+- ifftc: Centred inverse FFT along an axis
+- SoftThresh: Soft thresholding
+- iterative_soft_thresholding: Reconstruct signals with ISTA or FISTA
+
+
+@author T. Breitburd on 09/06/2024"""
+
+import time
+import numpy as np
+import scipy.fft
+
+
+def fftc(x, axis=-1):
+    """!@brief Compute the centered FFT of a signal.
+
+    @param x: The input signal, or signals along axis.
+    @param axis: The axis of the signals.
+
+    @return The centered FFT of the input signal.
+    """
+
+    return (
+        1
+        / np.sqrt(x.shape[axis])
+        * np.fft.fftshift(
+            np.fft.fft(np.fft.ifftshift(x, axes=axis), axis=axis), axes=axis
+        )
+    )
+
+
+def ifftc(x, axis=-1):
+    """!@brief Compute the centered inverse FFT of a signal.
+
+    @details The inverse of fftc, the shifts being swapped, which only matters
+    for signals of odd length.
+
+    @param x: The input signal, or signals along axis.
+    @param axis: The axis of the signals.
+
+    @return The centered inverse FFT of the input signal.
+    """
+
+    return np.sqrt(x.shape[axis]) * np.fft.fftshift(
+        np.fft.ifft(np.fft.ifftshift(x, axes=axis), axis=axis), axes=axis
+    )
+
+
+def SoftThresh(x, lam):
+    """!@brief Perform soft thresholding on a signal.
+
+    @param x: The input signal.
+    @param lam: The soft threshold value.
+
+    @return The soft thresholded signal.
+    """
+
+    # Compute the difference between the signal and the threshold
+    diff = abs(x) - lam
+
+    # Apply the soft thresholding
+    soft_thresh = (diff > 0.0) * diff * x / abs(x)
+
+    return soft_thresh
+
+
+def _norm(a, buffer, axis):
+    """!@brief Norm of signals, using a preallocated buffer for the squared
+    magnitudes
+
+    @param a: The signals.
+    @param buffer: A float array of the shape of a, overwritten.
+    @param axis: The axis of the signals.
+
+    @return The norms of the signals.
+    """
+
+    np.abs(a, out=buffer)
+    np.square(buffer, out=buffer)
+    return np.sqrt(buffer.sum(axis=axis))
+
+
+def iterative_soft_thresholding(
+    X,
+    Y,
+    lam,
+    n_iter=100,
+    axis=-1,
+    method="ista",
+    tol=None,
+    extended_output=False,
+    dtype=None,
+    workers=None,
+):
+    """!@brief Perform iterative soft thresholding on a signal.
+
+    @details The samples of the observed signals which are not 0 are the
+    measured ones, so each signal of a batch keeps its own samples. Each
+    iteration soft thresholds the signal, takes its FT and puts back the
+    measured samples, which is a proximal gradient step on
+    0.5 * ||M fftc(x) - Y||^2 + lam * ||x||_1, with M the sampling mask.
+    With method "fista", the thresholded signals are extrapolated with
+    Nesterov's momentum before the measured samples are put back, which reuses
+    the FT of the thresholded signals since the FT is linear, so both methods
+    take one FFT and one inverse FFT per iteration. The iterations stop after
+    n_iter iterations, or once the relative change of the thresholded signals
+    is below tol for all the signals.
+
+    The centring shifts commute with the soft thresholding and the data
+    consistency, which act sample by sample, so the signals and their FT are
+    shifted once before the iterations and back once after them, and the
+    iterations use the plain orthonormal FFTs of scipy.fft. The sampling mask
+    is found once, and the FFTs, the soft thresholding and the data
+    consistency all work in place in preallocated buffers, so the iterations
+    allocate no arrays of the size of the signals (but for the record).
+
+    @param X: The signal in the frequency domain, or signals along axis.
+    @param Y: The observed signal, zero-filled, of the shape of X.
+    @param lam: The soft threshold value, or values broadcasting against X.
+    @param n_iter: The largest number of iterations.
+    @param axis: The axis of the signals.
+    @param method: "ista", or "fista" for the accelerated iterations.
+    @param tol: The tolerance on the relative change of the thresholded
+    signals, or None to run n_iter iterations.
+    @param extended_output: Also return the record of the iterations.
+    @param dtype: The complex type of the iterations, np.complex64 to halve
+    their memory and time, or None for the type of X (at least complex64).
+    @param workers: The number of threads of the FFTs, -1 for all the cores,
+    or None for 1.
+
+    @return The reconstructed signal, of type dtype, and if extended_output,
+    the record of the iterations, a dictionary of lists with one entry per
+    iteration, of the values of the thresholded signals: "objective" (the
+    function above), "error" (the norm of the difference between their FT and
+    the measured samples, relative to the norm of the measured samples) and
+    "time" (since the start, in seconds), floats or numpy arrays for batches
+    of signals.
+    """
+
+    if method not in ("ista", "fista"):
+        raise ValueError("method must be 'ista' or 'fista'")
+
+    start = time.perf_counter()
+    if dtype is None:
+        dtype = np.result_type(X, np.complex64)
+    dtype = np.dtype(dtype)
+    if dtype.kind != "c":
+        raise ValueError("dtype must be a complex type")
+    real_dtype = np.finfo(dtype).dtype
+
+    def fft(a, inverse=False):
+        transform = scipy.fft.ifft if inverse else scipy.fft.fft
+        return transform(a, axis=axis, norm="ortho", overwrite_x=True, workers=workers)
+
+    # Shift the signals once, X holding the FT and then the signals in turn
+    X = np.fft.ifftshift(np.asarray(X, dtype=dtype), axes=axis)
+    Y = np.fft.ifftshift(np.asarray(Y, dtype=dtype), axes=axis)
+    measured = Y != 0
+    lam = np.asarray(lam, dtype=real_dtype)
+    if lam.ndim > 0:
+        lam = np.fft.ifftshift(np.broadcast_to(lam, X.shape), axes=axis)
+
+    magnitude = np.empty(X.shape, dtype=real_dtype)
+    history = {"objective": [], "error": [], "time": []}
+    if extended_output:
+        residual = np.empty_like(X)
+        unmeasured = ~measured
+        measured_norm = _norm(Y, magnitude, axis)
+    if tol is not None:
+        x_previous = np.empty_like(X)
+        change = np.empty_like(X)
+    if method == "fista":
+        X_previous = np.empty_like(X)
+        momentum = np.empty_like(X)
+
+    t = 1.0
+    for i in range(n_iter):
+        # Compute the inverse FT of the signal
+        X = fft(X, inverse=True)
+
+        # Apply soft-thresholding, scaling the signal by max(1 - lam / |x|, 0)
+        np.abs(X, out=magnitude)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            np.divide(lam, magnitude, out=magnitude)
+        np.subtract(1, magnitude, out=magnitude)
+        np.fmax(magnitude, 0, out=magnitude)
+        X *= magnitude
+
+        if extended_output:
+            l1_norm = np.sum(lam * np.abs(X), axis=axis)
+
+        converged = False
+        if tol is not None:
+            if i > 0:
+                # Relative change below tol, or no change
+                np.subtract(X, x_previous, out=change)
+                change_norm = _norm(change, magnitude, axis)
+                previous_norm = _norm(x_previous, magnitude, axis)
+                converged = np.all(
+                    (change_norm < tol * previous_norm) | (change_norm == 0)
+                )
+            np.copyto(x_previous, X)
+
+        # Compute the FT of the signal back
+        X = fft(X)
+
+        if extended_output:
+            np.subtract(X, Y, out=residual)
+            np.copyto(residual, 0, where=unmeasured)
+            residual_norm = _norm(residual, magnitude, axis)
+            history["objective"].append(0.5 * residual_norm**2 + l1_norm)
+            history["error"].append(residual_norm / measured_norm)
+            history["time"].append(time.perf_counter() - start)
+
+        # Extrapolate the FT with the momentum
+        if method == "fista":
+            t_next = (1 + np.sqrt(1 + 4 * t**2)) / 2
+            if i > 0:
+                np.subtract(X, X_previous, out=momentum)
+                momentum *= (t - 1) / t_next
+            np.copyto(X_previous, X)
+            if i > 0:
+                X += momentum
+            t = t_next
+
+        # Apply data consistency constraint
+        np.copyto(X, Y, where=measured)
+        if converged:
+            break
+
+    # Final inverse transform to time domain, and shift back
+    x = np.fft.fftshift(fft(X, inverse=True), axes=axis)
+    if extended_output:
+        return x, history
+
+    return x
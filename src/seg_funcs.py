@@ -0,0 +1,821 @@
+"""!@file seg_funcs.py
+@brief Python script containing the segmentation functions
+for the Image Analysis Coursework
+
+@details List of functions:
+- otsu_threshold: Apply Otsu's thresholding to an image
+- otsu_thresholds: Find Otsu's thresholds for a stack of images, with 2 or more classes
+- otsu_from_histogram: Find Otsu's threshold from the histogram of an image
+- region_growing_bfs: Reference (pure Python) region growing algorithm
+- region_growing: Frontier-based, vectorized region growing algorithm
+- region_growing_multi: Region growing from several seeds, returning a label image
+- join_tolerance: Lowest region growing threshold at which each pixel joins the region
+- label_stats: Size, bounding box, centroid and representative pixel of all labels
+- measure_labels: Table of the area, diameter, intensity, bounding box and centroid
+of all the objects of a label image
+- kmeans_histogram: Exact 1D k-means of the pixel values, on the image histogram
+
+
+@author T. Breitburd on 14/06/2024"""
+
+
+import heapq
+import numpy as np
+from scipy.ndimage import generate_binary_structure
+
+
+def otsu_threshold(image):
+    """!@brief Function to apply Otsu's thresholding to an image,
+    from https://www.baeldung.com/cs/otsu-segmentation, section 2.4
+
+    @param image the image to threshold, numpy array
+
+    @return the thresholded image, numpy array"""
+
+    # Discretize the problem of finding the optimal threshold by binning the
+    # data, and find the threshold that maximizes the inter-class variance
+    threshold = otsu_thresholds(image[None])[0]
+
+    # Apply the threshold
+    image_ = image < threshold
+
+    return image_
+
+
+def otsu_thresholds(images, classes=2, chunk=64):
+    """!@brief Function to find Otsu's thresholds for a stack of images at once
+
+    @details The 256-bin histograms of all the images are computed together,
+    with the same bins as np.histogram(image, bins=256), so the thresholds are
+    the same as for otsu_threshold on each image. For 8 and 16 bit images, the
+    pixels are only counted once per grey level, and the grey levels are binned.
+    With more than 2 classes, the thresholds maximize the inter-class variance
+    over all the class boundaries, found by dynamic programming.
+
+    @param images the stack of images, numpy array of shape (n_images, ...)
+    @param classes the number of classes, int
+    @param chunk the number of images processed together, to bound memory, int
+
+    @return the thresholds, with the pixels of class k in
+    [thresholds[k - 1], thresholds[k]), numpy array of shape (n_images,)
+    for 2 classes, or (n_images, classes - 1)"""
+
+    thresholds = []
+    for start in range(0, len(images), chunk):
+        hist, bins = _histograms(images[start:][:chunk])
+        if classes == 2:
+            thresholds.append(otsu_from_histogram(hist, bins))
+        else:
+            thresholds.append(_multi_otsu_from_histogram(hist, bins, classes))
+
+    return np.concatenate(thresholds)
+
+
+def _histograms(images, n_bins=256):
+    """!@brief Compute the normalized histograms of a stack of images,
+    with the same bins as np.histogram(image, bins=n_bins, density=True)
+
+    @param images the stack of images, numpy array of shape (n_images, ...)
+    @param n_bins the number of bins, int
+
+    @return the histograms and bin edges, numpy arrays of shape
+    (n_images, n_bins) and (n_images, n_bins + 1)"""
+
+    n_images = len(images)
+    images = images.reshape(n_images, -1)
+
+    if images.dtype in (np.uint8, np.uint16):
+        # Count the pixels of each grey level, for all images at once with the
+        # levels of each image offset by its index, then bin the grey levels
+        n_levels = np.iinfo(images.dtype).max + 1
+        offsets = np.arange(n_images)[:, None] * n_levels
+        weights = np.bincount(
+            (images + offsets).ravel(), minlength=n_images * n_levels
+        ).reshape(n_images, n_levels)
+        values = np.broadcast_to(np.arange(n_levels, dtype=np.float64), weights.shape)
+        present = weights > 0
+        v_min = np.argmax(present, axis=1).astype(np.float64)
+        v_max = n_levels - 1 - np.argmax(present[:, ::-1], axis=1).astype(np.float64)
+    else:
+        weights = None
+        values = images.astype(np.float64)
+        v_min, v_max = values.min(axis=1), values.max(axis=1)
+
+    # Expand empty ranges, as np.histogram does
+    empty = v_min == v_max
+    v_min = np.where(empty, v_min - 0.5, v_min)
+    v_max = np.where(empty, v_max + 0.5, v_max)
+    bins = np.linspace(v_min, v_max, n_bins + 1, axis=1)
+
+    # Get the bin of each value, with the same arithmetic as np.histogram
+    indices = ((values - v_min[:, None]) / (v_max - v_min)[:, None] * n_bins).astype(
+        np.intp
+    )
+    np.clip(indices, 0, n_bins - 1, out=indices)
+    indices -= values < np.take_along_axis(bins, indices, axis=1)
+    indices += (values >= np.take_along_axis(bins, indices + 1, axis=1)) & (
+        indices != n_bins - 1
+    )
+    np.clip(indices, 0, n_bins - 1, out=indices)
+
+    # Count the values in each bin, for all images at once
+    offsets = np.arange(n_images)[:, None] * n_bins
+    if weights is not None:
+        weights = weights.ravel()
+    counts = np.bincount(
+        (indices + offsets).ravel(), weights=weights, minlength=n_images * n_bins
+    )
+    counts = counts.reshape(n_images, n_bins).astype(np.int64)
+
+    # Normalize the same way np.histogram does
+    hist = counts / np.diff(bins, axis=1) / counts.sum(axis=1, keepdims=True)
+
+    return hist, bins
+
+
+def otsu_from_histogram(hist, bins):
+    """!@brief Function to find Otsu's threshold from the histogram of an image,
+    from https://www.baeldung.com/cs/otsu-segmentation, section 2.4
+
+    @param hist the normalized histogram of the image, or the stacked histograms
+    of several images, numpy array
+    @param bins the histogram bin edges, numpy array
+
+    @return the threshold, float, or the thresholds, numpy array"""
+
+    # Calculate bin centres
+    bin_centres = (bins[..., :-1] + bins[..., 1:]) / 2
+
+    # Because histogram is normalized, we can calculate the probabilities
+    # of the classes, for all possible thresholds
+    P0 = np.cumsum(hist, axis=-1)
+    P1 = np.cumsum(hist[..., ::-1], axis=-1)[..., ::-1]
+
+    # Calculate the class means
+    M0 = np.cumsum(hist * bin_centres, axis=-1) / P0
+    M1 = (np.cumsum((hist * bin_centres)[..., ::-1], axis=-1) / P1[..., ::-1])[
+        ..., ::-1
+    ]
+
+    # Calculate the inter-class variance
+    var = P0 * P1 * ((M0 - M1) ** 2)
+
+    # Find the threshold that maximizes the inter-class variance
+    best = np.argmax(var, axis=-1)
+    threshold = np.take_along_axis(bins, best[..., None], axis=-1)[..., 0]
+
+    return threshold
+
+
+def _multi_otsu_from_histogram(hist, bins, classes):
+    """!@brief Find the multi-level Otsu thresholds from stacked histograms
+
+    @details Maximizing the inter-class variance amounts to maximizing the sum
+    over classes of (class weight * class mean^2), which is additive over the
+    classes, so the class boundaries are found by dynamic programming over the
+    bins, for all histograms at once.
+
+    @param hist the normalized histograms, numpy array of shape (n_images, n_bins)
+    @param bins the histogram bin edges, numpy array of shape (n_images, n_bins + 1)
+    @param classes the number of classes, int
+
+    @return the thresholds, numpy array of shape (n_images, classes - 1)"""
+
+    n_images, n_bins = hist.shape
+    bin_centres = (bins[:, :-1] + bins[:, 1:]) / 2
+
+    # Cumulative weights and first moments, from 0 to n_bins bins
+    P = np.concatenate([np.zeros((n_images, 1)), np.cumsum(hist, axis=1)], axis=1)
+    S = np.concatenate(
+        [np.zeros((n_images, 1)), np.cumsum(hist * bin_centres, axis=1)], axis=1
+    )
+
+    # Score of a class made of the bins i to j - 1, for all i < j
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weight = P[:, None, :] - P[:, :, None]
+        score = (S[:, None, :] - S[:, :, None]) ** 2 / weight
+    score[~(weight > 0)] = 0
+    i, j = np.indices((n_bins + 1, n_bins + 1))
+    score[:, i >= j] = -np.inf
+
+    # Best score of k classes covering the bins 0 to j - 1
+    best = score[:, 0, :]
+    boundaries = []
+    for _ in range(classes - 1):
+        total = best[:, :, None] + score
+        boundaries.append(np.argmax(total, axis=1))
+        best = np.max(total, axis=1)
+
+    # Backtrack from the last bin
+    thresholds = np.zeros((n_images, classes - 1), dtype=np.intp)
+    end = np.full(n_images, n_bins)
+    for k in range(classes - 2, -1, -1):
+        end = np.take_along_axis(boundaries[k], end[:, None], axis=1)[:, 0]
+        thresholds[:, k] = end
+
+    return np.take_along_axis(bins, thresholds, axis=1)
+
+
+def region_growing_bfs(image, seed, threshold=0.2):
+    """!@brief Perform region growing algorithm on an image,
+    from https://sbme-tutorials.github.io/2019/cv/notes/6_week6.html
+
+    @details This is the original pure Python implementation, kept as
+    the reference for region_growing, which gives identical results.
+
+    @param image the image to segment, numpy array
+    @param seed the seed pixel, tuple
+    @param threshold the threshold to use, float
+
+    @return the segmented image, numpy array"""
+
+    # Get the image dimensions
+    rows, cols = image.shape
+
+    # Initialize the segmented image and the list of unsegmented pixels
+    is_segmented = np.zeros_like(image, dtype=bool)
+    unsegmented_pxl = [seed]
+    seed_value = image[seed]
+    image_ = np.copy(image)
+
+    # While there are unsegmented pixels
+    while unsegmented_pxl:
+        # Get the next unssegmented pixel
+        x, y = unsegmented_pxl.pop(0)
+        if not is_segmented[x, y]:
+            is_segmented[x, y] = True
+
+            # Get the neighbors
+            neighbors = [(x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)]
+            for x_temp, y_temp in neighbors:
+                # Check if the pixel is in the image (for edges) and not segmented
+                if (
+                    0 <= x_temp < rows
+                    and 0 <= y_temp < cols
+                    and not is_segmented[x_temp, y_temp]
+                ):
+                    # Check for similarity
+                    if (
+                        np.abs(float(image[x_temp, y_temp]) - float(seed_value)) / 255
+                        < threshold
+                    ):
+                        unsegmented_pxl.append((x_temp, y_temp))
+
+    # Set the segmented region to white
+    for i in range(rows):
+        for j in range(cols):
+            if is_segmented[i, j]:
+                image_[i, j] = 255
+    return image_
+
+
+def _neighbour_offsets(ndim, connectivity=1):
+    """!@brief Get the offsets to the neighbours of a pixel
+
+    @param ndim the number of dimensions of the image, int
+    @param connectivity the maximum number of orthogonal steps to reach
+    a neighbour (1 gives 4/6-connectivity, ndim gives 8/26-connectivity), int
+
+    @return the neighbour offsets, numpy array of shape (n_neighbours, ndim)"""
+
+    footprint = generate_binary_structure(ndim, connectivity)
+    offsets = np.argwhere(footprint) - 1
+
+    # Remove the centre pixel
+    return offsets[np.any(offsets != 0, axis=1)]
+
+
+def _grow_frontier(similar, seed, connectivity=1):
+    """!@brief Grow the connected region of similar pixels containing the seed,
+    one frontier (i.e. one breadth-first search layer) at a time
+
+    @details Each pixel enters the frontier at most once, so the total work
+    is O(pixels), and all pixels of a frontier are handled with array operations.
+    The mask is padded with a border of dissimilar pixels, so the neighbours
+    of a pixel are found with fixed flat index offsets, without bounds checks.
+
+    @param similar the pixels similar enough to join the region, boolean numpy array
+    @param seed the seed pixel, tuple
+    @param connectivity the neighbourhood connectivity, int
+
+    @return the pixels in the grown region, boolean numpy array"""
+
+    shape = similar.shape
+    padded = np.pad(similar, 1, constant_values=False)
+
+    # Flat index offsets to the neighbours, in the padded image
+    strides = np.array(padded.strides) // padded.itemsize
+    offsets = _neighbour_offsets(len(shape), connectivity) @ strides
+    similar = padded.ravel()
+
+    # The seed always belongs to the region
+    is_segmented = np.zeros(similar.size, dtype=bool)
+    frontier = np.array([np.ravel_multi_index(np.add(seed, 1), padded.shape)])
+    is_segmented[frontier] = True
+
+    # Scratch array used to drop duplicated candidates without sorting
+    stamp = np.empty(similar.size, dtype=np.intp)
+
+    while frontier.size:
+        # Get the neighbours of the whole frontier
+        candidates = (frontier[None, :] + offsets[:, None]).ravel()
+
+        # Keep the similar pixels not segmented yet
+        candidates = candidates[similar[candidates] & ~is_segmented[candidates]]
+
+        # Keep a single copy of each, they form the next frontier
+        order = np.arange(candidates.size)
+        stamp[candidates] = order
+        frontier = candidates[stamp[candidates] == order]
+        is_segmented[frontier] = True
+
+    # Remove the padding
+    inner = tuple(slice(1, -1) for _ in shape)
+    return is_segmented.reshape(padded.shape)[inner]
+
+
+def region_growing(image, seed, threshold=0.2):
+    """!@brief Perform region growing algorithm on an image, growing the region
+    one frontier at a time with array operations
+
+    @details Gives the same result as region_growing_bfs: the region is the
+    4-connected set of pixels within threshold of the seed value containing the seed.
+
+    @param image the image to segment, numpy array
+    @param seed the seed pixel, tuple
+    @param threshold the threshold to use, float
+
+    @return the segmented image, numpy array"""
+
+    seed = tuple(int(s) for s in seed)
+    seed_value = image[seed]
+
+    # Check for similarity, for all pixels at once
+    similar = np.abs(image.astype(np.float64) - float(seed_value)) / 255 < threshold
+
+    is_segmented = _grow_frontier(similar, seed)
+
+    # Set the segmented region to white
+    image_ = np.copy(image)
+    image_[is_segmented] = 255
+
+    return image_
+
+
+def region_growing_multi(image, seeds, thresholds=0.2, connectivity=1):
+    """!@brief Perform region growing from several seeds at once, in a single
+    traversal of the image
+
+    @details All regions grow one frontier at a time, each pixel being compared
+    to the value of the seed of the region reaching it. A pixel reached by several
+    regions in the same frontier goes to the one with the lowest seed id.
+    A single seed gives the same region as region_growing.
+
+    @param image the image to segment, numpy array
+    @param seeds the seed pixels, list of tuples
+    @param thresholds the threshold to use for each seed, float or list of floats
+    @param connectivity the neighbourhood connectivity, int
+
+    @return the label image, with the seed id (from 1) of the region each
+    pixel belongs to and 0 elsewhere, numpy array"""
+
+    seeds = [tuple(int(s) for s in seed) for seed in seeds]
+    thresholds = np.broadcast_to(np.asarray(thresholds, dtype=np.float64), len(seeds))
+
+    # Pad the image, so the neighbours of a pixel are found with fixed flat index
+    # offsets, without bounds checks. The padding is labelled -1 so it is never grown
+    padded = np.pad(image, 1)
+    values = padded.ravel()
+    if image.dtype not in (np.uint8, np.uint16):
+        values = values.astype(np.float64)
+    strides = np.array(padded.strides) // padded.itemsize
+    offsets = _neighbour_offsets(image.ndim, connectivity) @ strides
+    labels = np.pad(np.zeros(image.shape, dtype=np.int32), 1, constant_values=-1)
+    labels = labels.ravel()
+
+    # Seed values and thresholds, indexed by label (label 0 is unused)
+    seed_values = np.concatenate([[np.nan], [float(image[seed]) for seed in seeds]])
+    thresholds = np.concatenate([[np.nan], thresholds])
+
+    # For 8 and 16 bit images, tabulate the similarity of every grey level to
+    # every seed, so pixels are checked with a lookup instead of arithmetic
+    lookup = None
+    if image.dtype in (np.uint8, np.uint16):
+        levels = np.arange(np.iinfo(image.dtype).max + 1, dtype=np.float64)
+        lookup = (
+            np.abs(levels[None, :] - seed_values[:, None]) / 255 < thresholds[:, None]
+        )
+
+    # The seeds always belong to their region, the first one wins if repeated
+    frontier = np.ravel_multi_index(np.add(seeds, 1).T, padded.shape)
+    frontier_labels = np.arange(1, len(seeds) + 1, dtype=np.int32)
+    labels[frontier[::-1]] = frontier_labels[::-1]
+    keep = labels[frontier] == frontier_labels
+    frontier, frontier_labels = frontier[keep], frontier_labels[keep]
+
+    # Scratch array used to drop duplicated candidates without sorting
+    stamp = np.empty(values.size, dtype=np.intp)
+
+    while frontier.size:
+        # Get the neighbours of the whole frontier, which is sorted by label
+        # so the candidates are too
+        candidates = (frontier[:, None] + offsets[None, :]).ravel()
+        candidate_labels = np.repeat(frontier_labels, offsets.size)
+
+        # Keep the unlabelled pixels similar to the seed of the region reaching them
+        keep = labels[candidates] == 0
+        candidates, candidate_labels = candidates[keep], candidate_labels[keep]
+        if lookup is not None:
+            keep = lookup[candidate_labels, values[candidates]]
+        else:
+            keep = (
+                np.abs(values[candidates] - seed_values[candidate_labels]) / 255
+                < thresholds[candidate_labels]
+            )
+        candidates, candidate_labels = candidates[keep], candidate_labels[keep]
+
+        # Keep the first copy of each, i.e. the one with the lowest label
+        order = np.arange(candidates.size)
+        stamp[candidates[::-1]] = order[::-1]
+        keep = stamp[candidates] == order
+        frontier, frontier_labels = candidates[keep], candidate_labels[keep]
+        labels[frontier] = frontier_labels
+
+    # Remove the padding
+    inner = tuple(slice(1, -1) for _ in range(image.ndim))
+    return labels.reshape(padded.shape)[inner].copy()
+
+
+def _join_tolerance_heap(distance, seed, offsets):
+    """!@brief Priority flood from the seed, with a binary heap
+
+    @param distance the normalised distance of each pixel to the seed value,
+    flattened padded numpy array (inf on the padding)
+    @param seed the flat index of the seed pixel in the padded image, int
+    @param offsets the flat index offsets to the neighbours, numpy array
+
+    @return the join tolerance of each pixel, flattened padded numpy array"""
+
+    join = np.full(distance.size, np.inf)
+    is_done = ~np.isfinite(distance)
+    offsets = offsets.tolist()
+
+    # Always expand the pixel with the lowest tolerance first
+    join[seed] = 0.0
+    heap = [(0.0, seed)]
+    while heap:
+        tolerance, pixel = heapq.heappop(heap)
+        if is_done[pixel]:
+            continue
+        is_done[pixel] = True
+        for offset in offsets:
+            neighbour = pixel + offset
+            if not is_done[neighbour]:
+                candidate = max(tolerance, distance[neighbour])
+                if candidate < join[neighbour]:
+                    join[neighbour] = candidate
+                    heapq.heappush(heap, (candidate, neighbour))
+
+    return join
+
+
+def _join_tolerance_buckets(levels, seed, offsets):
+    """!@brief Priority flood from the seed, with one bucket per integer level
+    and each bucket grown one frontier at a time with array operations
+
+    @details Levels are processed in increasing order, so a pixel gets its final
+    join level the first time it is reached: the maximum of the current level
+    and its own level.
+
+    @param levels the integer distance of each pixel to the seed value,
+    flattened padded numpy array (-1 on the padding)
+    @param seed the flat index of the seed pixel in the padded image, int
+    @param offsets the flat index offsets to the neighbours, numpy array
+
+    @return the join level of each pixel, flattened padded numpy array"""
+
+    join = np.full(levels.size, -1, dtype=levels.dtype)
+    is_reached = levels < 0
+    buckets = [[] for _ in range(levels.max() + 1)]
+
+    join[seed] = 0
+    is_reached[seed] = True
+    buckets[0].append(np.array([seed]))
+
+    # Scratch array used to drop duplicated candidates without sorting
+    stamp = np.empty(levels.size, dtype=np.intp)
+
+    for level, bucket in enumerate(buckets):
+        frontier = np.concatenate(bucket) if bucket else np.array([], dtype=np.intp)
+        buckets[level] = None
+        while frontier.size:
+            # Get the neighbours of the whole frontier, not reached yet
+            candidates = (frontier[None, :] + offsets[:, None]).ravel()
+            candidates = candidates[~is_reached[candidates]]
+            order = np.arange(candidates.size)
+            stamp[candidates] = order
+            candidates = candidates[stamp[candidates] == order]
+            is_reached[candidates] = True
+
+            # Pixels below the current level join at this level and keep growing,
+            # the others join at their own level, and grow once it is reached
+            candidate_levels = levels[candidates]
+            join[candidates] = np.maximum(candidate_levels, level)
+            is_below = candidate_levels <= level
+            frontier = candidates[is_below]
+            for higher in np.unique(candidate_levels[~is_below]):
+                buckets[higher].append(candidates[candidate_levels == higher])
+
+    return join
+
+
+def join_tolerance(image, seed, connectivity=1):
+    """!@brief Compute the join tolerance of every pixel, i.e. the lowest
+    region_growing threshold at which the pixel is part of the region
+
+    @details A pixel joins the region once there is a path to it from the seed
+    along which every pixel is within threshold of the seed value, so its join
+    tolerance is the minimum over paths of the largest normalised distance
+    |value - seed value| / 255 along the path. This is computed with a single
+    priority flood from the seed, so the region for any threshold > 0 is then
+    given by join_tolerance(image, seed) < threshold, as a single comparison.
+
+    @param image the image to segment, numpy array
+    @param seed the seed pixel, tuple
+    @param connectivity the neighbourhood connectivity, int
+
+    @return the join tolerance of each pixel (0 at the seed), numpy array"""
+
+    seed = tuple(int(s) for s in seed)
+    seed_value = image[seed]
+
+    # Flat index offsets to the neighbours, in the image padded by 1 pixel
+    padded_shape = tuple(size + 2 for size in image.shape)
+    strides = np.cumprod((1,) + padded_shape[:0:-1])[::-1]
+    offsets = _neighbour_offsets(image.ndim, connectivity) @ strides
+    flat_seed = int(np.ravel_multi_index(np.add(seed, 1), padded_shape))
+    inner = tuple(slice(1, -1) for _ in range(image.ndim))
+
+    if image.dtype in (np.uint8, np.uint16):
+        # The distances only take integer values, so use a bucket queue
+        levels = np.abs(image.astype(np.int32) - int(seed_value))
+        levels = np.pad(levels, 1, constant_values=-1).ravel()
+        join = _join_tolerance_buckets(levels, flat_seed, offsets)
+        join = join.reshape(padded_shape)[inner]
+
+        # Same arithmetic as in region_growing, so thresholds compare identically
+        return join.astype(np.float64) / 255
+
+    distance = np.abs(image.astype(np.float64) - float(seed_value)) / 255
+    distance = np.pad(distance, 1, constant_values=np.inf).ravel()
+    join = _join_tolerance_heap(distance, flat_seed, offsets)
+
+    return join.reshape(padded_shape)[inner]
+
+
+def label_stats(labels):
+    """!@brief Compute the statistics of all the labels of a label image,
+    in one pass over the image
+
+    @details The pixels are sorted by label once (a stable sort, which is a
+    linear time radix sort for up to 65536 labels), so the pixels of each label
+    are contiguous and in raster order, and all the statistics are reductions
+    over these segments. Labels with no pixels get a size of 0, and -1 or NaN
+    for the other statistics.
+
+    @param labels the label image, non-negative integer numpy array
+
+    @return a dictionary with, for each label from 0 to labels.max():
+    - "size": the number of pixels, numpy array of shape (n_labels,)
+    - "bbox": the bounding box (min_row, min_col, ..., max_row, max_col, ...),
+    with the max excluded as in skimage's regionprops, numpy array of shape
+    (n_labels, 2 * ndim)
+    - "centroid": the mean pixel coordinates, numpy array of shape (n_labels, ndim)
+    - "representative": the middle pixel of the label in raster order, the one
+    used as seed in the CT scripts, numpy array of shape (n_labels, ndim)"""
+
+    flat = labels.ravel()
+    n_labels = int(flat.max()) + 1
+
+    # Sort the pixels by label, with the smallest key type for a radix sort
+    if n_labels <= 256:
+        key = flat.astype(np.uint8)
+    elif n_labels <= 65536:
+        key = flat.astype(np.uint16)
+    else:
+        key = flat
+    order = np.argsort(key, kind="stable")
+    coords = np.unravel_index(order, labels.shape)
+
+    # Segment of the sorted pixels holding each label
+    size = np.bincount(flat, minlength=n_labels)
+    starts = (np.cumsum(size) - size)[size > 0]
+    present = size > 0
+
+    bbox = np.full((n_labels, 2 * labels.ndim), -1, dtype=np.intp)
+    centroid = np.full((n_labels, labels.ndim), np.nan)
+    representative = np.full((n_labels, labels.ndim), -1, dtype=np.intp)
+    middle = starts + size[present] // 2
+    for axis, coord in enumerate(coords):
+        bbox[present, axis] = np.minimum.reduceat(coord, starts)
+        bbox[present, labels.ndim + axis] = np.maximum.reduceat(coord, starts) + 1
+        centroid[present, axis] = np.add.reduceat(coord, starts) / size[present]
+        representative[present, axis] = coord[middle]
+
+    return {
+        "size": size,
+        "bbox": bbox,
+        "centroid": centroid,
+        "representative": representative,
+    }
+
+
+def measure_labels(labels, image):
+    """!@brief Measure all the objects of a 2D label image, with reductions over
+    the whole image rather than a loop over the objects
+
+    @details The size, bounding box and centroid of each object are those of
+    label_stats, and the sums of the pixel values over each object are computed
+    with np.bincount, so the cost is a few passes over the image whatever the
+    number of objects. The standard deviation is computed from the deviations
+    to the mean of each object, in a second pass. The values are the same as
+    the area, equivalent_diameter_area, intensity_mean, intensity_std (with the
+    population convention), bbox and centroid of skimage's regionprops.
+
+    @param labels the label image, 0 being the background, non-negative integer
+    2D numpy array
+    @param image the intensity image, of the same shape, numpy array
+
+    @return the table, with one row per object in increasing label order, as a
+    dictionary of columns: "label", "area", "equivalent_diameter",
+    "mean_intensity", "std_intensity", "bbox_min_row", "bbox_min_col",
+    "bbox_max_row", "bbox_max_col" (the max excluded), "centroid_row" and
+    "centroid_col", numpy arrays"""
+
+    if labels.ndim != 2 or labels.shape != np.shape(image):
+        raise ValueError("labels and image must be 2D arrays of the same shape")
+    if labels.size == 0:
+        # A single background pixel, label_stats needing at least one pixel
+        labels = np.zeros((1, 1), dtype=np.intp)
+        image = np.zeros((1, 1))
+
+    flat = labels.ravel()
+    values = np.asarray(image, dtype=np.float64).ravel()
+    stats = label_stats(labels)
+    area = stats["size"]
+    n_labels = len(area)
+
+    # Only the labels which are present, the background excluded
+    present = np.flatnonzero(area)
+    present = present[present > 0]
+    count = area[present].astype(np.float64)
+
+    # Sums of the values over each label, then of the squared deviations to
+    # the mean in a second pass
+    sum_values = np.bincount(flat, weights=values, minlength=n_labels)
+    mean = np.zeros(n_labels)
+    mean[present] = sum_values[present] / count
+    sum_squares = np.bincount(
+        flat, weights=(values - mean[flat]) ** 2, minlength=n_labels
+    )
+
+    bbox = stats["bbox"][present]
+    centroid = stats["centroid"][present]
+
+    return {
+        "label": present,
+        "area": area[present],
+        "equivalent_diameter": np.sqrt(4 * count / np.pi),
+        "mean_intensity": mean[present],
+        "std_intensity": np.sqrt(sum_squares[present] / count),
+        "bbox_min_row": bbox[:, 0],
+        "bbox_min_col": bbox[:, 1],
+        "bbox_max_row": bbox[:, 2],
+        "bbox_max_col": bbox[:, 3],
+        "centroid_row": centroid[:, 0],
+        "centroid_col": centroid[:, 1],
+    }
+
+
+def _kmeans_1d(values, weights, n_clusters):
+    """!@brief Optimal 1D k-means of weighted sorted values, by dynamic programming
+
+    @details The clusters of the optimal 1D k-means are ranges of the sorted
+    values, and minimizing the within-cluster sum of squares amounts to
+    maximizing the sum over clusters of (sum of weighted values)^2 / weight,
+    which is additive over the clusters, as in _multi_otsu_from_histogram.
+    The start of the last cluster of the best k clusters covering the values 0
+    to j - 1 does not decrease with j, so each row of the dynamic programme is
+    found by divide and conquer: the start is searched for the middle j, and
+    bounds those of the j below and above it. All the j of a level of the
+    recursion are searched at once, and only the previous row of scores and
+    the starts of the clusters are kept, so for V distinct values the memory is
+    O(n_clusters * V) and the time O(n_clusters * V * log(V)).
+
+    @param values the distinct values, sorted, float numpy array
+    @param weights the number of occurrences of each value, numpy array
+    @param n_clusters the number of clusters, int
+
+    @return the index of the first value of each cluster, int numpy array"""
+
+    n_values = len(values)
+
+    # Cumulative weights and first moments, from 0 to n_values values
+    P = np.concatenate([[0], np.cumsum(weights, dtype=np.float64)])
+    S = np.concatenate([[0], np.cumsum(weights * values, dtype=np.float64)])
+
+    # Best score of 1 cluster covering the values 0 to j - 1
+    best = np.full(n_values + 1, -np.inf)
+    best[1:] = S[1:] ** 2 / P[1:]
+
+    # Start of the last of k + 2 clusters covering the values 0 to j - 1
+    boundaries = np.zeros((n_clusters - 1, n_values + 1), dtype=np.intp)
+    for k in range(n_clusters - 1):
+        # Ranges of j, with the bounds of the start of their last cluster
+        j_low, j_high = np.array([k + 2]), np.array([n_values])
+        i_low, i_high = np.array([k + 1]), np.array([n_values - 1])
+        new_best = np.full(n_values + 1, -np.inf)
+        while len(j_low):
+            j = (j_low + j_high) // 2
+            lengths = np.minimum(i_high, j - 1) - i_low + 1
+
+            # All the starts to search, for all the middle j at once
+            first = np.cumsum(lengths) - lengths
+            i = np.arange(lengths.sum()) - np.repeat(first - i_low, lengths)
+            j_i = np.repeat(j, lengths)
+            total = best[i] + (S[j_i] - S[i]) ** 2 / (P[j_i] - P[i])
+
+            # First start with the best total, for each j
+            new_best[j] = np.maximum.reduceat(total, first)
+            is_best = np.flatnonzero(total == np.repeat(new_best[j], lengths))
+            start = i[is_best[np.searchsorted(is_best, first)]]
+            boundaries[k, j] = start
+
+            # Split the ranges of j at their middles
+            left, right = j_low < j, j < j_high
+            j_low, j_high, i_low, i_high = (
+                np.concatenate([j_low[left], j[right] + 1]),
+                np.concatenate([j[left] - 1, j_high[right]]),
+                np.concatenate([i_low[left], start[right]]),
+                np.concatenate([start[left], i_high[right]]),
+            )
+        best = new_best
+
+    # Backtrack from the last value
+    starts = np.zeros(n_clusters, dtype=np.intp)
+    end = n_values
+    for k in range(n_clusters - 2, -1, -1):
+        end = boundaries[k, end]
+        starts[k + 1] = end
+
+    return starts
+
+
+def kmeans_histogram(image, n_clusters=2):
+    """!@brief Segment an image by 1D k-means of its pixel values, solved exactly
+    on the histogram of the image
+
+    @details Gives the optimal clustering of the pixel values, as k-means would
+    at best, with the clusters labelled in increasing order of their centres.
+    The cost depends on the number of distinct values (at most 256 for uint8
+    images, 65536 for uint16 images), not on the number of pixels, apart from
+    the histogram and the lookup table mapping the values to their labels: the
+    memory grows as the number of clusters times the number of distinct
+    values, so the whole uint16 range takes about 10 MB and 0.1 s.
+
+    @param image the image, numpy array
+    @param n_clusters the number of clusters, int
+
+    @return the labels, int32 numpy array of the shape of the image, and the
+    cluster centres, float numpy array"""
+
+    image = np.asarray(image)
+    if image.dtype in (np.uint8, np.uint16):
+        counts = np.bincount(image.ravel())
+        values = np.flatnonzero(counts)
+        weights = counts[values]
+    else:
+        values, inverse, weights = np.unique(
+            image, return_inverse=True, return_counts=True
+        )
+    if n_clusters > len(values):
+        raise ValueError("more clusters than distinct values in the image")
+
+    starts = _kmeans_1d(values.astype(np.float64), weights, n_clusters)
+
+    # Label of each distinct value, and centre of each cluster
+    value_labels = np.searchsorted(starts, np.arange(len(values)), side="right") - 1
+    value_labels = value_labels.astype(np.int32)
+    centres = np.bincount(
+        value_labels, weights=weights * values.astype(np.float64)
+    ) / np.bincount(value_labels, weights=weights)
+
+    if image.dtype in (np.uint8, np.uint16):
+        # Lookup table from the values to their labels
+        lut = np.zeros(len(counts), dtype=np.int32)
+        lut[values] = value_labels
+        labels = lut[image]
+    else:
+        labels = value_labels[inverse.reshape(image.shape)]
+
+    return labels, centres
@@ -0,0 +1,296 @@
+"""!@file segment.py
+
+@brief Run a segmentation pipeline on many images, in one process
+
+@details The pipelines of the mod_1 scripts (ct, ct_custom, coins, tulips) are
+run on all the input images one after the other, so the interpreter is started
+and the imports are done only once. The masks are saved as PNG images in the
+output directory, and the wall time of each stage of the pipeline is reported,
+summed over all the images, along with the time taken by the imports.
+Optionally, the objects of each mask are measured (area, equivalent diameter,
+mean and standard deviation of the intensity, bounding box and centroid), on
+the image segmented by the pipeline (the inpainted and rescaled image for the
+coins, the grey-level image for the tulips), and written to a table, with
+one row per object, to which the rows of each image are appended as soon as
+it is segmented: a CSV file, or a .npz file of columns, stored as one chunk
+per image and joined by load_npz.
+
+Usage: python src/segment.py pipeline image [image ...] [--output DIR]
+[--measure TABLE]
+
+@author T. Breitburd on 14/06/2024"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+# numpy, skimage and the pipelines are only imported when a pipeline is run,
+# which times their imports
+
+
+def _load_grey(path):
+    """!@brief Load an image and keep only its first channel
+
+    @param path the path to the image, string
+
+    @return the image, numpy array"""
+
+    import skimage.io
+
+    image = skimage.io.imread(path)
+    if image.ndim == 3:
+        image = image[:, :, 0]
+
+    return image
+
+
+def _load_rgb(path):
+    """!@brief Load an image and drop its alpha channel
+
+    @param path the path to the image, string
+
+    @return the image, numpy array"""
+
+    import skimage.io
+
+    return skimage.io.imread(path)[:, :, :3]
+
+
+def _segment_tulips(image, timings, buffers):
+    """!@brief Segment the tulips from their hue channel only, computed into a
+    float32 array reused across the images
+
+    @param image the tulips image, uint8 RGB, numpy array
+    @param timings the wall time of each stage, dict
+    @param buffers the arrays reused across the images of a run, the hue
+    channel being (re)allocated under "hue" when the image size changes, dict
+
+    @return the opened Chan-Vese mask, and the image, numpy arrays"""
+
+    import numpy as np
+    import pipelines
+
+    hue = buffers.get("hue")
+    if hue is None or hue.shape != image.shape[:2]:
+        hue = buffers["hue"] = np.empty(image.shape[:2], dtype=np.float32)
+
+    mask = pipelines.segment_tulips(image, timings, hue_only=True, hue=hue)[3]
+
+    return mask, image
+
+
+def _segment_ct(image, timings, buffers):
+    """!@brief Segment the lungs in a CT image, with the steps of mod_1_CT
+
+    @param image the grey-level image, numpy array
+    @param timings the wall time of each stage, dict
+    @param buffers the arrays reused across the images of a run, unused, dict
+
+    @return the lungs mask, and the image, numpy arrays"""
+
+    import pipelines
+
+    return pipelines.segment_ct(image, timings), image
+
+
+def _segment_ct_custom(image, timings, buffers):
+    """!@brief Segment the lungs in a CT image, with the steps of mod_1_CT_custom
+
+    @param image the grey-level image, numpy array
+    @param timings the wall time of each stage, dict
+    @param buffers the arrays reused across the images of a run, unused, dict
+
+    @return the lungs mask, and the image, numpy arrays"""
+
+    import pipelines
+
+    return pipelines.segment_ct_custom(image, timings), image
+
+
+def _segment_coins(image, timings, buffers):
+    """!@brief Segment the coins
+
+    @param image the grey-level image, numpy array
+    @param timings the wall time of each stage, dict
+    @param buffers the arrays reused across the images of a run, unused, dict
+
+    @return the mask of the coins, and the inpainted and rescaled image which
+    is segmented, numpy arrays"""
+
+    import pipelines
+
+    rescaled, _, labelled = pipelines.segment_coins(image, timings)
+
+    return labelled > 0, rescaled
+
+
+# For each pipeline: how to load the image, and how to get the mask, and the
+# image on which its objects are measured, from the image, the timings and the
+# buffers of the run
+PIPELINES = {
+    "ct": (_load_grey, _segment_ct),
+    "ct_custom": (_load_grey, _segment_ct_custom),
+    "coins": (_load_grey, _segment_coins),
+    "tulips": (_load_rgb, _segment_tulips),
+}
+
+
+def measure_mask(image, mask, image_name):
+    """!@brief Measure the objects of a mask, on the grey-level image
+
+    @param image the image segmented by the pipeline, grey-level or RGB, numpy
+    array
+    @param mask the mask, numpy array
+    @param image_name the name of the image, for the "image" column, string
+
+    @return the table of measure_labels, with an "image" column first, dict"""
+
+    import numpy as np
+    from skimage.color import rgb2gray
+    from skimage.measure import label
+    from seg_funcs import measure_labels
+
+    intensity = image if image.ndim == 2 else rgb2gray(image)
+    table = measure_labels(label(mask), intensity)
+
+    return {"image": np.full(len(table["label"]), image_name), **table}
+
+
+def append_csv(path, table):
+    """!@brief Append the rows of a table to a CSV file, writing the header
+    first if the file is new or empty
+
+    @param path the path to the CSV file, string
+    @param table the table, dictionary of columns of the same length"""
+
+    new = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, "a", newline="") as file:
+        writer = csv.writer(file)
+        if new:
+            writer.writerow(table.keys())
+        writer.writerows(zip(*(column.tolist() for column in table.values())))
+
+
+def append_npz(path, table):
+    """!@brief Append a table to a .npz file, as one chunk of each column
+
+    @details The columns of the n-th table appended are stored as the arrays
+    "column/n" of the .npz file (a zip archive, appended to in place), so the
+    tables written survive a failure of the batch; load_npz joins the chunks.
+
+    @param path the path to the .npz file, string
+    @param table the table, dictionary of columns of the same length"""
+
+    import zipfile
+    import numpy as np
+
+    with zipfile.ZipFile(path, "a") as archive:
+        chunk = len(archive.namelist()) // len(table)
+        for key, column in table.items():
+            with archive.open(f"{key}/{chunk:06d}.npy", "w", force_zip64=True) as file:
+                np.lib.format.write_array(file, np.asarray(column))
+
+
+def load_npz(path):
+    """!@brief Load a table written by append_npz
+
+    @param path the path to the .npz file, string
+
+    @return the table, dictionary of columns, numpy arrays"""
+
+    import numpy as np
+
+    with np.load(path) as data:
+        chunks = {}
+        for name in data.files:
+            key = name.rsplit("/", 1)[0]
+            chunks.setdefault(key, []).append(data[name])
+
+    return {key: np.concatenate(columns) for key, columns in chunks.items()}
+
+
+def run_pipeline(name, paths, output, measure=None):
+    """!@brief Run a segmentation pipeline on images, saving the masks as PNG
+    images in the output directory, and optionally measuring their objects
+
+    @param name the name of the pipeline, one of PIPELINES, string
+    @param paths the paths to the images, list of strings
+    @param output the directory for the masks, string
+    @param measure the path to the table of the objects, a CSV or .npz file to
+    which the rows are appended, or None to not measure them, string
+
+    @return the wall time of the imports, under "imports", and of each stage
+    summed over the images, dict"""
+
+    start = time.perf_counter()
+    import numpy as np
+    import skimage.io
+    import pipelines
+
+    timings = {"imports": time.perf_counter() - start}
+
+    load, segment = PIPELINES[name]
+    os.makedirs(output, exist_ok=True)
+
+    buffers = {}
+    for path in paths:
+        with pipelines.stage(timings, "loading"):
+            image = load(path)
+
+        mask, segmented = segment(image, timings, buffers)
+
+        with pipelines.stage(timings, "saving"):
+            mask_name = os.path.splitext(os.path.basename(path))[0] + "_mask.png"
+            skimage.io.imsave(
+                os.path.join(output, mask_name),
+                np.asarray(mask, dtype=np.uint8) * 255,
+                check_contrast=False,
+            )
+
+        if measure is not None:
+            with pipelines.stage(timings, "measuring"):
+                table = measure_mask(segmented, mask, os.path.basename(path))
+                if measure.endswith(".npz"):
+                    append_npz(measure, table)
+                else:
+                    append_csv(measure, table)
+
+    return timings
+
+
+def main(argv=None):
+    """!@brief Run a segmentation pipeline on the images of the command line,
+    and report the wall time of the imports and of each stage
+
+    @param argv the command line arguments, sys.argv[1:] by default, list of strings
+
+    @return None"""
+
+    parser = argparse.ArgumentParser(description="Run a segmentation pipeline")
+    parser.add_argument("pipeline", choices=sorted(PIPELINES))
+    parser.add_argument("images", nargs="+", help="paths to the images")
+    parser.add_argument("--output", default="Masks", help="directory for the masks")
+    parser.add_argument(
+        "--measure",
+        default=None,
+        help="table of the objects of the masks, a .csv or .npz file (appended)",
+    )
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    timings = run_pipeline(args.pipeline, args.images, args.output, args.measure)
+    import_time = timings.pop("imports")
+
+    # Report the wall time of each stage
+    n_images = len(args.images)
+    print(f"{'stage':<16}{'total (s)':>12}{'per image (s)':>16}")
+    print(f"{'imports':<16}{import_time:>12.3f}{'':>16}")
+    for name, seconds in timings.items():
+        print(f"{name:<16}{seconds:>12.3f}{seconds / n_images:>16.3f}")
+    total = sum(timings.values())
+    print(f"{'total':<16}{total:>12.3f}{total / n_images:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
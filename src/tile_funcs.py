@@ -0,0 +1,240 @@
+"""!@file tile_funcs.py
+@brief Python script containing the functions to segment images in tiles
+for the Image Analysis Coursework
+
+@details The images are stored as .npy files and memory-mapped, so they never
+have to be loaded in RAM at once, and are processed one tile at a time. Each
+tile is read with a halo of extra pixels on each side, as wide as the reach of
+the operators applied to it (the radius of the structuring elements, the
+truncated radius of the Gaussian kernel), so the tiles of the result are the
+same as if the whole image had been processed at once, and are stitched
+without seams. The tiles at the edges of the image are not padded, so the
+operators handle the edges of the image as they do on the whole image.
+The global steps are streamed over the tiles: the histogram for Otsu's
+threshold, and the means inside and outside the contour at each iteration of
+the Chan-Vese segmentation, which only needs a halo of 1 pixel per iteration.
+
+List of functions:
+- tiles: Split an image into tiles, with halos of extra pixels
+- hue_threshold_tiled: Find Otsu's threshold of the hue of an RGB image, from
+its streamed histogram
+- blurred_mask_tiled: Threshold the hue, open and blur the mask, one tile at a time
+- chan_vese_tiled: Chan-Vese segmentation, one tile at a time
+- opening_tiled: Apply opening to a binary image, one tile at a time
+
+
+@author T. Breitburd on 14/06/2024"""
+
+import numpy as np
+from skimage.filters import gaussian, threshold_otsu
+from color_funcs import rgb2hue
+from levelset_funcs import _chan_vese_update
+from morph_funcs import binary_opening
+
+
+def tiles(shape, tile, halo=0):
+    """!@brief Split an image into square tiles, with halos of extra pixels
+
+    @param shape the shape of the image, tuple
+    @param tile the number of rows and columns of the tiles, int
+    @param halo the number of extra pixels on each side of the tiles, int
+
+    @return generator of (inner, outer, crop), the tile, the tile with its halo
+    clipped to the image, and the tile within the tile with its halo, tuples of
+    2 slices"""
+
+    for row in range(0, shape[0], tile):
+        for col in range(0, shape[1], tile):
+            inner = (
+                slice(row, min(row + tile, shape[0])),
+                slice(col, min(col + tile, shape[1])),
+            )
+            outer = tuple(
+                slice(max(s.start - halo, 0), min(s.stop + halo, size))
+                for s, size in zip(inner, shape)
+            )
+            crop = tuple(
+                slice(s.start - o.start, s.stop - o.start) for s, o in zip(inner, outer)
+            )
+            yield inner, outer, crop
+
+
+def hue_threshold_tiled(rgb, tile=1024):
+    """!@brief Find Otsu's threshold of the hue of an RGB image, from its
+    histogram accumulated one tile at a time
+
+    @details Gives the same threshold as threshold_otsu(rgb2hue(rgb)).
+
+    @param rgb the image, uint8 numpy array or memmap of shape (rows, cols, 3 or 4)
+    @param tile the number of rows and columns of the tiles, int
+
+    @return the threshold, float"""
+
+    # First pass for the range of the histogram
+    h_min, h_max = np.float32(np.inf), np.float32(-np.inf)
+    for inner, _, _ in tiles(rgb.shape[:2], tile):
+        hue = rgb2hue(rgb[inner])
+        h_min, h_max = min(h_min, hue.min()), max(h_max, hue.max())
+    if h_min == h_max:
+        return h_min
+
+    # Second pass to accumulate the histogram, with the bins of threshold_otsu
+    counts = np.zeros(256, dtype=np.int64)
+    for inner, _, _ in tiles(rgb.shape[:2], tile):
+        counts += np.histogram(rgb2hue(rgb[inner]), bins=256, range=(h_min, h_max))[0]
+    edges = np.histogram_bin_edges(
+        np.zeros(0, np.float32), bins=256, range=(h_min, h_max)
+    )
+
+    return threshold_otsu(hist=(counts, (edges[:-1] + edges[1:]) / 2.0))
+
+
+def blurred_mask_tiled(rgb, threshold, out, sigma=2, tile=1024):
+    """!@brief Threshold the hue of an RGB image, open the mask with the default
+    cross and blur it with a Gaussian, one tile at a time
+
+    @details The halo of the tiles is the reach of the opening, 2 pixels, plus
+    the radius of the Gaussian kernel truncated at 4 sigma, as in gaussian.
+
+    @param rgb the image, uint8 numpy array or memmap of shape (rows, cols, 3 or 4)
+    @param threshold the threshold of the hue, float
+    @param out the float image to write the blurred mask to, numpy array or memmap
+    @param sigma the standard deviation of the Gaussian, float
+    @param tile the number of rows and columns of the tiles, int
+
+    @return the blurred mask, numpy array or memmap"""
+
+    halo = 2 + int(4.0 * sigma + 0.5)
+    for inner, outer, crop in tiles(rgb.shape[:2], tile, halo):
+        mask = binary_opening(rgb2hue(rgb[outer]) > threshold)
+        out[inner] = gaussian(mask, sigma=sigma)[crop]
+
+    return out
+
+
+def chan_vese_tiled(
+    image,
+    phi,
+    phi_next,
+    mu=0.25,
+    lambda1=1.0,
+    lambda2=1.0,
+    tol=1e-3,
+    max_num_iter=500,
+    dt=0.5,
+    tile=1024,
+):
+    """!@brief Chan-Vese segmentation, with the iterations of skimage's
+    chan_vese done one tile at a time
+
+    @details Each iteration reads the tiles of the level set with a halo of 1
+    pixel, the reach of the update, and writes them to the other level set, so
+    the level sets are swapped after each iteration. The means inside and
+    outside the contour, and the change of the level set, are accumulated over
+    the tiles for the next iteration. The level set starts as the checkerboard
+    of chan_vese, and is the same as chan_vese's up to the rounding of the sums,
+    which are added in a different order. The iterations amplify these
+    differences on the pixels closest to the contour: on the tulips image, 17
+    pixels out of 666000 end up on the other side.
+
+    @param image the image, float 2D numpy array or memmap
+    @param phi the float array to hold the level set, numpy array or memmap of
+    the shape of the image
+    @param phi_next the float array to hold the next level set, numpy array or
+    memmap of the shape of the image
+    @param mu the weight of the length of the contour, float
+    @param lambda1 the weight of the differences inside the contour, float
+    @param lambda2 the weight of the differences outside the contour, float
+    @param tol the tolerance on the change of the level set, float
+    @param max_num_iter the largest number of iterations, int
+    @param dt the time step, float
+    @param tile the number of rows and columns of the tiles, int
+
+    @return the final level set, phi or phi_next, numpy array or memmap, and
+    the number of iterations, int"""
+
+    shape = image.shape
+
+    # Range of the image, to rescale it to [0, 1] as chan_vese does
+    i_min, i_max = np.inf, -np.inf
+    for inner, _, _ in tiles(shape, tile):
+        i_min = min(i_min, image[inner].min())
+        i_max = max(i_max, image[inner].max())
+    scale = i_max - i_min if i_max != i_min else 1.0
+
+    def rescaled(box):
+        return (np.asarray(image[box], dtype=phi.dtype) - i_min) / scale
+
+    # Checkerboard level set, and the sums over the image and inside the contour
+    total = np.zeros(2)
+    inside = np.zeros(2)
+    for inner, _, _ in tiles(shape, tile):
+        rows = np.arange(inner[0].start, inner[0].stop, dtype=phi.dtype)
+        cols = np.arange(inner[1].start, inner[1].stop, dtype=phi.dtype)
+        phi[inner] = np.sin(rows[:, None] * (np.pi / 5)) * np.sin(cols * (np.pi / 5))
+
+        values = rescaled(inner)
+        positive = phi[inner] > 0
+        total += [values.size, values.sum()]
+        inside += [positive.sum(), values[positive].sum()]
+
+    change = tol + 1
+    iteration = 0
+    while change > tol and iteration < max_num_iter:
+        outside = total - inside
+        mean_inside = inside[1] / inside[0] if inside[0] != 0 else 0.0
+        mean_outside = outside[1] / outside[0] if outside[0] != 0 else 0.0
+
+        inside[:] = 0
+        squared_change = 0.0
+        for inner, outer, crop in tiles(shape, tile, 1):
+            # Pad the edges of the image as chan_vese does, the other sides
+            # having a halo
+            pad = [
+                (int(i.start == o.start), int(i.stop == o.stop))
+                for i, o in zip(inner, outer)
+            ]
+            P = np.pad(phi[outer], pad, mode="edge")
+
+            values = rescaled(inner)
+            new = _chan_vese_update(
+                values, P, mean_inside, mean_outside, mu, lambda1, lambda2, dt
+            )
+            squared_change += np.sum((new - phi[inner]) ** 2)
+            phi_next[inner] = new
+
+            positive = new > 0
+            inside += [positive.sum(), values[positive].sum()]
+
+        change = np.sqrt(squared_change / total[0])
+        phi, phi_next = phi_next, phi
+        iteration += 1
+
+    return phi, iteration
+
+
+def opening_tiled(mask, footprint, out, tile=1024):
+    """!@brief Apply opening to a binary image, one tile at a time
+
+    @details The halo of the tiles is the reach of an erosion followed by a
+    dilation, twice the radius of the footprint.
+
+    @param mask the binary image, or a function returning the binary image in a
+    box (tuple of 2 slices), numpy array or callable
+    @param footprint the structuring element, symmetric, numpy array
+    @param out the array to write the result to, numpy array or memmap
+    @param tile the number of rows and columns of the tiles, int
+
+    @return the opened image, numpy array or memmap"""
+
+    if not callable(mask):
+        image = mask
+        mask = lambda box: image[box]  # noqa: E731
+
+    halo = 2 * (max(footprint.shape) // 2)
+    for inner, outer, crop in tiles(out.shape, tile, halo):
+        out[inner] = binary_opening(np.asarray(mask(outer), dtype=bool), footprint)[
+            crop
+        ]
+
+    return out
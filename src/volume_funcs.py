@@ -0,0 +1,270 @@
+"""!@file volume_funcs.py
+@brief Python script containing the functions to segment CT volumes
+for the Image Analysis Coursework
+
+@details The volumes are stacks of slices along the first axis, stored as
+.npy files and memory-mapped, so they never have to be loaded in RAM at once.
+Whole-volume operations are done one slab of slices at a time.
+
+List of functions:
+- load_volume: Memory-map a volume stored as a .npy file
+- create_volume: Create a memory-mapped .npy file to write a volume to
+- otsu_threshold_3d: Find Otsu's threshold from the streamed histogram of a volume
+- closing_3d: Apply closing with a ball to a binary volume, one slab at a time
+- find_seeds_3d: Find the seeds in the smallest regions of a thresholded volume
+- region_growing_3d: Perform region growing in a volume, reading only the
+voxels at the edge of the region
+
+
+@author T. Breitburd on 14/06/2024"""
+
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from skimage.measure import label
+from skimage.morphology import ball, closing
+from seg_funcs import otsu_from_histogram, _neighbour_offsets
+
+
+def load_volume(path):
+    """!@brief Memory-map a volume stored as a .npy file
+
+    @param path the path to the .npy file, string
+
+    @return the read-only memory-mapped volume, numpy memmap"""
+
+    return np.load(path, mmap_mode="r")
+
+
+def create_volume(path, shape, dtype=bool):
+    """!@brief Create a memory-mapped .npy file to write a volume to,
+    filled with zeros
+
+    @param path the path to the .npy file, string
+    @param shape the shape of the volume, tuple
+    @param dtype the data type of the volume, numpy dtype
+
+    @return the writable memory-mapped volume, numpy memmap"""
+
+    return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+
+
+def _slabs(n_slices, slab, halo=0):
+    """!@brief Split a volume into slabs of slices, with halos of extra slices
+
+    @param n_slices the number of slices in the volume, int
+    @param slab the number of slices per slab, int
+    @param halo the number of extra slices on each side of the slabs, int
+
+    @return generator of (start, stop, lo, hi), the slab slices and the slab
+    with its halo slices, clipped to the volume"""
+
+    for start in range(0, n_slices, slab):
+        stop = min(start + slab, n_slices)
+        yield start, stop, max(start - halo, 0), min(stop + halo, n_slices)
+
+
+def otsu_threshold_3d(volume, slab=32):
+    """!@brief Find Otsu's threshold of a volume, from its histogram accumulated
+    one slab at a time
+
+    @details Gives the same threshold as otsu_threshold on the whole volume.
+
+    @param volume the volume, numpy array or memmap
+    @param slab the number of slices per slab, int
+
+    @return the threshold, float"""
+
+    # First pass for the range of the histogram
+    v_min, v_max = np.inf, -np.inf
+    for start, stop, _, _ in _slabs(len(volume), slab):
+        v_min = min(v_min, volume[start:stop].min())
+        v_max = max(v_max, volume[start:stop].max())
+
+    # Second pass to accumulate the histogram
+    counts = np.zeros(256, dtype=np.int64)
+    for start, stop, _, _ in _slabs(len(volume), slab):
+        counts += np.histogram(volume[start:stop], bins=256, range=(v_min, v_max))[0]
+    bins = np.histogram_bin_edges([], bins=256, range=(v_min, v_max))
+
+    # Normalize the same way np.histogram does
+    hist = counts / np.diff(bins) / counts.sum()
+
+    return otsu_from_histogram(hist, bins)
+
+
+def closing_3d(mask, radius, out, slab=32):
+    """!@brief Apply closing with a ball to a binary volume, one slab at a time
+
+    @details Each slab is closed with a halo of 2 * radius slices, the reach of
+    a dilation followed by an erosion, so the result is the same as closing the
+    whole volume at once.
+
+    @param mask the binary volume, or a function returning the binary volume
+    for a range of slices (start, stop), numpy array or callable
+    @param radius the radius of the ball, int
+    @param out the volume to write the result to, numpy array or memmap
+    @param slab the number of slices per slab, int
+
+    @return the closed volume, numpy array or memmap"""
+
+    if not callable(mask):
+        volume = mask
+        mask = lambda start, stop: volume[start:stop]  # noqa: E731
+
+    footprint = ball(radius)
+    for start, stop, lo, hi in _slabs(len(out), slab, halo=2 * radius):
+        closed = closing(np.asarray(mask(lo, hi), dtype=bool), footprint)
+        out[start:stop] = closed[slice(start - lo, stop - lo)]
+
+    return out
+
+
+def find_seeds_3d(mask, n_seeds=2, connectivity=1, slab=32):
+    """!@brief Find seeds for region growing in the smallest regions of a
+    binary volume, one slab at a time
+
+    @details The regions are labelled in each slab, and the labels touching
+    across slab boundaries are merged. As in the 2D scripts, the seeds are the
+    middle voxels (in raster order) of the n_seeds smallest regions, the
+    background counting as one region.
+
+    @param mask the binary volume, numpy array or memmap
+    @param n_seeds the number of seeds to find, int
+    @param connectivity the neighbourhood connectivity, int
+    @param slab the number of slices per slab, int
+
+    @return the seeds, list of tuples"""
+
+    # In-plane offsets to the neighbours in the next slice
+    offsets = _neighbour_offsets(3, connectivity)
+    offsets = offsets[offsets[:, 0] == 1, 1:]
+
+    # Label each slab, and number the labels over the whole volume
+    slab_counts = []
+    slab_offsets = []
+    edges = []
+    n_labels = 0
+    last_labels = None
+    for start, stop, _, _ in _slabs(len(mask), slab):
+        labels = label(
+            np.asarray(mask[start:stop], dtype=bool), connectivity=connectivity
+        )
+        slab_counts.append(np.bincount(labels.ravel()))
+
+        # The background of all slabs is the same region
+        edges.append([[0], [n_labels]])
+
+        # Link the regions touching across the boundary with the previous slab
+        if last_labels is not None:
+            rows, cols = labels.shape[1:]
+            for dy, dx in offsets:
+                prev = last_labels[
+                    slice(max(-dy, 0), rows - max(dy, 0)),
+                    slice(max(-dx, 0), cols - max(dx, 0)),
+                ]
+                cur = labels[
+                    0,
+                    slice(max(dy, 0), rows + min(dy, 0)),
+                    slice(max(dx, 0), cols + min(dx, 0)),
+                ]
+                touching = (prev > 0) & (cur > 0)
+                edges.append(
+                    [prev[touching] + slab_offsets[-1], cur[touching] + n_labels]
+                )
+
+        slab_offsets.append(n_labels)
+        n_labels += len(slab_counts[-1])
+        last_labels = labels[-1]
+
+    # Merge the labels linked across slabs into regions
+    edges = np.concatenate(edges, axis=1)
+    graph = coo_matrix(
+        (np.ones(edges.shape[1]), (edges[0], edges[1])), shape=(n_labels, n_labels)
+    )
+    _, regions = connected_components(graph, directed=False)
+
+    # The seeds are in the smallest regions
+    region_sizes = np.bincount(regions, weights=np.concatenate(slab_counts))
+    smallest = np.argpartition(region_sizes, n_seeds)[:n_seeds]
+
+    seeds = []
+    for region in smallest:
+        # Find the slab holding the middle voxel of the region
+        rank = int(region_sizes[region]) // 2
+        for (start, stop, _, _), counts, offset in zip(
+            _slabs(len(mask), slab), slab_counts, slab_offsets
+        ):
+            in_region = regions[slice(offset, offset + len(counts))] == region
+            n_voxels = int(counts[in_region].sum())
+            if rank < n_voxels:
+                break
+            rank -= n_voxels
+
+        # Label that slab again, to get the voxel
+        labels = label(
+            np.asarray(mask[start:stop], dtype=bool), connectivity=connectivity
+        )
+        voxel = np.argwhere(in_region[labels])[rank]
+        seeds.append((int(voxel[0]) + start, int(voxel[1]), int(voxel[2])))
+
+    return seeds
+
+
+def region_growing_3d(volume, seed, threshold=0.2, connectivity=1, out=None):
+    """!@brief Perform region growing in a volume, one frontier at a time
+
+    @details The similarity to the seed value is only evaluated for the voxels
+    neighbouring the region, so only those are read from a memory-mapped volume.
+    Voxels already set in out count as part of the region.
+
+    @param volume the volume to segment, numpy array or memmap
+    @param seed the seed voxel, tuple
+    @param threshold the threshold to use, float
+    @param connectivity the neighbourhood connectivity, 1 for 6-connectivity
+    and 3 for 26-connectivity, int
+    @param out the binary volume to write the region to, a new array by default,
+    numpy array or memmap
+
+    @return the voxels in the grown region, boolean numpy array or memmap"""
+
+    shape = volume.shape
+    seed = tuple(int(s) for s in seed)
+    seed_value = float(volume[seed])
+    offsets = _neighbour_offsets(volume.ndim, connectivity)
+
+    if out is None:
+        out = np.zeros(shape, dtype=bool)
+    values = volume.reshape(-1)
+    is_segmented = out.reshape(-1)
+
+    # The seed always belongs to the region
+    frontier = np.array([np.ravel_multi_index(seed, shape)])
+    is_segmented[frontier] = True
+
+    while frontier.size:
+        coords = np.unravel_index(frontier, shape)
+
+        # Get the neighbours of the whole frontier, inside the volume
+        candidates = []
+        for offset in offsets:
+            neighbours = [c + o for c, o in zip(coords, offset)]
+            inside = np.ones(frontier.size, dtype=bool)
+            for n, size in zip(neighbours, shape):
+                inside &= (n >= 0) & (n < size)
+            neighbours = tuple(n[inside] for n in neighbours)
+            candidates.append(np.ravel_multi_index(neighbours, shape))
+
+        # Sorted, so the volume is read in order
+        candidates = np.unique(np.concatenate(candidates))
+        candidates = candidates[~is_segmented[candidates]]
+
+        # Keep the ones similar to the seed, they form the next frontier
+        similar = (
+            np.abs(values[candidates].astype(np.float64) - seed_value) / 255 < threshold
+        )
+        frontier = candidates[similar]
+        is_segmented[frontier] = True
+
+    return out